@@ -32,6 +32,8 @@ const App: React.FC = () => {
   const [externalFilters, setExternalFilters] = useState<SearchFilters | null>(
     null
   );
+  // 챗봇 등에서 특정 약 상세를 열 때 (같은 약을 다시 눌러도 열리도록 객체로)
+  const [externalPill, setExternalPill] = useState<{ itemSeq: string } | null>(null);
 
   const [searchKey, setSearchKey] = useState(0);
 
@@ -107,6 +109,7 @@ const App: React.FC = () => {
     if (path === "/search") {
       setSearchKey((prev) => prev + 1);
       setExternalFilters(null);
+      setExternalPill(null);
     }
 
     if (["/ai-search", "/community", "/mypage", "/search"].includes(path)) {
@@ -134,13 +137,22 @@ const App: React.FC = () => {
       setExternalFilters({ keyword });
       navigate("/search");
     };
+    const pillHandler = (e: Event) => {
+      const ce = e as CustomEvent<{ itemSeq: string }>;
+      const itemSeq = ce.detail?.itemSeq;
+      if (!itemSeq) return;
+      setExternalPill({ itemSeq });
+      navigate("/search");
+    };
     const loginHandler = () => {
       setAuthView(ViewState.LOGIN); // 로그인 모달 상태를 ON으로 변경
     };
     window.addEventListener("pilly:go-search", handler as EventListener);
+    window.addEventListener("pilly:open-pill", pillHandler as EventListener);
     window.addEventListener("pilly:open-login", loginHandler);
     return () => {
       window.removeEventListener("pilly:go-search", handler as EventListener);
+      window.removeEventListener("pilly:open-pill", pillHandler as EventListener);
       window.removeEventListener("pilly:open-login", loginHandler);
     };
   }, [navigate]);
@@ -177,7 +189,7 @@ const App: React.FC = () => {
       case ViewState.SEARCH:
         return (
           <div className="pt-20 min-h-screen">
-            <SearchSection key={searchKey} externalFilters={externalFilters} />
+            <SearchSection key={searchKey} externalFilters={externalFilters} externalPill={externalPill} />
           </div>
         );
       case ViewState.AI_SEARCH:
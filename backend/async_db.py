@@ -0,0 +1,94 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiomysql
+
+# 접속 정보와 풀 기본값은 db.py 와 같은 .env 값을 그대로 사용
+from db import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_RECYCLE
+
+# asyncio 풀은 스레드를 잡지 않으므로 요청 수가 아니라 MySQL 연결 수만 제한하면 됨
+ASYNC_DB_POOL_MIN = int(os.getenv('ASYNC_DB_POOL_MIN', 1))
+ASYNC_DB_POOL_MAX = int(os.getenv('ASYNC_DB_POOL_MAX', DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW))
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_pool():
+    """lifespan 시작 시 호출. 호출하지 않아도 첫 요청에서 자동으로 만들어짐"""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await aiomysql.create_pool(
+                host=DB_HOST,
+                port=DB_PORT,
+                user=DB_USER,
+                password=DB_PASSWORD,
+                db=DB_NAME,
+                charset='utf8mb4',
+                cursorclass=aiomysql.DictCursor, # pymysql DictCursor 처럼 결과를 dict로
+                # SELECT 만 해도 트랜잭션이 열린 채 반납되면 aiomysql 풀이 연결을 닫아버림(매 요청 재접속)
+                # -> 자동 커밋. 여러 문장을 묶어야 하면 await conn.begin() ... commit()
+                autocommit=True,
+                minsize=ASYNC_DB_POOL_MIN,
+                maxsize=ASYNC_DB_POOL_MAX,
+                pool_recycle=DB_POOL_RECYCLE,
+            )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+async def get_pool():
+    return _pool if _pool is not None else await init_pool()
+
+
+@asynccontextmanager
+async def acquire():
+    """async with acquire() as conn: ... — 블록이 끝나면 풀에 반납"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+
+# FastAPI 의존성 (async 버전의 db.get_db)
+async def get_async_db():
+    async with acquire() as conn:
+        yield conn
+
+
+# --- 쿼리 도우미 ---
+async def fetch_all(conn, sql, params=None):
+    async with conn.cursor() as cur:
+        await cur.execute(sql, params)
+        return await cur.fetchall()
+
+async def fetch_one(conn, sql, params=None):
+    async with conn.cursor() as cur:
+        await cur.execute(sql, params)
+        return await cur.fetchone()
+
+async def execute(conn, sql, params=None):
+    """INSERT/UPDATE/DELETE 용. 영향 받은 행 수를 리턴 (자동 커밋, 묶을 때는 호출한 쪽에서 begin/commit)"""
+    async with conn.cursor() as cur:
+        return await cur.execute(sql, params)
+
+
+def get_pool_stats():
+    if _pool is None:
+        return {"initialized": False}
+    return {
+        "initialized": True,
+        "minsize": _pool.minsize,
+        "maxsize": _pool.maxsize,
+        "size": _pool.size,
+        "free": _pool.freesize,
+        "checked_out": _pool.size - _pool.freesize,
+    }
@@ -1,4 +1,7 @@
 import os   #운영체제 관련 경로/환경변수 처리
+import time
+import threading
+from collections import deque
 import pymysql #라이브러리
 from dotenv import load_dotenv #env 파일 로드하는 함수
 
@@ -12,9 +15,20 @@ DB_USER = os.getenv('DB_USER', 'admin')
 DB_PASSWORD = os.getenv('DB_PASSWORD', '')
 DB_NAME = os.getenv('DB_NAME', 'Pilly')
 
-def get_db_connection(): #mysql 연결을 만들어서 리턴하는 함수. 필요할때마다 호출 후, 사용이 끝나면  conn.close() 해주기
+# 커넥션 풀 설정 (워커 수 x (POOL_SIZE + MAX_OVERFLOW) 가 MySQL max_connections 를 넘지 않게 잡기)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))             # 항상 유지하는 연결 수
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10)) # 바쁠 때 추가로 여는 연결 수
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))     # 빈 연결을 기다리는 최대 시간(초)
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))     # 이 시간(초)보다 오래된 연결은 새로 연결
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'  # 꺼내기 전에 ping 으로 살아있는지 확인
 
-    conn = pymysql.connect(
+
+class PoolTimeoutError(Exception):
+    """풀의 모든 연결이 사용 중이고 DB_POOL_TIMEOUT 안에 반납되지 않았을 때"""
+
+
+def _connect():
+    return pymysql.connect(
         host=DB_HOST,
         port=DB_PORT,
         user=DB_USER,
@@ -23,12 +37,208 @@ def get_db_connection(): #mysql 연결을 만들어서 리턴하는 함수. 필
         charset='utf8mb4',
         cursorclass=pymysql.cursors.DictCursor #결과를 dict로 받기
     )
-    return conn
+
+
+class PooledConnection:
+    """
+    pymysql 연결을 감싼 객체.
+    기존 코드처럼 conn.cursor() / conn.commit() 을 그대로 쓰고,
+    conn.close() 를 호출하면 실제로 끊지 않고 풀에 반납합니다.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, size, max_overflow, timeout, recycle, pre_ping):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()        # (raw, created_at) — 반납된 연결
+        self._opened = 0            # 현재 열려있는 연결 수 (idle + 사용 중)
+        self._cond = threading.Condition()
+
+        # 통계
+        self._checked_out = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._invalidated = 0
+
+    # ---------------------------------------------------
+    # 꺼내기 / 반납
+    # ---------------------------------------------------
+    def connect(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._opened < self.size + self.max_overflow:
+                    raw, created_at = None, None
+                    self._opened += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"DB 커넥션 풀 대기 시간 초과 ({self.size}+{self.max_overflow}개 모두 사용 중)"
+                    )
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+            waited = time.monotonic() - started
+            self._checked_out += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        # 실제 네트워크 작업(연결/핑)은 락 밖에서
+        try:
+            raw, created_at = self._ensure_alive(raw, created_at)
+        except Exception:
+            with self._cond:
+                self._checked_out -= 1
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw, created_at)
+
+    def _ensure_alive(self, raw, created_at):
+        if raw is not None and time.monotonic() - created_at > self.recycle:
+            self._close_quietly(raw)
+            raw = None
+            with self._cond:
+                self._recycled += 1
+        if raw is not None and self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._close_quietly(raw)
+                raw = None
+                with self._cond:
+                    self._invalidated += 1
+        if raw is None:
+            raw = _connect()
+            created_at = time.monotonic()
+            with self._cond:
+                self._created += 1
+        return raw, created_at
+
+    def _release(self, raw, created_at):
+        # 커밋하지 않은 트랜잭션이 다음 요청으로 새지 않도록 정리
+        try:
+            raw.rollback()
+            healthy = raw.open
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._checked_out -= 1
+            if healthy and len(self._idle) < self.size:
+                self._idle.append((raw, created_at))
+                raw = None
+            else:
+                self._opened -= 1
+                if not healthy:
+                    self._invalidated += 1
+            self._cond.notify()
+
+        if raw is not None:
+            self._close_quietly(raw)
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def dispose(self):
+        """idle 연결을 모두 닫음 (서버 종료 시)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(idle)
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pool_size": self.size,
+                "max_overflow": self.max_overflow,
+                "opened": self._opened,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "overflow": max(0, self._opened - self.size),
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "wait_time_total": round(self._wait_total, 4),
+                "wait_time_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+                "wait_time_max": round(self._wait_max, 4),
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "invalidated": self._invalidated,
+            }
+
+
+pool = ConnectionPool(
+    size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    timeout=DB_POOL_TIMEOUT,
+    recycle=DB_POOL_RECYCLE,
+    pre_ping=DB_POOL_PRE_PING,
+)
+
+
+def get_db_connection(): #풀에서 mysql 연결을 꺼내서 리턴하는 함수. 사용이 끝나면 conn.close() 해주기 (풀에 반납됨)
+    return pool.connect()
+
 # DB연결 도우미
 def get_conn():
-    return get_db_connection(
+    return get_db_connection()
 
-    )
-    
+# FastAPI 의존성: 요청 하나당 연결 하나를 꺼내고 응답 후 반납
+# 같은 요청 안에서 Depends(get_db) 를 여러 번 써도 FastAPI 가 캐시해서 같은 연결을 공유함
+def get_db():
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
 
-    
+def get_pool_stats():
+    return pool.stats()
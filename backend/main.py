@@ -1,5 +1,6 @@
 import pymysql
 import os
+import asyncio
 import sys
 import base64
 import json
@@ -14,7 +15,8 @@ from contextlib import asynccontextmanager
 from datetime import datetime
 
 # ✅ FastAPI & Libs
-from fastapi import FastAPI, UploadFile, File, Query, Depends, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, Query, Depends, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordBearer
@@ -24,8 +26,12 @@ from google.cloud import vision
 from dotenv import load_dotenv
 
 # ✅ DB & Routers
-from db import get_conn 
-from routers import auth, community, upload, mypage, admin, chat ,pills
+import db
+import async_db
+from db import get_conn, PoolTimeoutError
+from utils.text import normalize_search_text, like_prefix, like_contains
+from services import pill_index, search_cache, view_counter, recognition_cache, imprint_reader, visual_index, crop_store, image_pool, blob_store
+from routers import auth, community, upload, mypage, admin, chat ,pills, images
 
 load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent
@@ -43,7 +49,28 @@ for _dir in ("uploads", "models"):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # DB 가 잠깐 안 될 때도 서버는 뜨도록 — 실패하면 첫 요청(get_async_db)에서 다시 만듦
+    try:
+        await async_db.init_pool()
+    except Exception as e:
+        print(f"⚠️ async DB 풀 생성 실패 (첫 요청 때 다시 시도): {e}")
+    # 알약 각인 색인: 백그라운드에서 만들고 주기적으로 갱신 (만들어지기 전에는 DB 검색)
+    index_task = asyncio.create_task(pill_index.refresh_loop())
+    # 조회수는 메모리에 모았다가 주기적으로 한 번에 UPDATE
+    views_task = asyncio.create_task(view_counter.flush_loop())
+    # 사진 분석 crop 임시 파일 정리
+    crops_task = asyncio.create_task(crop_store.cleanup_loop())
+    # 참조 없는 업로드 파일 정리
+    blobs_task = asyncio.create_task(blob_store.gc_loop())
     yield
+    index_task.cancel()
+    views_task.cancel()
+    crops_task.cancel()
+    blobs_task.cancel()
+    await asyncio.to_thread(view_counter.flush_all) # 종료 전에 남은 조회수 반영
+    await async_db.close_pool()
+    db.pool.dispose()
+    image_pool.shutdown()
 
 app = FastAPI(title="Pilly Backend API", lifespan=lifespan)
 
@@ -63,6 +90,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# DB 커넥션 풀이 꽉 차서 기다리다 실패한 요청은 500 대신 503으로
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    print(f">>> 🚨 DB 풀 고갈: {exc} / {db.get_pool_stats()}")
+    return JSONResponse(status_code=503, content={"detail": "서버가 혼잡합니다. 잠시 후 다시 시도해주세요."})
+
 # --- Static Files ---
 app.mount("/uploads", StaticFiles(directory=BASE_DIR / "uploads"), name="uploads")
 
@@ -75,6 +108,7 @@ app.include_router(admin.router)
 app.include_router(chat.router)
 #app.include_router(search.router)
 app.include_router(pills.router)
+app.include_router(images.router)
 # --- Google Vision ---
 KEY_PATH = "service-account-file.json"
 vision_client = None
@@ -109,39 +143,65 @@ def get_pill_color_hsv(image_bytes):
         return "주황" 
     except: return "하양"
 
-def find_db_match(text: str, color: str):
+def find_db_match(text: str, color: str, crop_bytes: Optional[bytes] = None):
+    clean_text = ""
+    index = pill_index.get_index()
+    if text and len(text) >= 1:
+        clean_text = normalize_search_text(text)
+        print(f">>> 🔎 DB 검색 키워드: '{clean_text}'")
+
+        # 메모리 각인 색인이 준비돼 있으면 DB 를 거치지 않음
+        if index is not None:
+            # 각인이 똑같은 약 -> 각인/약 이름(영문)에 들어 있는 약 -> OCR 오타(GH8, 6HB ...)를 감안한 비슷한 각인 순
+            res = index.match(clean_text, limit=5)
+            # 같은 단계, 같은 점수인 후보끼리는 사진이 더 비슷한 약을 앞으로
+            if res: return visual_index.rerank(res, crop_bytes)
+
+    if color == "기타": color = "하양"
+    if index is not None:
+        # 각인으로 못 찾으면 사진이 비슷한 약 -> (사진 색인이 없으면) 색상별 인기 약 목록에서 뽑음
+        res = index.get_rows(visual_index.similar_seqs(crop_bytes, k=5))
+        return res or index.color_candidates(color, limit=5)
+
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            if text and len(text) >= 1:
-                clean_text = text.replace(" ", "").upper()
-                print(f">>> 🔎 DB 검색 키워드: '{clean_text}'")
-                
-                correction_map = {
-                    "K": "GHB", "H15": "GHB", "CHB": "GHB", "GNB": "GHB", 
-                    "GH8": "GHB", "6HB": "GHB", "GMB": "GHB", "OHB": "GHB",
-                    "GHD": "GHB", "QHB": "GHB", "BESTGUESS44": "GHB"
-                }
-                
-                if clean_text in correction_map:
-                    clean_text = correction_map[clean_text]
-                
+            if clean_text:
+                # 색인이 아직 없을 때(서버 시작 직후 / PILL_INDEX_ENABLED=0)만 DB 각인 검색
+                # 1차: 접두 일치 — 컬럼마다 인덱스를 타도록 UNION
+                sql = """
+                    SELECT * FROM pill_mfds WHERE print_front_norm LIKE %s
+                    UNION SELECT * FROM pill_mfds WHERE print_back_norm LIKE %s
+                    UNION SELECT * FROM pill_mfds WHERE item_name_norm LIKE %s
+                    ORDER BY popularity_score DESC LIMIT 5
+                """
+                p = like_prefix(clean_text)
+                cur.execute(sql, (p, p, p))
+                res = list(cur.fetchall())
+                if len(res) >= 5: return res
+
+                # 2차: 중간 일치로 남은 자리만 채움 (접두 일치가 앞, 'AB' 검색에 'XAB' 도 나오도록)
+                # 접두 일치만으로 5개가 차면 위에서 끝나서 스캔하지 않음
                 sql = """
                     SELECT * FROM pill_mfds 
                     WHERE (
-                        replace(print_front, ' ', '') LIKE %s 
-                        OR replace(print_back, ' ', '') LIKE %s
-                        OR replace(item_name, ' ', '') LIKE %s
+                        print_front_norm LIKE %s 
+                        OR print_back_norm LIKE %s
+                        OR item_name_norm LIKE %s
                     )
-                    ORDER BY popularity_score DESC LIMIT 5
+                    AND NOT (
+                        COALESCE(print_front_norm, '') LIKE %s
+                        OR COALESCE(print_back_norm, '') LIKE %s
+                        OR COALESCE(item_name_norm, '') LIKE %s
+                    )
+                    ORDER BY popularity_score DESC LIMIT %s
                 """
-                p = f"%{clean_text}%"
-                cur.execute(sql, (p, p, p))
-                res = cur.fetchall()
+                c = like_contains(clean_text)
+                cur.execute(sql, (c, c, c, p, p, p, 5 - len(res)))
+                res += cur.fetchall()
                 if res: return res
             
-            if color == "기타": color = "하양"
-            sql = "SELECT * FROM pill_mfds WHERE color_class1 LIKE %s ORDER BY RAND() LIMIT 5"
+            sql = "SELECT * FROM pill_mfds WHERE color_class1 LIKE %s ORDER BY popularity_score DESC LIMIT 5"
             cur.execute(sql, (f"%{color}%",))
             return cur.fetchall()
     finally: conn.close()
@@ -149,10 +209,42 @@ def find_db_match(text: str, color: str):
 # ---------------------------------------------------------
 # 1. OpenCV Detection
 # ---------------------------------------------------------
-def detect_pills_opencv_relaxed(pil_image) -> List[bytes]:
+# 탐지는 긴 변 DETECT_MAX_SIDE 로 줄인 이미지에서 하고, 찾은 박스만 원본 좌표로 되돌려 자름
+# (12MP 사진을 원본 크기로 blur/threshold/morphology 하면 느리고 메모리도 많이 씀)
+# 원본 전체 디코딩은 탐지가 끝난 뒤 자를 때만 -> 탐지용 버퍼와 원본이 동시에 메모리에 있지 않음
+DETECT_MAX_SIDE = int(os.getenv("DETECT_MAX_SIDE", 1024))
+# 알약 최소 크기/crop 여백은 원본 짧은 변 비율 (12MP 짧은 변 3000px 에서 예전 값 40px/25px) + 예전 값을 하한으로
+DETECT_MIN_FRAC = 0.013
+DETECT_PAD_FRAC = 0.008
+DETECT_MIN_PX = 40
+DETECT_PAD_PX = 25
+
+def load_detection_image(image_bytes):
+    """
+    탐지용 축소 이미지와 원본(회전 반영) 크기. JPEG 은 draft 로 1/2~1/8 크기로 바로 디코딩해서 원본 전체 디코딩을 피함
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    w, h = img.size
+    img.draft('RGB', (DETECT_MAX_SIDE, DETECT_MAX_SIDE))
+    draft_size = img.size
+    img = fix_image_orientation(img).convert('RGB')
+    if img.size != draft_size:  # EXIF 로 90도 회전됨
+        w, h = h, w
+    img.thumbnail((DETECT_MAX_SIDE, DETECT_MAX_SIDE))
+    return img, (w, h)
+
+def load_full_image(image_bytes):
+    return fix_image_orientation(Image.open(io.BytesIO(image_bytes)).convert('RGB'))
+
+def detect_pill_boxes(detect_image, orig_size):
+    """축소 이미지에서 알약 박스를 찾아 원본 좌표 (x1, y1, x2, y2) 로 (왼쪽부터 최대 5개, 여백 포함)"""
     print(">>> 1. OpenCV 탐지 시도...")
-    img = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-    h_orig, w_orig = img.shape[:2]
+    img = cv2.cvtColor(np.array(detect_image), cv2.COLOR_RGB2BGR)
+    h_det, w_det = img.shape[:2]
+    w_orig, h_orig = orig_size
+    scale = w_orig / w_det
+    min_side = max(min(w_orig, h_orig) * DETECT_MIN_FRAC, DETECT_MIN_PX) / scale
+    pad = max(min(w_orig, h_orig) * DETECT_PAD_FRAC, DETECT_PAD_PX)
     
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     blurred = cv2.GaussianBlur(gray, (9, 9), 0)
@@ -162,28 +254,34 @@ def detect_pills_opencv_relaxed(pil_image) -> List[bytes]:
     morph = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=3)
     contours, _ = cv2.findContours(morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     
-    detected_crops = []
     candidates = []
     for cnt in contours:
         x, y, w, h = cv2.boundingRect(cnt)
-        if w < 40 or h < 40: continue 
-        if w > w_orig * 0.9: continue
+        if w < min_side or h < min_side: continue 
+        if w > w_det * 0.9: continue
         ratio = w / h
         if ratio > 5.0 or ratio < 0.2: continue
         candidates.append((x, y, w, h))
 
     candidates.sort(key=lambda c: c[0])
     
+    boxes = []
     for (x, y, w, h) in candidates[:5]:
-        pad = 25
-        nx1 = max(0, x - pad); ny1 = max(0, y - pad)
-        nx2 = min(w_orig, x + w + pad); ny2 = min(h_orig, y + h + pad)
-        crop = img[ny1:ny2, nx1:nx2]
-        success, encoded = cv2.imencode('.jpg', crop)
-        if success: detected_crops.append(encoded.tobytes())
-        
-    print(f">>> OpenCV 결과: {len(detected_crops)}개 발견")
-    return detected_crops
+        boxes.append((
+            max(0, int(x * scale - pad)), max(0, int(y * scale - pad)),
+            min(w_orig, int((x + w) * scale + pad)), min(h_orig, int((y + h) * scale + pad)),
+        ))
+    print(f">>> OpenCV 결과: {len(boxes)}개 발견 (탐지 크기 {w_det}x{h_det})")
+    return boxes
+
+def crop_boxes(pil_image, boxes) -> List[bytes]:
+    """원본에서 잘라 JPEG 으로 (OCR 은 원본 화질로)"""
+    crops = []
+    for box in boxes:
+        buf = io.BytesIO()
+        pil_image.crop(box).save(buf, format='JPEG', quality=95)
+        crops.append(buf.getvalue())
+    return crops
 
 # ---------------------------------------------------------
 # 2. Gemini Fallback
@@ -222,62 +320,324 @@ def get_text_from_crop(image_bytes):
     model_name = 'models/gemini-2.0-flash' 
     try:
         model = genai.GenerativeModel(model_name)
-        response = model.generate_content(["Read the engraved text. Output ONLY text.", pil_img])
+        response = model.generate_content(
+            ["Read the engraved text. Output ONLY text.", pil_img],
+            request_options={"timeout": ANALYZE_CROP_TIMEOUT_SEC},
+        )
         return re.sub(r"[^A-Z0-9]", "", response.text.upper())
     except Exception as e: 
         return ""
 
+def get_texts_from_crops(crops):
+    """
+    여러 crop 을 Gemini 한 번에 보내서 각인을 읽음 (crop 수만큼 요청하지 않도록)
+    반환: crops 와 같은 길이의 목록. 답이 빠진 crop 은 None -> 호출한 쪽에서 get_text_from_crop 으로 다시
+    """
+    texts = [None] * len(crops)
+    for start in range(0, len(crops), ANALYZE_OCR_BATCH_MAX):
+        chunk = crops[start:start + ANALYZE_OCR_BATCH_MAX]
+        prompt = f"""
+    You will see {len(chunk)} pill images, each preceded by its index.
+    Read the engraved text on each pill.
+    Return ONLY a JSON list of objects, one per image:
+    - "index": the image index
+    - "text": the engraved text (letters/digits only, "" if none)
+    """
+        parts = [prompt]
+        for i, img_bytes in enumerate(chunk):
+            parts.append(f"Image {i}:")
+            parts.append(Image.open(io.BytesIO(img_bytes)))
+        try:
+            model = genai.GenerativeModel('models/gemini-2.0-flash')
+            response = model.generate_content(parts, request_options={"timeout": ANALYZE_CROP_TIMEOUT_SEC})
+            match = re.search(r'\[.*\]', response.text, re.DOTALL)
+            if not match:
+                continue
+            for item in json.loads(match.group(0)):
+                idx = item.get('index') if isinstance(item, dict) else None
+                if isinstance(idx, int) and 0 <= idx < len(chunk) and isinstance(item.get('text'), str):
+                    texts[start + idx] = re.sub(r"[^A-Z0-9]", "", item['text'].upper())
+        except Exception as e:
+            print(f">>> ⚠️ 묶음 OCR 실패: {e}")
+    return texts
+
+# ---------------------------------------------------------
+# 4. 알약별 병렬 처리
+# ---------------------------------------------------------
+# 알약(crop)마다 OCR/색상/DB 매칭을 스레드에서 동시에 실행 (이벤트 루프를 막지 않음)
+# 동시 실행 수는 프로세스 전체 기준이라 Gemini 호출량도 같이 제한됨
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", 5))
+ANALYZE_CROP_TIMEOUT_SEC = float(os.getenv("ANALYZE_CROP_TIMEOUT_SEC", 15))
+_analyze_semaphore = asyncio.Semaphore(ANALYZE_CONCURRENCY)
+# crop 전체를 Gemini 한 번에 보내서 읽기 (0 이면 crop 마다 따로 요청)
+ANALYZE_BATCH_OCR = os.getenv("ANALYZE_BATCH_OCR", "1") == "1"
+ANALYZE_OCR_BATCH_MAX = int(os.getenv("ANALYZE_OCR_BATCH_MAX", 16))  # 요청 하나에 넣을 최대 crop 수
+
+def _release_analyze_slot(future):
+    _analyze_semaphore.release()
+    if not future.cancelled():
+        future.exception()  # 시간 초과 뒤에 난 에러는 아무도 안 받으므로 여기서 소비
+
+async def run_limited(func, *args, default=None, timeout=ANALYZE_CROP_TIMEOUT_SEC):
+    """
+    func 를 스레드에서 실행. 시간 초과나 에러면 default
+    시간 초과돼도 스레드는 끝까지 돌기 때문에 자리는 스레드가 실제로 끝날 때 반납
+    (느린 Gemini/DB 호출이 쌓여도 실제 동시 실행 수가 ANALYZE_CONCURRENCY 를 넘지 않음)
+    """
+    await _analyze_semaphore.acquire()
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    future.add_done_callback(_release_analyze_slot)
+    try:
+        # shield: 시간 초과/요청 취소가 스레드 작업을 취소된 것처럼 끝내서 자리가 먼저 반납되지 않도록
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        print(f">>> ⏱️ {func.__name__} 시간 초과 ({timeout}초)")
+    except Exception as e:
+        print(f">>> ⚠️ {func.__name__} 실패: {e}")
+    return default
+
+async def read_crops_fast(crops):
+    """
+    인식 캐시 -> 로컬 판독기 순서로 crop 각인 + 색상을 읽음 (네트워크 없음)
+    반환: (readings, colors, fps). Gemini 가 필요한(확신도가 낮은) crop 은 readings 가 None
+    readings 항목 = (각인, 색상, 확신도, 판독 방법)
+    """
+    fps = await asyncio.to_thread(lambda: [recognition_cache.fingerprint(b, "crop") for b in crops])
+    hits = await asyncio.to_thread(lambda: [recognition_cache.lookup("crop", fp) for fp in fps])
+    readings = [(hit["print"], hit["color"], hit.get("confidence"), "cache") if hit else None for hit in hits]
+    colors = [hit["color"] if hit else None for hit in hits]
+    todo = [i for i, hit in enumerate(hits) if hit is None]
+    if not todo:
+        return readings, colors, fps
+
+    local, todo_colors = await asyncio.gather(
+        asyncio.to_thread(lambda: [imprint_reader.read(crops[i]) for i in todo]),
+        asyncio.gather(*(run_limited(get_pill_color_hsv, crops[i], default="하양") for i in todo)),
+    )
+    for i, (text, conf), color in zip(todo, local, todo_colors):
+        colors[i] = color
+        if conf >= imprint_reader.IMPRINT_READER_MIN_CONF:
+            readings[i] = (text, color, round(conf, 3), "local")
+    remember_readings(fps, readings, todo)
+    return readings, colors, fps
+
+def remember_readings(fps, readings, indexes):
+    # 빈 각인은 실패(시간 초과 등)일 수도 있어서 저장하지 않음
+    for i in indexes:
+        if readings[i] and readings[i][0]:
+            text, color, conf, _ = readings[i]
+            recognition_cache.store("crop", fps[i], {"print": text, "color": color, "confidence": conf})
+
+async def _read_texts_gemini(crops):
+    """각인은 묶음 요청 한 번, 답이 빠진 것만 따로"""
+    if not ANALYZE_BATCH_OCR or len(crops) < 2:
+        return await asyncio.gather(*(run_limited(get_text_from_crop, b, default="") for b in crops))
+
+    texts = await run_limited(get_texts_from_crops, crops, default=[None] * len(crops))
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if missing:
+        print(f">>> 🔁 묶음 OCR 누락 {len(missing)}개 -> 개별 요청")
+        retried = await asyncio.gather(*(run_limited(get_text_from_crop, crops[i], default="") for i in missing))
+        for i, text in zip(missing, retried):
+            texts[i] = text
+    return texts
+
+def crop_fields(crop_bytes, inline=False, thumbnail=False):
+    """
+    응답의 crop 부분. 기본은 crop 저장소 URL(+크기), inline=True 면 예전처럼 base64 data URI
+    """
+    if inline:
+        crop_b64 = base64.b64encode(crop_bytes).decode('utf-8')
+        return {"crop_image": f"data:image/jpeg;base64,{crop_b64}"}
+    crop = crop_store.save(crop_bytes, thumbnail)
+    return {"crop_image": crop["url"], "crop": crop}
+
+def build_result(text, color, candidates, crop, confidence=None, source="gemini"):
+    return {
+        "detected_info": {"print": text, "color": color, "confidence": confidence, "source": source},
+        "candidates": candidates,
+        **crop,
+    }
+
+def crop_gemini_item(pil_image, item):
+    """Gemini 전체 이미지 분석 결과(0~1000 좌표) 하나를 JPEG crop 으로"""
+    w_img, h_img = pil_image.size
+    box = item.get('box_2d') or list(item.values())[0]
+    ymin, xmin, ymax, xmax = box
+    crop = pil_image.crop((int(xmin/1000*w_img), int(ymin/1000*h_img), int(xmax/1000*w_img), int(ymax/1000*h_img)))
+    buf = io.BytesIO()
+    crop.save(buf, format='JPEG')
+    return buf.getvalue()
+
+# ---------------------------------------------------------
+# 5. 분석 진행 이벤트
+# ---------------------------------------------------------
+async def crop_result_events(crops, inline_crops=False, thumbnails=False):
+    """
+    OpenCV crop 마다 끝나는 순서대로 result 이벤트.
+    캐시/로컬 판독으로 바로 읽힌 crop 은 바로 매칭을 시작하고, 나머지는 Gemini 묶음 요청이 끝나는 대로 이어서
+
+    중복 각인은 (읽힌 순서와 상관없이) 번호가 가장 앞선 crop 만 남김 -> 실행할 때마다 같은 결과.
+    그래서 결과는 앞 번호 crop 들의 각인이 모두 읽힌 뒤에 내보냄 (매칭 자체는 미리 시작)
+    """
+    readings, colors, fps = await read_crops_fast(crops)
+    queue = asyncio.Queue()
+    tasks = []
+
+    def duplicate_of_earlier(i):
+        """앞 번호 crop 중 이미 읽힌 것과 각인이 같은지"""
+        text = readings[i][0]
+        return bool(text) and any(r is not None and r[0] == text for r in readings[:i])
+
+    async def match(i, reading):
+        # crop 하나당 큐에 반드시 하나 (에러가 나도) -> 아래에서 len(crops) 개를 기다리다 멈추지 않도록
+        result = None
+        try:
+            text, color, conf, source = reading
+            candidates, crop = await asyncio.gather(
+                run_limited(find_db_match, text, color, crops[i], default=[]),
+                asyncio.to_thread(crop_fields, crops[i], inline_crops, thumbnails),
+            )
+            result = build_result(text, color, candidates, crop, conf, source)
+        except Exception as e:
+            print(f">>> ⚠️ crop {i} 매칭 실패: {e}")
+        finally:
+            queue.put_nowait((i, result))
+
+    def start(i, reading):
+        # 앞 번호에 같은 각인이 이미 있으면 매칭할 필요 없음 (앞 번호가 아직 안 읽혔으면 일단 매칭하고 내보낼 때 판단)
+        if duplicate_of_earlier(i):
+            queue.put_nowait((i, None))
+            return
+        tasks.append(asyncio.create_task(match(i, reading)))
+
+    async def read_rest(todo):
+        print(f">>> 🤖 로컬 판독 {len(crops) - len(todo)}개 / Gemini {len(todo)}개")
+        try:
+            texts = await _read_texts_gemini([crops[i] for i in todo])
+        except Exception as e:
+            print(f">>> ⚠️ Gemini 각인 판독 실패: {e}")
+            texts = [""] * len(todo)
+        texts = list(texts) + [""] * (len(todo) - len(texts))
+        for i, text in zip(todo, texts):
+            readings[i] = (text or "", colors[i], None, "gemini")
+        for i in todo:
+            start(i, readings[i])
+        queue.put_nowait((None, None))  # 각인이 다 읽혔으니 보류 중인 결과를 내보낼 수 있음
+        try:
+            await asyncio.to_thread(remember_readings, fps, readings, todo)
+        except Exception as e:
+            print(f">>> ⚠️ 인식 캐시 저장 실패: {e}")
+
+    for i, reading in enumerate(readings):
+        if reading is not None:
+            start(i, reading)
+    todo = [i for i, reading in enumerate(readings) if reading is None]
+    if todo:
+        tasks.append(asyncio.create_task(read_rest(todo)))
+
+    try:
+        finished = 0
+        held = {}  # crop 번호 -> 결과 (앞 번호 각인이 다 읽힐 때까지 보류)
+        while finished < len(crops):
+            i, result = await queue.get()
+            if i is not None:
+                finished += 1
+                held[i] = result
+            for k in sorted(held):
+                if any(r is None for r in readings[:k]):
+                    break
+                result = held.pop(k)
+                if result is not None and not duplicate_of_earlier(k):
+                    yield {"type": "result", "index": k, **result}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def analyze_events(original_bytes, inline_crops=False, thumbnails=False):
+    """
+    사진 분석 진행 이벤트: detected(탐지 개수) -> result(알약마다, 끝나는 순서대로) -> done
+    /api/pills/analyze 는 모아서 한 번에, /api/pills/analyze/stream 은 NDJSON 으로 바로바로 보냄
+    """
+    detect_image, orig_size = await asyncio.to_thread(load_detection_image, original_bytes)
+    boxes = await asyncio.to_thread(detect_pill_boxes, detect_image, orig_size)
+    del detect_image
+    # 원본은 탐지가 끝난 뒤 자를 때만 디코딩
+    pil_image = await asyncio.to_thread(load_full_image, original_bytes)
+    count = 0
+    
+    if boxes:
+        opencv_crops = await asyncio.to_thread(crop_boxes, pil_image, boxes)
+        del pil_image  # OCR 하는 동안은 잘라낸 crop 만 들고 있음
+        yield {"type": "detected", "method": "opencv", "count": len(opencv_crops)}
+        async for event in crop_result_events(opencv_crops, inline_crops, thumbnails):
+            count += 1
+            yield event
+    else:
+        scene_fp = await asyncio.to_thread(recognition_cache.fingerprint, original_bytes, "scene")
+        gemini_data = await asyncio.to_thread(recognition_cache.lookup, "scene", scene_fp)
+        if gemini_data is None:
+            gemini_data = await asyncio.to_thread(detect_full_gemini, pil_image)
+            if gemini_data:
+                await asyncio.to_thread(recognition_cache.store, "scene", scene_fp, gemini_data)
+        items = []
+        for item in gemini_data:
+            crop_bytes = crop_gemini_item(pil_image, item)
+            text = re.sub(r"[^A-Z0-9]", "", item.get('text', '').upper())
+            color = item.get('color', '하양')
+            items.append((crop_bytes, text, color))
+        yield {"type": "detected", "method": "gemini", "count": len(items)}
+
+        async def match(i, crop_bytes, text, color):
+            candidates, crop = await asyncio.gather(
+                run_limited(find_db_match, text, color, crop_bytes, default=[]),
+                asyncio.to_thread(crop_fields, crop_bytes, inline_crops, thumbnails),
+            )
+            return i, build_result(text, color, candidates, crop)
+
+        for next_done in asyncio.as_completed([match(i, *item) for i, item in enumerate(items)]):
+            i, result = await next_done
+            count += 1
+            yield {"type": "result", "index": i, **result}
+
+    yield {"type": "done", "success": True, "count": count}
+
 # --- API Endpoints ---
 @app.post("/api/pills/analyze")
-async def analyze_multiple_pills(file: UploadFile = File(...)):
+async def analyze_multiple_pills(
+    file: UploadFile = File(...),
+    inline_crops: bool = Query(False, description="true 면 crop_image 를 예전처럼 base64 data URI 로"),
+    thumbnails: bool = Query(False, description="true 면 crop.thumbnail_url 도 생성"),
+):
     try:
         original_bytes = await file.read()
-        pil_image = Image.open(io.BytesIO(original_bytes)).convert('RGB')
-        pil_image = fix_image_orientation(pil_image)
-        w_img, h_img = pil_image.size
-        
-        opencv_crops = detect_pills_opencv_relaxed(pil_image)
-        final_results = []
-        seen_texts = set()
-        
-        if len(opencv_crops) > 0:
-            for img_bytes in opencv_crops:
-                text = get_text_from_crop(img_bytes)
-                color = get_pill_color_hsv(img_bytes)
-                if text and text in seen_texts: continue
-                if text: seen_texts.add(text)
-                
-                candidates = find_db_match(text, color)
-                crop_b64 = base64.b64encode(img_bytes).decode('utf-8')
-                final_results.append({
-                    "detected_info": {"print": text, "color": color},
-                    "candidates": candidates,
-                    "crop_image": f"data:image/jpeg;base64,{crop_b64}"
-                })
-        else:
-            gemini_data = detect_full_gemini(pil_image)
-            for item in gemini_data:
-                box = item.get('box_2d') or list(item.values())[0]
-                ymin, xmin, ymax, xmax = box
-                crop = pil_image.crop((int(xmin/1000*w_img), int(ymin/1000*h_img), int(xmax/1000*w_img), int(ymax/1000*h_img)))
-                buf = io.BytesIO()
-                crop.save(buf, format='JPEG')
-                
-                text = re.sub(r"[^A-Z0-9]", "", item.get('text', '').upper())
-                color = item.get('color', '하양')
-                candidates = find_db_match(text, color)
-                crop_b64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-                final_results.append({
-                    "detected_info": {"print": text, "color": color},
-                    "candidates": candidates,
-                    "crop_image": f"data:image/jpeg;base64,{crop_b64}"
-                })
-
+        events = [event async for event in analyze_events(original_bytes, inline_crops, thumbnails) if event["type"] == "result"]
+        events.sort(key=lambda e: e["index"])
+        final_results = [{k: v for k, v in e.items() if k not in ("type", "index")} for e in events]
         return {"success": True, "count": len(final_results), "results": final_results}
     except Exception as e:
         print(f">>> 🚨 Fatal Error: {e}")
         return {"success": True, "count": 0, "results": []}
 
+# 같은 분석을 NDJSON(한 줄에 이벤트 하나)으로 — 첫 알약 결과가 나오는 즉시 화면에 표시 가능
+@app.post("/api/pills/analyze/stream")
+async def analyze_multiple_pills_stream(
+    file: UploadFile = File(...),
+    inline_crops: bool = Query(False),
+    thumbnails: bool = Query(False),
+):
+    original_bytes = await file.read()
+
+    async def lines():
+        try:
+            async for event in analyze_events(original_bytes, inline_crops, thumbnails):
+                yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        except Exception as e:
+            print(f">>> 🚨 Fatal Error: {e}")
+            yield json.dumps({"type": "done", "success": False, "count": 0}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 
 
 @app.post("/api/pills/{item_seq}/like")
@@ -287,4 +647,8 @@ def toggle_like(item_seq: str): return {"is_liked": True}
 def pill_detail(item_seq: int): return {"pill": {}}
 
 @app.get("/health")
-def health_check(): return {"status": "ok"}
\ No newline at end of file
+def health_check(): return {"status": "ok"}
+
+# DB 커넥션 풀 상태 (사용 중/대기자/대기 시간) — 풀 크기 조정용
+@app.get("/health/db")
+def db_pool_stats(): return {"sync": db.get_pool_stats(), "async": async_db.get_pool_stats(), "search_cache": search_cache.stats(), "recognition_cache": recognition_cache.stats()}
\ No newline at end of file
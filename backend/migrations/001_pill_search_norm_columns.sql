@@ -0,0 +1,16 @@
+-- 001: 검색용 정규화 컬럼 (공백 제거 + 대문자)
+-- replace(col, ' ', '') LIKE ... 는 인덱스를 못 타서 매 검색마다 pill_mfds 전체를 스캔함.
+-- STORED 생성 컬럼이라 INSERT/UPDATE(데이터 임포트 포함) 시 MySQL 이 자동으로 채워줌.
+-- 실행: mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/001_pill_search_norm_columns.sql
+
+ALTER TABLE pill_mfds
+    ADD COLUMN item_name_norm   VARCHAR(500) GENERATED ALWAYS AS (UPPER(REPLACE(item_name, ' ', '')))   STORED,
+    ADD COLUMN entp_name_norm   VARCHAR(300) GENERATED ALWAYS AS (UPPER(REPLACE(entp_name, ' ', '')))   STORED,
+    ADD COLUMN print_front_norm VARCHAR(100) GENERATED ALWAYS AS (UPPER(REPLACE(print_front, ' ', ''))) STORED,
+    ADD COLUMN print_back_norm  VARCHAR(100) GENERATED ALWAYS AS (UPPER(REPLACE(print_back, ' ', '')))  STORED;
+
+-- 'ABC%' 같은 접두 검색은 이 인덱스로 range scan
+CREATE INDEX idx_pill_mfds_item_name_norm   ON pill_mfds (item_name_norm);
+CREATE INDEX idx_pill_mfds_entp_name_norm   ON pill_mfds (entp_name_norm);
+CREATE INDEX idx_pill_mfds_print_front_norm ON pill_mfds (print_front_norm);
+CREATE INDEX idx_pill_mfds_print_back_norm  ON pill_mfds (print_back_norm);
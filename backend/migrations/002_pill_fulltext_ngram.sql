@@ -0,0 +1,9 @@
+-- 002: 키워드 검색용 FULLTEXT 인덱스 (ngram 파서 — 띄어쓰기 없는 한글도 2글자 단위로 색인)
+-- ngram_token_size 는 서버 설정(기본 2). 바꾸면 .env 의 NGRAM_TOKEN_SIZE 도 같이 맞추기.
+-- 실행: mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/002_pill_fulltext_ngram.sql
+
+ALTER TABLE pill_mfds
+    ADD FULLTEXT INDEX ft_pill_mfds_name (item_name, entp_name) WITH PARSER ngram;
+
+ALTER TABLE pill_easy_info
+    ADD FULLTEXT INDEX ft_pill_easy_info_efcy (efcy_qesitm) WITH PARSER ngram;
@@ -0,0 +1,15 @@
+-- 003: 사진 인식 결과 캐시 (services/recognition_cache.py, RECOGNITION_CACHE_DB=1 일 때만 사용)
+-- 같은 사진(sha256) 또는 거의 같은 사진(dhash)이면 Gemini 를 다시 부르지 않음. 워커/재시작 간 공유용.
+-- 실행: mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/003_recognition_cache.sql
+
+CREATE TABLE IF NOT EXISTS recognition_cache (
+    kind       VARCHAR(16)     NOT NULL,             -- crop / scene / pill
+    sha256     CHAR(64)        NOT NULL,
+    dhash      BIGINT UNSIGNED NULL,
+    result     JSON            NOT NULL,
+    created_at DATETIME        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME        NOT NULL,
+    PRIMARY KEY (kind, sha256),
+    KEY idx_recognition_cache_dhash (kind, dhash),
+    KEY idx_recognition_cache_expires (expires_at)
+);
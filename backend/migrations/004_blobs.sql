@@ -0,0 +1,14 @@
+-- 004: 업로드 파일 목록 + 참조 수 (services/blob_store.py)
+-- 파일은 uploads/blobs/ab/cd/<sha256>.<ext> 에 내용 기준으로 한 번만 저장.
+-- ref_count 는 blob_store.gc() 가 posts.image_url / users.profile_image 를 세어서 갱신하고, 0 이면 유예 시간 뒤 삭제.
+-- 실행: mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/004_blobs.sql
+
+CREATE TABLE IF NOT EXISTS blobs (
+    digest           CHAR(64)     NOT NULL PRIMARY KEY,  -- sha256
+    ext              VARCHAR(8)   NOT NULL,
+    size             BIGINT       NOT NULL,
+    ref_count        INT          NOT NULL DEFAULT 0,
+    created_at       DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_uploaded_at DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_blobs_ref_count (ref_count)
+);
@@ -0,0 +1,10 @@
+-- 005: 키워드 FULLTEXT 를 정규화 이름(공백 제거 + 대문자, migrations/001) 기준으로
+-- 002 의 (item_name, entp_name) 색인은 원래 띄어쓰기대로 ngram 을 만들어서
+-- '타이레놀정' 으로 '타이레놀 정' 을 못 찾음 (예전 *_norm LIKE 검색은 찾던 것)
+-- 실행: mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/005_pill_fulltext_norm.sql
+
+ALTER TABLE pill_mfds
+    ADD FULLTEXT INDEX ft_pill_mfds_name_norm (item_name_norm, entp_name_norm) WITH PARSER ngram;
+
+ALTER TABLE pill_mfds
+    DROP INDEX ft_pill_mfds_name;
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from db import get_conn
 from routers.auth import get_current_user
+from services import pill_index, search_cache, principal_cache
 from pydantic import BaseModel
 from typing import Optional
 
@@ -67,6 +68,7 @@ def update_user_role(user_id: int, data: RoleUpdate, admin: dict = Depends(check
             # 권한 업데이트
             cur.execute("UPDATE users SET role = %s WHERE id = %s", (data.role, user_id))
             conn.commit()
+            principal_cache.invalidate(user_id=user_id)
             return {"message": "권한이 변경되었습니다."}
     finally:
         conn.close()
@@ -101,6 +103,7 @@ def update_user(user_id: int, user_data: UserUpdate, admin: dict = Depends(check
             
             cur.execute(sql, tuple(values))
             conn.commit()
+            principal_cache.invalidate(user_id=user_id) # 차단/권한 변경이 다음 요청부터 바로 적용되도록
             return {"message": "회원 정보가 수정되었습니다."}
     finally:
         conn.close()
@@ -116,6 +119,7 @@ def delete_user(user_id: int, admin: dict = Depends(check_admin)):
             # 2. 회원 삭제
             cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
             conn.commit()
+            principal_cache.invalidate(user_id=user_id)
             return {"message": "회원이 삭제되었습니다."}
     finally:
         conn.close()      
@@ -195,13 +199,22 @@ def delete_pill(item_seq: int, admin: dict = Depends(check_admin)):
             cur.execute(sql, (item_seq,))
             
             conn.commit()
+            pill_index.remove(item_seq)
+            search_cache.invalidate()
             return {"status": "success", "message": f"{item_seq} 삭제 완료"}
     except Exception as e:
         print(f"삭제 에러: {e}")
         return {"status": "error", "message": str(e)}
     finally:
         conn.close()
-        
+
+# 9. 약품 데이터 임포트 후 반영 (임포트 스크립트가 pill_mfds 를 다 쓴 뒤 호출)
+@router.post("/pills/reload")
+def reload_pills(admin: dict = Depends(check_admin)):
+    search_cache.invalidate()
+    pill_index.refresh(force=True)
+    return {"status": "success", "message": "약품 검색 캐시/색인을 새로 만들었습니다."}
+
 @router.delete("/users/{user_id}")
 def delete_user(user_id: int, admin: dict = Depends(check_admin)):
     conn = get_conn()
@@ -213,6 +226,7 @@ def delete_user(user_id: int, admin: dict = Depends(check_admin)):
             # 2. 회원 삭제
             cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
             conn.commit()
+            principal_cache.invalidate(user_id=user_id)
             return {"message": "회원이 삭제되었습니다."}
     finally:
         conn.close()
\ No newline at end of file
@@ -3,6 +3,8 @@ import httpx
 from pydantic import BaseModel
 from fastapi import APIRouter, Depends, HTTPException, status
 from db import get_conn
+from async_db import get_async_db
+from services import principal_cache
 from schemas.user import UserCreate, UserLogin, Token, UserOut
 from utils.security import get_password_hash, verify_password, create_access_token, SECRET_KEY, ALGORITHM
 from fastapi.security import OAuth2PasswordBearer
@@ -99,32 +101,43 @@ def login(user: UserLogin):
         conn.close()
 
 # 3. 현재 로그인한 사용자 정보 가져오기
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="자격 증명이 유효하지 않습니다.",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_username(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
+        return username
     except JWTError:
-        raise credentials_exception
-        
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM users WHERE username = %s", (username,))
-            user = cur.fetchone()
-            
-            if user is None:
-                raise credentials_exception
-            
-            return user
-    finally:
-        conn.close()
+        raise _credentials_exception()
+
+def _check_active(user):
+    if user is None:
+        raise _credentials_exception()
+    # 토큰이 아직 유효해도 차단된 계정은 바로 막음 (차단 시 캐시도 비워짐)
+    if user.get('is_banned'):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="관리자에 의해 차단된 계정입니다."
+        )
+    return user
+
+# 사용자 정보는 services/principal_cache 에 잠깐 캐시 (비밀번호 제외)
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    username = decode_username(token)
+    return _check_active(principal_cache.load_user(username))
+
+# async 핸들러용: 같은 요청의 async_db 연결을 넘겨받아 조회
+async def get_current_user_async(token: str = Depends(oauth2_scheme), conn=Depends(get_async_db)):
+    username = decode_username(token)
+    return _check_active(await principal_cache.load_user_async(conn, username))
 
 # 4. 내 정보 조회 API
 @router.get("/me", response_model=UserOut)
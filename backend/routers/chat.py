@@ -1,19 +1,34 @@
 # backend/routers/chat.py
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import os
+import re
+import json
+import asyncio
 from dotenv import load_dotenv
 load_dotenv()
 import openai
 
+from db import get_conn
+from utils.text import normalize_search_text, like_prefix
+from services import pill_index, chat_sessions
+
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
 # OpenAI API 키 설정 (환경변수에서 가져오기)
 # 실제 배포 시에는 .env 파일에 넣어야 합니다.
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo") # 또는 "gpt-4"
+CHAT_TIMEOUT_SEC = float(os.getenv("CHAT_TIMEOUT_SEC", 30))     # 요청 하나의 최대 시간
+CHAT_CONCURRENCY = int(os.getenv("CHAT_CONCURRENCY", 8))        # 워커당 동시에 진행하는 GPT 호출 수
+CHAT_QUEUE_WAIT_SEC = float(os.getenv("CHAT_QUEUE_WAIT_SEC", 10)) # 자리가 이 시간 안에 안 나면 503
+
+# async 클라이언트: 응답을 기다리는 동안 이벤트 루프(검색/커뮤니티 요청)를 막지 않음
+client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=CHAT_TIMEOUT_SEC, max_retries=1)
+_chat_slots = asyncio.Semaphore(CHAT_CONCURRENCY)
 
 # 요청 데이터 구조
 class Message(BaseModel):
@@ -21,7 +36,10 @@ class Message(BaseModel):
     content: str
 
 class ChatRequest(BaseModel):
-    messages: List[Message]
+    session_id: Optional[str] = None # 이전 응답의 session_id (있으면 기록은 서버에 있으므로 message 만 보내면 됨)
+    message: Optional[str] = None    # 이번 질문
+    messages: List[Message] = []     # 최근 기록 (마지막이 이번 질문). 세션이 없거나 만료/다른 워커라 못 찾을 때 새 세션을 채우는 데만 사용
+    stream: bool = False # true 면 SSE 로 토큰이 오는 대로 전달
 
 # 🤖 시스템 프롬프트 (AI의 성격 설정)
 SYSTEM_PROMPT = """
@@ -50,24 +68,196 @@ SYSTEM_PROMPT = """
 
 """
 
+# ---------------------------------------------------------
+# 답변 속 [[약 이름]] -> 약 정보 (프론트가 이름마다 검색 요청을 보내지 않도록)
+# ---------------------------------------------------------
+_DRUG_MENTION = re.compile(r"\[\[\s*(.+?)\s*\]\]")
+LINK_COLUMNS = "item_seq, item_name, item_image"
+
+def _mentions(reply):
+    """답변에 나온 순서대로, 중복 없이"""
+    seen, names = set(), []
+    for name in _DRUG_MENTION.findall(reply or ""):
+        key = normalize_search_text(name)
+        if key and key not in seen:
+            seen.add(key)
+            names.append(name)
+    return names
+
+def resolve_links(reply):
+    """
+    [[ ]] 로 감싼 약 이름마다 가장 인기 있는 약 하나 -> [{"name", "item_seq", "item_name", "item_image"}]
+    메모리 색인이 있으면 DB 를 거치지 않고, 없으면 이름 전부를 쿼리 한 번으로
+    """
+    names = _mentions(reply)
+    if not names:
+        return []
+
+    index = pill_index.get_index()
+    if index is not None:
+        found = [(name, index.search_name(name)) for name in names]
+    else:
+        # 이름마다 (접두 일치 인기 1위) 를 UNION ALL 로 묶어 한 번에
+        sql = " UNION ALL ".join(
+            f"(SELECT %s AS mention, {LINK_COLUMNS} FROM pill_mfds WHERE item_name_norm LIKE %s ORDER BY popularity_score DESC LIMIT 1)"
+            for _ in names
+        )
+        params = [v for name in names for v in (name, like_prefix(normalize_search_text(name)))]
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, tuple(params))
+                by_name = {row["mention"]: row for row in cur.fetchall()}
+        finally:
+            conn.close()
+        found = [(name, by_name.get(name)) for name in names]
+
+    return [
+        {"name": name, "item_seq": row["item_seq"], "item_name": row["item_name"], "item_image": row.get("item_image")}
+        for name, row in found if row
+    ]
+
+async def _links(reply):
+    try:
+        return await asyncio.to_thread(resolve_links, reply)
+    except Exception as e:
+        print(f"Chat Link Error: {e}")
+        return []
+
+async def _acquire_slot():
+    try:
+        await asyncio.wait_for(_chat_slots.acquire(), CHAT_QUEUE_WAIT_SEC)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="상담 요청이 많습니다. 잠시 후 다시 시도해주세요.")
+
+def _sse(data):
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# ---------------------------------------------------------
+# 세션: 기록은 서버(chat_sessions)에 두고, 예산을 넘은 오래된 대화는 요약으로 압축
+# ---------------------------------------------------------
+SUMMARY_PROMPT = f"""
+다음은 약사 AI 와 사용자의 상담 기록입니다. '이전 요약'과 '이어진 대화'를 합쳐 하나의 요약으로 정리하세요.
+- 사용자의 증상, 나이/임신/지병 등 복약에 필요한 정보, 복용 중인 약, 이미 추천한 약 이름을 빠짐없이 남기세요.
+- 인사말이나 주의사항 문구는 빼고, {chat_sessions.CHAT_SUMMARY_TOKENS} 토큰 안쪽의 짧은 한국어 문장으로 쓰세요.
+"""
+
+def _open_session(request):
+    """(세션, 이번 질문). session_id 가 없거나 만료됐으면 새 세션 (messages 로 기록을 채움)"""
+    session = chat_sessions.get(request.session_id)
+    history = [{"role": m.role, "content": m.content} for m in request.messages]
+    content = request.message
+    if history and history[-1]["role"] == "user" and (content is None or history[-1]["content"] == content):
+        content = history.pop()["content"]  # 기록 마지막이 이번 질문이면 중복으로 넣지 않음
+    if not content or not content.strip():
+        raise HTTPException(status_code=400, detail="질문 내용이 없습니다.")
+    if session is None:
+        session = chat_sessions.create(h for h in history if h["role"] in ("user", "assistant"))
+    return session, content
+
+async def _compact(session):
+    """예산 밖으로 밀려난 대화를 요약에 합침 (응답을 보낸 뒤 백그라운드에서)"""
+    async with session.lock:
+        old = chat_sessions.overflow(session)
+        if not old:
+            return
+        dialog = "\n".join(f"{'사용자' if t['role'] == 'user' else '약사 AI'}: {t['content']}" for t in old)
+        try:
+            async with _chat_slots:
+                response = await client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=[
+                        {"role": "system", "content": SUMMARY_PROMPT},
+                        {"role": "user", "content": f"[이전 요약]\n{session.summary or '(없음)'}\n\n[이어진 대화]\n{dialog}"},
+                    ],
+                    temperature=0,
+                    max_tokens=chat_sessions.CHAT_SUMMARY_TOKENS * 2,
+                )
+        except Exception as e:
+            print(f"Chat Summary Error: {e}")
+            return  # 대화는 그대로 두고 다음 턴에 다시 시도
+        # 요약 호출을 기다리는 동안 들어온 요청도 옛 대화를 볼 수 있도록, 요약을 쓰는 순간에 같이 제거
+        session.summary = (response.choices[0].message.content or "").strip()
+        chat_sessions.drop_oldest(session, len(old))
+
+# 이벤트 루프는 태스크를 약한 참조로만 들고 있어서, 참조를 남기지 않으면 요약 도중 GC 될 수 있음
+_compact_tasks = set()
+
+def _remember(session, content, reply):
+    chat_sessions.append(session, content, reply)
+    task = asyncio.create_task(_compact(session))
+    _compact_tasks.add(task)
+    task.add_done_callback(_compact_tasks.discard)
+
+async def _stream_reply(session, content, messages):
+    """
+    SSE: data: {"delta": "..."} 를 토큰이 오는 대로 보내고 마지막에 data: {"done": true, "reply": 전체, "links": [...], "session_id"}
+    자리(_chat_slots)는 스트림 안에서 잡고 끝날 때 반납 (응답이 시작되지 않으면 잡지도 않음)
+    """
+    try:
+        await _acquire_slot()
+    except HTTPException as e:
+        yield _sse({"error": e.detail})
+        return
+    try:
+        stream = await client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            temperature=0.7,
+            stream=True,
+        )
+        parts = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield _sse({"delta": delta})
+        reply = "".join(parts)
+        _remember(session, content, reply)
+        yield _sse({"done": True, "reply": reply, "links": await _links(reply), "session_id": session.id})
+    except Exception as e:
+        print(f"Chat Error: {e}")
+        yield _sse({"error": "답변 생성 중 오류가 발생했습니다."})
+    finally:
+        _chat_slots.release()
+
 @router.post("")
 async def chat_with_ai(request: ChatRequest):
-    try:
-        # 대화 기록에 시스템 프롬프트 추가
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}] + [
-            {"role": m.role, "content": m.content} for m in request.messages
-        ]
+    # 시스템 프롬프트 + 요약 + 예산 안의 최근 대화 + 이번 질문 (대화가 길어져도 요청 크기 일정)
+    session, content = _open_session(request)
+    messages = chat_sessions.build_messages(session, SYSTEM_PROMPT, content)
 
+    if request.stream:
+        return StreamingResponse(
+            _stream_reply(session, content, messages),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    await _acquire_slot()
+    try:
         # GPT 호출
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # 또는 "gpt-4"
+        response = await client.chat.completions.create(
+            model=CHAT_MODEL,
             messages=messages,
             temperature=0.7,
         )
 
         ai_reply = response.choices[0].message.content
-        return {"reply": ai_reply}
+        _remember(session, content, ai_reply)
+        return {"reply": ai_reply, "links": await _links(ai_reply), "session_id": session.id}
 
+    except openai.APITimeoutError as e:
+        print(f"Chat Timeout: {e}")
+        raise HTTPException(status_code=504, detail="답변 시간이 초과되었습니다.")
     except Exception as e:
         print(f"Chat Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _chat_slots.release()
+
+@router.delete("/sessions/{session_id}")
+async def end_chat_session(session_id: str):
+    """대화 초기화 / 상담 종료 시 서버에 남은 기록 삭제"""
+    chat_sessions.delete(session_id)
+    return {"message": "상담 기록이 삭제되었습니다."}
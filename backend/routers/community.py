@@ -2,10 +2,9 @@ from fastapi import APIRouter, HTTPException, Depends, Header, UploadFile, File
 from pydantic import BaseModel
 from typing import List, Optional
 from db import get_conn
-from routers.auth import get_current_user
-import shutil
-import os
-import uuid
+from async_db import get_async_db
+from services import view_counter, blob_store
+from routers.auth import get_current_user, get_current_user_async
 
 router = APIRouter(prefix="/api/community", tags=["Community"])
 
@@ -26,18 +25,11 @@ class CommentCreate(BaseModel):
 # ---------------------------------------------------
 @router.post("/upload")
 async def upload_image(file: UploadFile = File(...)):
-    UPLOAD_DIR = "uploads"
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"community_{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # 공용 업로드 저장소 (같은 이미지는 한 번만 저장, 크기 제한, HEIC 변환)
+    blob = await blob_store.store_upload(file)
         
     # 이미지가 저장된 서버 주소 반환
-    image_url = f"http://3.38.78.49:8000/uploads/{unique_filename}"
+    image_url = f"http://3.38.78.49:8000{blob['url']}"
     return {"url": image_url}
 
 # ---------------------------------------------------
@@ -64,95 +56,87 @@ def create_post(post: PostCreate, user: dict = Depends(get_current_user)):
 # 2. 게시글 목록 조회
 # ---------------------------------------------------
 @router.get("/{category}")
-def get_posts(category: str, authorization: Optional[str] = Header(None)):
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            search_id = 0 
-            if authorization:
-                try:
-                    token = authorization.split(" ")[1]
-                    user = get_current_user(token)
-                    if user:
-                        search_id = user['id']
-                except:
-                    pass
-
-            base_query = """
-                SELECT p.*, u.username, u.name as nickname, u.profile_image,
-                (SELECT COUNT(*) FROM comments c WHERE c.post_id = p.id) as comment_count,
-                (SELECT COUNT(*) FROM post_likes pl WHERE pl.post_id = p.id AND pl.user_id = %s) as is_liked_val
-                FROM posts p 
-                JOIN users u ON p.user_id = u.id 
-                WHERE p.category = %s AND p.is_hidden = 0 
-                ORDER BY p.created_at DESC
-            """
-            cur.execute(base_query, (search_id, category))
-            
-            rows = cur.fetchall()
-            for row in rows:
-                row['is_liked'] = bool(row['is_liked_val'])
-            return rows
-    finally:
-        conn.close()
+async def get_posts(category: str, authorization: Optional[str] = Header(None), conn=Depends(get_async_db)):
+    async with conn.cursor() as cur:
+        search_id = 0 
+        if authorization:
+            try:
+                token = authorization.split(" ")[1]
+                user = await get_current_user_async(token, conn)
+                if user:
+                    search_id = user['id']
+            except:
+                pass
+
+        base_query = """
+            SELECT p.*, u.username, u.name as nickname, u.profile_image,
+            (SELECT COUNT(*) FROM comments c WHERE c.post_id = p.id) as comment_count,
+            (SELECT COUNT(*) FROM post_likes pl WHERE pl.post_id = p.id AND pl.user_id = %s) as is_liked_val
+            FROM posts p 
+            JOIN users u ON p.user_id = u.id 
+            WHERE p.category = %s AND p.is_hidden = 0 
+            ORDER BY p.created_at DESC
+        """
+        await cur.execute(base_query, (search_id, category))
+        
+        rows = await cur.fetchall()
+        for row in rows:
+            row['is_liked'] = bool(row['is_liked_val'])
+        return rows
 
 # ---------------------------------------------------
 # 3. 게시글 상세 조회
 # ---------------------------------------------------
 @router.get("/post/{post_id}")
-def get_post_detail(post_id: int, authorization: Optional[str] = Header(None)):
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            # 1. 조회수 증가
-            cur.execute("UPDATE posts SET views = views + 1 WHERE id = %s", (post_id,))
-            conn.commit()
-
-            # 2. 게시글 상세 정보 가져오기
-            sql = """
-                SELECT p.*, u.username, u.name as nickname, u.profile_image,
-                (SELECT COUNT(*) FROM post_likes WHERE post_id = p.id) as real_like_count
-                FROM posts p 
-                JOIN users u ON p.user_id = u.id 
-                WHERE p.id = %s
-            """
-            cur.execute(sql, (post_id,))
-            post = cur.fetchone()
-            if not post: raise HTTPException(status_code=404, detail="Post not found")
-            
-            # ✅ [추가] 3. 해당 게시글의 댓글 목록 가져오기
-            comment_sql = """
-                SELECT c.*, u.name as nickname, u.profile_image 
-                FROM comments c
-                JOIN users u ON c.user_id = u.id
-                WHERE c.post_id = %s
-                ORDER BY c.created_at ASC
-            """
-            cur.execute(comment_sql, (post_id,))
-            comments = cur.fetchall() # 댓글 목록 데이터들
-            
-            # 4. 좋아요 확인 로직
-            post['like_count'] = post['real_like_count']
-            is_liked = False
-            if authorization:
-                try:
-                    token = authorization.split(" ")[1]
-                    user = get_current_user(token)
-                    cur.execute("SELECT 1 FROM post_likes WHERE user_id=%s AND post_id=%s", (user['id'], post_id))
-                    if cur.fetchone(): is_liked = True
-                except: pass
-            
-            post['is_liked'] = is_liked
-
-            # ✅ [수정] 5. 게시글 정보와 댓글 목록을 함께 리턴
-            # 기존: return post
-            # 변경: 아래처럼 댓글 리스트를 포함해서 보내야 합니다.
-            return {
-                "post": post,
-                "comments": comments
-            }
-    finally:
-        conn.close()
+async def get_post_detail(post_id: int, authorization: Optional[str] = Header(None), conn=Depends(get_async_db)):
+    async with conn.cursor() as cur:
+        # 1. 게시글 상세 정보 가져오기
+        sql = """
+            SELECT p.*, u.username, u.name as nickname, u.profile_image,
+            (SELECT COUNT(*) FROM post_likes WHERE post_id = p.id) as real_like_count
+            FROM posts p 
+            JOIN users u ON p.user_id = u.id 
+            WHERE p.id = %s
+        """
+        await cur.execute(sql, (post_id,))
+        post = await cur.fetchone()
+        if not post: raise HTTPException(status_code=404, detail="Post not found")
+
+        # 2. 조회수 증가 — 모아서 몇 초마다 한 번에 반영 (services/view_counter)
+        view_counter.post_views.incr(post_id)
+        post['views'] = (post.get('views') or 0) + view_counter.post_views.pending(post_id)
+        
+        # ✅ [추가] 3. 해당 게시글의 댓글 목록 가져오기
+        comment_sql = """
+            SELECT c.*, u.name as nickname, u.profile_image 
+            FROM comments c
+            JOIN users u ON c.user_id = u.id
+            WHERE c.post_id = %s
+            ORDER BY c.created_at ASC
+        """
+        await cur.execute(comment_sql, (post_id,))
+        comments = await cur.fetchall() # 댓글 목록 데이터들
+        
+        # 4. 좋아요 확인 로직
+        post['like_count'] = post['real_like_count']
+        is_liked = False
+        if authorization:
+            try:
+                token = authorization.split(" ")[1]
+                user = await get_current_user_async(token, conn)
+                await cur.execute("SELECT 1 FROM post_likes WHERE user_id=%s AND post_id=%s", (user['id'], post_id))
+                if await cur.fetchone(): is_liked = True
+            except: pass
+        
+        post['is_liked'] = is_liked
+
+        # ✅ [수정] 5. 게시글 정보와 댓글 목록을 함께 리턴
+        # 기존: return post
+        # 변경: 아래처럼 댓글 리스트를 포함해서 보내야 합니다.
+        return {
+            "post": post,
+            "comments": comments
+        }
 
 # ---------------------------------------------------
 # 5. 게시글 삭제
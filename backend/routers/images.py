@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from pathlib import Path
+import asyncio
+import hashlib
+import threading
+
+from cachetools import LRUCache
+
+from services import image_pool
+
+# ---------------------------------------------------------
+# 업로드 이미지 크기별 변환본 (썸네일/아바타 등)
+# GET /api/images/{filename}?preset=thumb&format=auto  (filename 은 uploads 기준 경로, 예: blobs/ab/cd/<sha256>.jpg)
+# - 처음 요청 때 워커 프로세스에서 만들고 원본 옆에 {이름}.{preset}.{원본 해시}.{확장자} 로 저장, 이후엔 파일 그대로
+# - 원본 내용이 바뀌면 해시가 바뀌어 새 파일 -> 오래 캐시해도 안전 (Cache-Control immutable + ETag)
+# ---------------------------------------------------------
+router = APIRouter(prefix="/api/images", tags=["images"])
+
+UPLOAD_DIR = Path(__file__).resolve().parent.parent / "uploads"
+
+# preset -> 긴 변 최대 픽셀
+PRESETS = {
+    "avatar": 96,    # 48px 아바타 x2 (레티나)
+    "thumb": 320,    # 목록 썸네일
+    "medium": 800,   # 상세 본문
+    "large": 1600,
+}
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 원본 해시는 (경로, 크기, 수정 시각) 이 같으면 다시 계산하지 않음
+_digests = LRUCache(maxsize=4096)
+_digests_lock = threading.Lock()
+
+
+def _original_digest(path: Path) -> str:
+    st = path.stat()
+    key = (str(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()[:16]
+        with _digests_lock:
+            _digests[key] = digest
+    return digest
+
+
+@router.get("/{filename:path}")
+async def get_image_variant(
+    filename: str,
+    request: Request,
+    preset: str = Query("thumb", description="avatar / thumb / medium / large"),
+    format: str = Query("auto", description="auto(브라우저가 지원하면 webp) / webp / jpeg"),
+):
+    if preset not in PRESETS:
+        raise HTTPException(status_code=400, detail=f"preset 은 {', '.join(PRESETS)} 중 하나여야 합니다.")
+    if format == "auto":
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    elif format in MEDIA_TYPES:
+        fmt = format
+    else:
+        raise HTTPException(status_code=400, detail="format 은 auto / webp / jpeg 중 하나여야 합니다.")
+
+    # uploads 아래 파일만 (경로 조작 / 숨김·임시 폴더 방지)
+    original = (UPLOAD_DIR / filename).resolve()
+    if UPLOAD_DIR.resolve() not in original.parents or any(part.startswith(".") or part == "tmp" for part in Path(filename).parts):
+        raise HTTPException(status_code=404, detail="이미지를 찾을 수 없습니다.")
+    if not original.is_file():
+        raise HTTPException(status_code=404, detail="이미지를 찾을 수 없습니다.")
+
+    digest = await asyncio.to_thread(_original_digest, original)
+    etag = f'"{digest}-{preset}-{fmt}"'
+    headers = {"Cache-Control": CACHE_CONTROL, "ETag": etag}
+    if format == "auto":
+        headers["Vary"] = "Accept"
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    variant = original.parent / f"{original.stem}.{preset}.{digest}.{'jpg' if fmt == 'jpeg' else fmt}"
+    if not variant.exists():
+        try:
+            await image_pool.run(image_pool.make_derivative, str(original), str(variant), PRESETS[preset], fmt)
+        except image_pool.ImagePoolBusy:
+            raise HTTPException(status_code=503, detail="서버가 혼잡합니다. 잠시 후 다시 시도해주세요.")
+        except Exception as e:
+            print(f"이미지 변환 실패 ({filename}): {e}")
+            raise HTTPException(status_code=415, detail="변환할 수 없는 이미지입니다.")
+
+    return FileResponse(variant, media_type=MEDIA_TYPES[fmt], headers=headers)
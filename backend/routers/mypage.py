@@ -3,10 +3,8 @@ from pydantic import BaseModel
 from typing import Optional
 from db import get_conn
 from routers.auth import get_current_user
+from services import principal_cache, blob_store
 from utils.security import verify_password, get_password_hash
-import shutil
-import os
-import uuid
 
 router = APIRouter(prefix="/api/mypage", tags=["mypage"])
 
@@ -54,6 +52,7 @@ def update_my_profile(data: ProfileUpdate, current_user: dict = Depends(get_curr
             """
             cur.execute(sql, (data.name, data.real_name, data.birthdate, data.phone, data.email, current_user['username']))
             conn.commit()
+            principal_cache.invalidate(username=current_user['username'])
             return {"message": "프로필이 성공적으로 수정되었습니다."}
     except Exception as e:
         print(f"프로필 수정 에러: {e}")
@@ -91,22 +90,19 @@ def update_my_password(data: PasswordUpdate, current_user: dict = Depends(get_cu
 @router.post("/profile/image")
 async def upload_profile_image(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
     try:
-        UPLOAD_DIR = "uploads"
-        file_extension = file.filename.split(".")[-1]
-        unique_filename = f"{current_user['username']}_{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        image_url = f"http://3.38.78.49:8000/uploads/{unique_filename}"
+        # 공용 업로드 저장소 (같은 이미지는 한 번만 저장, 크기 제한, HEIC 변환)
+        blob = await blob_store.store_upload(file)
+        image_url = f"http://3.38.78.49:8000{blob['url']}"
         
         conn = get_conn()
         with conn.cursor() as cur:
             cur.execute("UPDATE users SET profile_image = %s WHERE id = %s", (image_url, current_user['id']))
             conn.commit()
         conn.close()
+        principal_cache.invalidate(username=current_user['username'])
         return {"imageUrl": image_url}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"이미지 업로드 실패: {e}")
         raise HTTPException(status_code=500, detail="이미지 저장 중 오류가 발생했습니다.")
@@ -199,6 +195,7 @@ def withdraw_account(current_user: dict = Depends(get_current_user)):
         with conn.cursor() as cur:
             cur.execute("DELETE FROM users WHERE id = %s", (current_user['id'],))
             conn.commit()
+            principal_cache.invalidate(username=current_user['username'])
             return {"message": "회원 탈퇴가 완료되었습니다."}
     except Exception as e:
         print(f"탈퇴 에러: {e}")
@@ -1,6 +1,9 @@
 import os
 import json
 import re
+import base64
+import hashlib
+import asyncio
 import pymysql
 from typing import Optional, List, Dict, Any
 
@@ -9,7 +12,10 @@ from jose import jwt, JWTError
 import google.generativeai as genai
 from dotenv import load_dotenv
 
-from db import get_conn
+from db import get_conn, get_db
+from async_db import get_async_db
+from utils.text import normalize_search_text, like_prefix, like_contains
+from services import pill_index, search_cache, view_counter, principal_cache, recognition_cache
 
 # ---------------------------------------------------------
 # [0] 환경 설정
@@ -19,6 +25,12 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
+# 키워드 FULLTEXT 검색 (migrations/002). 끄면 예전 LIKE 검색만 사용
+PILL_FULLTEXT_SEARCH = os.getenv("PILL_FULLTEXT_SEARCH", "1") == "1"
+NGRAM_TOKEN_SIZE = int(os.getenv("NGRAM_TOKEN_SIZE", 2)) # 이보다 짧은 검색어는 색인에 없어서 LIKE 로 검색
+# 사진 분석: 각인으로 찾은 색인 후보 중 모양/색상 필터를 적용해 볼 최대 개수 (메모리에서 거르므로 넉넉하게)
+ANALYZE_INDEX_SCAN = int(os.getenv("ANALYZE_INDEX_SCAN", 5000))
+
 if not GOOGLE_API_KEY:
     print("❌ [ERROR] GOOGLE_API_KEY가 없습니다.")
 else:
@@ -30,7 +42,7 @@ router = APIRouter(prefix="/api/pills", tags=["pills"])
 # ---------------------------------------------------------
 # [1] 유저 ID 추출 헬퍼 함수 (토큰 만료 방지)
 # ---------------------------------------------------------
-def get_current_user_id_optional(request: Request) -> Optional[int]:
+def _username_from_request(request: Request) -> Optional[str]:
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         return None
@@ -38,19 +50,34 @@ def get_current_user_id_optional(request: Request) -> Optional[int]:
     token = auth_header.split(" ")[1]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if not username: return None
-            
-        conn = get_conn()
-        try:
+        return payload.get("sub")
+    except Exception:
+        return None
+
+# 요청 핸들러와 같은 Depends(get_db) 연결을 공유하므로 유저 조회용 연결을 따로 꺼내지 않음
+# 사용자 정보는 services/principal_cache 를 거치므로 캐시에 있으면 쿼리 없음
+def get_current_user_id_optional(request: Request, conn=Depends(get_db)) -> Optional[int]:
+    username = _username_from_request(request)
+    if not username: return None
+    try:
+        user = principal_cache.get(username)
+        if user is None:
             with conn.cursor() as cur:
-                cur.execute("SELECT id FROM users WHERE username = %s", (username,))
-                row = cur.fetchone()
-                if row:
-                    return row['id'] if isinstance(row, dict) else row[0]
-                return None
-        finally:
-            conn.close()
+                cur.execute(f"SELECT {principal_cache.USER_COLUMNS} FROM users WHERE username = %s", (username,))
+                user = cur.fetchone()
+            if user is None: return None
+            principal_cache.put(user)
+        return None if user.get('is_banned') else user['id']
+    except Exception:
+        return None
+
+# async 핸들러용 (async_db 연결 공유)
+async def get_current_user_id_optional_async(request: Request, conn=Depends(get_async_db)) -> Optional[int]:
+    username = _username_from_request(request)
+    if not username: return None
+    try:
+        user = await principal_cache.load_user_async(conn, username)
+        return None if not user or user.get('is_banned') else user['id']
     except Exception:
         return None
 
@@ -81,10 +108,63 @@ def ask_gemini(image_bytes):
         print(f"❌ Gemini 분석 실패: {e}")
         return None
 
+def _shape_color_ok(row, shape, color):
+    return (not shape or row.get('drug_shape') == shape) \
+        and (not color or color in (row.get('color_class1'), row.get('color_class2')))
+
+def _filter_index_candidates(index, ids, shape, color):
+    """
+    각인 후보(doc id, 각인 순위순) 중 모양/색상이 맞는 상위 20개의 item_seq.
+    자르기 전에 거르므로 각인 순위가 낮아도 색상이 맞는 약이 빠지지 않음. 맞는 게 없으면 각인 상위 10개
+    """
+    filtered = [i for i in ids if _shape_color_ok(index.rows[i], shape, color)][:20]
+    return [index.rows[i]["item_seq"] for i in (filtered or ids[:10])]
+
+def _match_by_index(seqs, shape, color):
+    """
+    색인에서 찾은 후보(인기순)의 상세 정보를 한 번에 가져온 뒤 모양/색상 필터는 메모리에서 적용.
+    필터에 맞는 약이 없으면 각인만 맞는 상위 10개 (DB 검색의 Fallback 과 같은 동작)
+    """
+    if not seqs:
+        return []
+    conn = get_conn()
+    try:
+        with conn.cursor(pymysql.cursors.DictCursor) as cur:
+            placeholders = ", ".join(["%s"] * len(seqs))
+            cur.execute(f"""
+                SELECT m.*, 
+                       e.efcy_qesitm, e.use_method_qesitm, e.atpn_warn_qesitm, 
+                       e.atpn_qesitm, e.intrc_qesitm, e.se_qesitm, e.deposit_method_qesitm
+                FROM pill_mfds AS m
+                LEFT JOIN pill_easy_info AS e ON m.item_seq = e.item_seq
+                WHERE m.item_seq IN ({placeholders})
+            """, tuple(seqs))
+            by_seq = {str(row['item_seq']).strip(): row for row in cur.fetchall()}
+    finally:
+        conn.close()
+
+    ordered = [by_seq[str(seq).strip()] for seq in seqs if str(seq).strip() in by_seq]
+    filtered = [row for row in ordered if _shape_color_ok(row, shape, color)]
+    return filtered[:20] or ordered[:10]
+
+def _analyze_response(matched_pills, s, c, p):
+    results = []
+    for pill in matched_pills:
+        if pill.get('item_image'):
+            pill['item_image'] = pill['item_image'].replace('127.0.0.1', '3.38.78.49')
+        results.append({"detected_info": {"shape": s, "color": c, "print": p}, "pill_info": pill})
+    return {"success": True, "results": results}
+
 @router.post("/analyze")
 async def analyze_pill(file: UploadFile = File(...)):
     contents = await file.read()
-    gemini_result = ask_gemini(contents)
+    # 같은 사진이면 Gemini 를 다시 부르지 않음 (해시 계산/캐시 조회/Gemini 호출은 스레드에서 -> 이벤트 루프를 막지 않음)
+    fp = await asyncio.to_thread(recognition_cache.fingerprint, contents, "pill")
+    gemini_result = await asyncio.to_thread(recognition_cache.lookup, "pill", fp)
+    if gemini_result is None:
+        gemini_result = await asyncio.to_thread(ask_gemini, contents)
+        if gemini_result:
+            await asyncio.to_thread(recognition_cache.store, "pill", fp, gemini_result)
     
     if not gemini_result:
         return {"success": False, "message": "AI 분석 실패"}
@@ -92,33 +172,51 @@ async def analyze_pill(file: UploadFile = File(...)):
     s = gemini_result.get("shape", "").strip()
     c = gemini_result.get("color", "").strip()
     p = gemini_result.get("print", "").strip()
+    p_norm = normalize_search_text(p)
     
+    # 메모리 각인 색인이 있으면 후보 item_seq 를 바로 뽑고 DB 는 상세 JOIN 한 번만
+    index = pill_index.get_index()
+    if index is not None and p_norm:
+        # 각인이 그대로 들어 있는 약이 없으면 OCR 오타를 감안한 비슷한 각인으로
+        ids = index.search_ids(p_norm, limit=ANALYZE_INDEX_SCAN, include_name=False) \
+            or [i for i, _ in index.fuzzy_search_ids(p_norm, limit=ANALYZE_INDEX_SCAN)]
+        matched_pills = _match_by_index(_filter_index_candidates(index, ids, s, c), s, c)
+        return _analyze_response(matched_pills, s, c, p)
+
     conn = get_conn()
     try:
         with conn.cursor(pymysql.cursors.DictCursor) as cur:
             # ✅ 핵심 수정: m.* 뿐만 아니라 e의 상세 컬럼들도 SELECT 하고 LEFT JOIN 추가
-            sql = """
-                SELECT m.*, 
-                       e.efcy_qesitm, e.use_method_qesitm, e.atpn_warn_qesitm, 
-                       e.atpn_qesitm, e.intrc_qesitm, e.se_qesitm, e.deposit_method_qesitm
-                FROM pill_mfds AS m
-                LEFT JOIN pill_easy_info AS e ON TRIM(m.item_seq) = TRIM(e.item_seq)
-                WHERE 1=1
-            """
-            params = []
-            if s:
-                sql += " AND m.drug_shape = %s"
-                params.append(s)
-            if c:
-                sql += " AND (m.color_class1 = %s OR m.color_class2 = %s)"
-                params.extend([c, c])
-            if p:
-                sql += " AND (m.print_front LIKE %s OR m.print_back LIKE %s)"
-                params.extend([f"%{p}%", f"%{p}%"])
-
-            sql += " LIMIT 20"
-            cur.execute(sql, tuple(params))
-            matched_pills = cur.fetchall()
+            # 각인은 접두 일치(인덱스)로 먼저 찾고, 20개가 안 되면 중간 일치(접두 일치 제외)로 남은 자리만 채움
+            matched_pills = []
+            for like in ((like_prefix, like_contains) if p else (like_contains,)):
+                sql = """
+                    SELECT m.*, 
+                           e.efcy_qesitm, e.use_method_qesitm, e.atpn_warn_qesitm, 
+                           e.atpn_qesitm, e.intrc_qesitm, e.se_qesitm, e.deposit_method_qesitm
+                    FROM pill_mfds AS m
+                    LEFT JOIN pill_easy_info AS e ON TRIM(m.item_seq) = TRIM(e.item_seq)
+                    WHERE 1=1
+                """
+                params = []
+                if s:
+                    sql += " AND m.drug_shape = %s"
+                    params.append(s)
+                if c:
+                    sql += " AND (m.color_class1 = %s OR m.color_class2 = %s)"
+                    params.extend([c, c])
+                if p:
+                    sql += " AND (m.print_front_norm LIKE %s OR m.print_back_norm LIKE %s)"
+                    params.extend([like(p_norm), like(p_norm)])
+                if p and like is like_contains:
+                    sql += " AND NOT (COALESCE(m.print_front_norm, '') LIKE %s OR COALESCE(m.print_back_norm, '') LIKE %s)"
+                    params.extend([like_prefix(p_norm), like_prefix(p_norm)])
+
+                sql += " LIMIT %s"
+                params.append(20 - len(matched_pills))
+                cur.execute(sql, tuple(params))
+                matched_pills += cur.fetchall()
+                if len(matched_pills) >= 20: break
 
             #Fallback: 결과 없을 때 재검색 시에도 JOIN 유지
             if len(matched_pills) < 1 and p:
@@ -127,19 +225,14 @@ async def analyze_pill(file: UploadFile = File(...)):
                            e.atpn_qesitm, e.intrc_qesitm, e.se_qesitm, e.deposit_method_qesitm
                     FROM pill_mfds AS m
                     LEFT JOIN pill_easy_info AS e ON TRIM(m.item_seq) = TRIM(e.item_seq)
-                    WHERE (m.print_front LIKE %s OR m.print_back LIKE %s) LIMIT 10
+                    WHERE (m.print_front_norm LIKE %s OR m.print_back_norm LIKE %s) LIMIT 10
                 """
-                cur.execute(sql, (f"%{p}%", f"%{p}%"))
+                cur.execute(sql, (like_contains(p_norm), like_contains(p_norm)))
                 matched_pills = cur.fetchall()
     finally:
         conn.close()
 
-    results = []
-    for pill in matched_pills:
-        if pill.get('item_image'):
-            pill['item_image'] = pill['item_image'].replace('127.0.0.1', '3.38.78.49')
-        results.append({"detected_info": {"shape": s, "color": c, "print": p}, "pill_info": pill})
-    return {"success": True, "results": results}
+    return _analyze_response(matched_pills, s, c, p)
 
     # 이미지 URL 보정 및 결과 정리
     results = []
@@ -155,8 +248,222 @@ async def analyze_pill(file: UploadFile = File(...)):
 # ---------------------------------------------------------
 # [3] 통합 검색 API (검색 기록 저장 + 상세 필터링)
 # ---------------------------------------------------------
+def _fulltext_query(keyword):
+    """
+    키워드를 BOOLEAN MODE 검색식으로 변환 ('타이레놀 두통' -> '+"타이레놀" +"두통"').
+    ngram 토큰보다 짧은 단어는 색인에 없으므로 빼고, 남는 단어가 없으면 None (LIKE 검색 사용)
+    """
+    if not PILL_FULLTEXT_SEARCH or not keyword:
+        return None
+    terms = [re.sub(r'[+\-<>()~*"@]', "", t) for t in keyword.split()]
+    terms = [t for t in terms if len(t) >= NGRAM_TOKEN_SIZE]
+    if not terms:
+        return None
+    return " ".join(f'+"{normalize_search_text(t)}"' for t in terms)
+
+def _fulltext_from(ft_query):
+    """
+    FROM 절 (+ 파라미터).
+    이름/제조사(pill_mfds)와 효능(pill_easy_info) 색인을 각각 따로 조회해서 합침.
+    두 MATCH 를 OR 로 묶으면 인덱스를 못 타기 때문에 UNION ALL 로 나눔.
+    이름 일치는 효능 일치보다 relevance 가중치 2배.
+    이름/제조사는 공백 없는 *_norm 컬럼 색인(migrations/005) -> '타이레놀정' 으로 '타이레놀 정' 도 찾음.
+    relevance 는 소수 6자리 DECIMAL 로 고정 (float 그대로면 키셋 커서의 = 비교가 흔들림)
+    """
+    sql = """
+        FROM (
+            SELECT item_seq, CAST(SUM(score) AS DECIMAL(20, 6)) AS relevance FROM (
+                SELECT item_seq, MATCH(item_name_norm, entp_name_norm) AGAINST (%s IN BOOLEAN MODE) * 2 AS score
+                FROM pill_mfds WHERE MATCH(item_name_norm, entp_name_norm) AGAINST (%s IN BOOLEAN MODE)
+                UNION ALL
+                SELECT item_seq, MATCH(efcy_qesitm) AGAINST (%s IN BOOLEAN MODE) AS score
+                FROM pill_easy_info WHERE MATCH(efcy_qesitm) AGAINST (%s IN BOOLEAN MODE)
+            ) AS hits GROUP BY item_seq
+        ) AS ft
+        JOIN pill_mfds AS m ON m.item_seq = ft.item_seq
+        LEFT JOIN pill_easy_info AS e ON m.item_seq = e.item_seq
+    """
+    return sql, [ft_query] * 4
+
+def _search_from(ft_query):
+    """(FROM 절, 파라미터, relevance 식)"""
+    if ft_query:
+        base_from, from_params = _fulltext_from(ft_query)
+        return base_from, from_params, "ft.relevance"
+    return "FROM pill_mfds AS m LEFT JOIN pill_easy_info AS e ON m.item_seq = e.item_seq", [], "0"
+
+def _build_search_filters(keyword, drug_shape, color_class, print_front, print_back, entp_name, prefix=False, fulltext=False, exclude_prefix=False):
+    """
+    WHERE 절과 파라미터 생성.
+    이름/제조사/각인은 공백 제거 + 대문자로 미리 저장된 *_norm 컬럼(migrations/001)과 비교.
+    prefix=True 면 각인/제조사 필터를 접두 일치('ABC%')로 걸어 인덱스를 타게 함.
+    exclude_prefix=True 면 중간 일치 중 접두 일치 단계에서 이미 나온 행은 뺌 (_search_page 의 "infix" 단계).
+    fulltext=True 면 키워드 조건은 _fulltext_from 의 JOIN 이 대신하므로 여기서는 생략.
+    """
+    like = like_prefix if prefix else like_contains
+    where_clauses = ["1=1"]
+    params = []
+
+    if keyword and not fulltext:
+        # 공백 제거 검색을 위해 키워드도 공백 제거
+        k_norm = like_contains(normalize_search_text(keyword))
+        where_clauses.append("(m.item_name_norm LIKE %s OR m.entp_name_norm LIKE %s OR replace(e.efcy_qesitm,' ','') LIKE %s)")
+        params.extend([k_norm, k_norm, k_norm])
+
+    if drug_shape:
+        where_clauses.append("m.drug_shape = %s")     # <- = 은 '완전 일치' 검색
+        params.append(drug_shape)                     # <- % 를 지워서 정확한 단어만 매칭
+
+    if color_class:
+        where_clauses.append("(m.color_class1 LIKE %s OR m.color_class2 LIKE %s)")
+        params.extend([f"%{color_class}%", f"%{color_class}%"])
+
+    text_filters = [
+        (col, normalize_search_text(value))
+        for col, value in (("m.print_front_norm", print_front), ("m.print_back_norm", print_back), ("m.entp_name_norm", entp_name))
+        if value
+    ]
+    for col, value in text_filters:
+        where_clauses.append(f"{col} LIKE %s")
+        params.append(like(value))
+
+    if exclude_prefix and text_filters:
+        where_clauses.append("NOT (" + " AND ".join(f"{col} LIKE %s" for col, _ in text_filters) + ")")
+        params.extend(like_prefix(value) for _, value in text_filters)
+
+    return "WHERE " + " AND ".join(where_clauses), params
+
+# ---------------------------------------------------------
+# 각인/제조사 검색 단계
+# "prefix": 접두 일치 (인덱스) -> "infix": 접두 일치가 아닌 중간 일치 ('AB' 검색의 'XAB')
+# 접두 일치 결과가 항상 앞에 오고, 중간 일치는 접두 일치로 페이지가 안 찰 때만 조회 (그때만 스캔)
+# 각인/제조사 필터가 없으면 단계 구분 없이 "all" 하나
+# ---------------------------------------------------------
+SEARCH_SELECT = """
+    SELECT m.*, 
+           e.efcy_qesitm, e.use_method_qesitm, e.atpn_warn_qesitm, 
+           e.atpn_qesitm, e.intrc_qesitm, e.se_qesitm, e.deposit_method_qesitm,
+           {relevance_col} AS relevance
+"""
+
+def _search_phases(print_front, print_back, entp_name):
+    return ("prefix", "infix") if (print_front or print_back or entp_name) else ("all",)
+
+def _phase_filters(filters, phase, fulltext):
+    return _build_search_filters(*filters, prefix=phase == "prefix", exclude_prefix=phase == "infix", fulltext=fulltext)
+
+async def _count_phase(cur, filters, phase, fulltext, base_from, from_params):
+    where_sql, params = _phase_filters(filters, phase, fulltext)
+    await cur.execute(f"SELECT COUNT(*) AS cnt {base_from} {where_sql}", tuple(from_params + params))
+    return (await cur.fetchone())["cnt"]
+
+async def _search_page(cur, filters, fulltext, base_from, from_params, relevance_col, sort_mode, counts,
+                       limit, offset=0, start_phase=None, keyset=None):
+    """
+    단계 순서대로 limit 개까지 -> [(단계, 행), ...]
+    offset 은 전체(접두 일치 + 중간 일치) 기준, keyset 은 start_phase 안에서의 마지막 행.
+    counts(단계 -> 개수, 모르면 없음)는 새로 알게 된 값으로 채워짐
+    """
+    phases = _search_phases(*filters[3:6])
+    order_by = _order_by(sort_mode)
+    rows = []
+    for n, phase in enumerate(phases[phases.index(start_phase) if start_phase else 0:]):
+        count = counts.get(phase)
+        if count is not None and offset >= count:
+            offset -= count  # 이 단계는 통째로 앞 페이지들
+            continue
+        where_sql, params = _phase_filters(filters, phase, fulltext)
+        params = from_params + params
+        use_keyset = keyset is not None and n == 0
+        if use_keyset:
+            keyset_sql, keyset_params = _keyset_clause(sort_mode, keyset)
+            where_sql += f" AND {keyset_sql}"
+            params += keyset_params
+        want = limit - len(rows)
+        sql = SEARCH_SELECT.format(relevance_col=relevance_col) + f" {base_from} {where_sql} {order_by} LIMIT %s OFFSET %s"
+        await cur.execute(sql, tuple(params + [want, offset]))
+        got = list(await cur.fetchall())
+        rows += [(phase, row) for row in got]
+        if count is None:
+            if len(got) < want and not use_keyset:
+                counts[phase] = offset + len(got)  # 끝까지 읽었으니 따로 셀 필요 없음
+            else:
+                counts[phase] = await _count_phase(cur, filters, phase, fulltext, base_from, from_params)
+        if len(rows) >= limit:
+            break
+        offset = 0  # 이 단계를 다 읽었으니 다음 단계는 처음부터
+    return rows
+
+# 정렬 방식별 키셋(커서) 컬럼: (SQL 식, 결과 dict 키, 방향). 마지막은 항상 유일한 item_seq
+# NULL 이 있을 수 있는 컬럼은 COALESCE 로 — 그대로면 "col < NULL" 이 참이 안 돼서 NULL 다음 행들이 빠지거나 반복됨
+_SORT_NULLS = {"view_count": 0, "item_name": ""}  # 결과 dict 키 -> NULL 대신 쓰는 값 (SQL 의 COALESCE 와 같게)
+_VIEW_COUNT = "COALESCE(m.view_count, 0)"
+_ITEM_NAME = "COALESCE(m.item_name, '')"
+_SORT_KEYS = {
+    "relevance": [("ft.relevance", "relevance", "DESC"), (_VIEW_COUNT, "view_count", "DESC"),
+                  (_ITEM_NAME, "item_name", "ASC"), ("m.item_seq", "item_seq", "ASC")],
+    "popular": [(_VIEW_COUNT, "view_count", "DESC"), (_ITEM_NAME, "item_name", "ASC"), ("m.item_seq", "item_seq", "ASC")],
+    "recent": [("m.item_seq", "item_seq", "DESC")],
+    "name": [(_ITEM_NAME, "item_name", "ASC"), ("m.item_seq", "item_seq", "ASC")],
+}
+
+def _order_by(sort_mode):
+    return "ORDER BY " + ", ".join(
+        f"{key if col == 'ft.relevance' else col} {direction}" for col, key, direction in _SORT_KEYS[sort_mode]
+    )
+
+def _filter_key(filters):
+    raw = json.dumps([f.strip() if isinstance(f, str) else f for f in filters], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+def _cursor_value(item, key):
+    value = item.get(key)
+    return _SORT_NULLS.get(key) if value is None else value
+
+def _encode_cursor(sort_mode, filter_key, last_item, counts, phase):
+    data = {
+        "s": sort_mode,
+        "f": filter_key,
+        "k": [_cursor_value(last_item, key) for _, key, _ in _SORT_KEYS[sort_mode]],
+        "t": counts,
+        "p": phase,
+    }
+    raw = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor, filter_key):
+    """형식/검색 조건만 확인. 정렬 방식(s)은 FULLTEXT 사용 여부가 정해진 뒤 호출한 쪽에서 확인"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        valid = (
+            data["s"] in _SORT_KEYS and data["f"] == filter_key and isinstance(data["k"], list)
+            and isinstance(data["t"], dict) and data["p"] in ("prefix", "infix", "all")
+        )
+    except Exception:
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=400, detail="잘못된 커서입니다. 첫 페이지부터 다시 검색해주세요.")
+    return data
+
+def _keyset_clause(sort_mode, values):
+    """
+    (a, b, c) 정렬에서 마지막 행 (va, vb, vc) 다음 행들:
+    a < va OR (a = va AND b > vb) OR (a = va AND b = vb AND c > vc)   (방향에 따라 < / >)
+    """
+    ors, params = [], []
+    keys = _SORT_KEYS[sort_mode]
+    for i, (col, _, direction) in enumerate(keys):
+        ands = []
+        for prev_col, _, _ in keys[:i]:
+            ands.append(f"{prev_col} = %s")
+        ands.append(f"{col} {'<' if direction == 'DESC' else '>'} %s")
+        ors.append("(" + " AND ".join(ands) + ")")
+        params.extend(values[:i + 1])
+    return "(" + " OR ".join(ors) + ")", params
+
 @router.get("")
-def search_pills(
+async def search_pills(
     keyword: Optional[str] = Query(None),
     drug_shape: Optional[str] = Query(None),
     color_class: Optional[str] = Query(None),
@@ -167,190 +474,195 @@ def search_pills(
     sort: str = Query("popular"),
     page: int = 1,
     page_size: int = 20,
-    current_user_id: Optional[int] = Depends(get_current_user_id_optional)
+    cursor: Optional[str] = Query(None), # 이전 응답의 next_cursor (무한 스크롤용, OFFSET 대신 사용)
+    current_user_id: Optional[int] = Depends(get_current_user_id_optional_async),
+    conn=Depends(get_async_db)
 ):
-    conn = get_conn()
-    try:
-        with conn.cursor(pymysql.cursors.DictCursor) as cur:
-            
-            # ✅ 1. 검색 기록 저장 (로그인 시 & 키워드 있을 시)
-            if keyword and current_user_id:
-                try:
-                    cur.execute("DELETE FROM search_history WHERE user_id = %s AND keyword = %s", (current_user_id, keyword))
-                    cur.execute("INSERT INTO search_history (user_id, keyword, created_at) VALUES (%s, %s, NOW())", (current_user_id, keyword))
-                    conn.commit()
-                except Exception as e:
-                    print(f"❌ 검색 기록 저장 실패: {e}")
-                    conn.rollback()
-
-            # ✅ 2. 검색 쿼리 구성 (search.py의 강력한 로직 사용)
-            base_from = "FROM pill_mfds AS m LEFT JOIN pill_easy_info AS e ON m.item_seq = e.item_seq"
-            where_clauses = ["1=1"]
-            params = []
-
-            if keyword:
-                k = f"%{keyword.strip()}%"
-                where_clauses.append("(replace(m.item_name,' ','') LIKE %s OR replace(m.entp_name,' ','') LIKE %s OR replace(e.efcy_qesitm,' ','') LIKE %s)")
-                # 공백 제거 검색을 위해 키워드도 공백 제거
-                k_nospace = f"%{keyword.strip().replace(' ', '')}%"
-                params.extend([k_nospace, k_nospace, k_nospace])
-
-            if drug_shape:
-                where_clauses.append("m.drug_shape = %s")     # <- = 은 '완전 일치' 검색
-                params.append(drug_shape)                     # <- % 를 지워서 정확한 단어만 매칭
-
-            if color_class:
-                where_clauses.append("(m.color_class1 LIKE %s OR m.color_class2 LIKE %s)")
-                params.extend([f"%{color_class}%", f"%{color_class}%"])
-            
-            if print_front:
-                where_clauses.append("m.print_front LIKE %s")
-                params.append(f"%{print_front}%")
-
-            if print_back:
-                where_clauses.append("m.print_back LIKE %s")
-                params.append(f"%{print_back}%")
-
-            if entp_name:
-                where_clauses.append("m.entp_name LIKE %s")
-                params.append(f"%{entp_name}%")
-
-            where_sql = "WHERE " + " AND ".join(where_clauses)
-
-            # 정렬
-            if sort == "popular":
-                order_by = "ORDER BY m.view_count DESC, m.item_name ASC"
-            elif sort == "recent":
-                order_by = "ORDER BY m.item_seq DESC"
-            else:
-                order_by = "ORDER BY m.item_name ASC"
-
-            # 개수 조회
-            cur.execute(f"SELECT COUNT(*) AS cnt {base_from} {where_sql}", tuple(params))
-            total = cur.fetchone()["cnt"]
-
-            # 목록 조회
-            offset = (page - 1) * page_size
-            sql = f"""
-                SELECT m.*, 
-                       e.efcy_qesitm, e.use_method_qesitm, e.atpn_warn_qesitm, 
-                       e.atpn_qesitm, e.intrc_qesitm, e.se_qesitm, e.deposit_method_qesitm 
-                {base_from} {where_sql} {order_by} LIMIT %s OFFSET %s
-            """
-            cur.execute(sql, tuple(params + [page_size, offset]))
-            items = cur.fetchall()
-
-            # 좋아요 여부 체크
-            if current_user_id:
-                cur.execute("SELECT item_seq FROM pill_likes WHERE user_id = %s", (current_user_id,))
-                liked_seqs = {row['item_seq'] for row in cur.fetchall()}
-                for item in items:
-                    item['is_liked'] = item['item_seq'] in liked_seqs
-            else:
-                for item in items:
-                    item['is_liked'] = False
-            
-            # 이미지 URL 수정
-            for item in items:
-                if item.get('item_image'):
-                    item['item_image'] = item['item_image'].replace('127.0.0.1', '3.38.78.49')
-
-            return {"items": items, "total": total, "page": page, "page_size": page_size}
-    finally:
-        conn.close()
+    async with conn.cursor() as cur:
+
+        # ✅ 1. 검색 기록 저장 (로그인 시 & 키워드 있을 시)
+        if keyword and current_user_id:
+            try:
+                await conn.begin() # 삭제 + 추가를 한 트랜잭션으로
+                await cur.execute("DELETE FROM search_history WHERE user_id = %s AND keyword = %s", (current_user_id, keyword))
+                await cur.execute("INSERT INTO search_history (user_id, keyword, created_at) VALUES (%s, %s, NOW())", (current_user_id, keyword))
+                await conn.commit()
+            except Exception as e:
+                print(f"❌ 검색 기록 저장 실패: {e}")
+                await conn.rollback()
+
+        # 같은 조건의 응답이 캐시에 있으면 DB 조회 없이 is_liked 만 덧씌워서 반환
+        filters = (keyword, drug_shape, color_class, print_front, print_back, entp_name)
+        cache_key = search_cache.make_key(*filters, sort, page, page_size, cursor)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return await _with_likes(cur, cached, current_user_id)
+
+        # 개수 — 단계(_search_page)별로 셈. 처음엔 접두 일치(인덱스)만 세고,
+        # 중간 일치 개수는 페이지가 중간 일치 단계까지 넘어갈 때 셈 -> 그 전까지 total 은 접두 일치 개수 (is_exact=False)
+        # 같은 조건의 개수는 캐시(또는 커서)에 있는 값을 재사용 -> is_exact=False
+        # counts["fulltext"] = 이 조건을 FULLTEXT 로 찾는지 (False 면 *_norm LIKE 검색)
+        phases = _search_phases(print_front, print_back, entp_name)
+        filter_key = _filter_key(filters)
+        cursor_data = _decode_cursor(cursor, filter_key) if cursor else None
+        if cursor_data:
+            counts = dict(cursor_data["t"])
+        else:
+            counts = dict(search_cache.get_total(filter_key) or {})
+        known = dict(counts)
+        is_exact = False
+
+        # ✅ 2. 검색 쿼리 구성 (search.py의 강력한 로직 사용)
+        # 키워드가 충분히 길면 FULLTEXT 색인으로, 짧거나 FULLTEXT 로 하나도 못 찾으면 예전 *_norm LIKE 검색으로
+        ft_query = _fulltext_query(keyword) if counts.get("fulltext") is not False else None
+        base_from, from_params, relevance_col = _search_from(ft_query)
+        if phases[0] not in counts:
+            counts[phases[0]] = await _count_phase(cur, filters, phases[0], bool(ft_query), base_from, from_params)
+            if ft_query and counts[phases[0]] == 0:
+                ft_query = None
+                base_from, from_params, relevance_col = _search_from(None)
+                counts[phases[0]] = await _count_phase(cur, filters, phases[0], False, base_from, from_params)
+            counts["fulltext"] = bool(ft_query)
+            is_exact = True
+        fulltext = bool(ft_query)
+
+        # 정렬
+        if sort == "relevance" and ft_query:
+            sort_mode = "relevance"
+        elif sort in ("popular", "relevance"):
+            sort_mode = "popular"
+        elif sort == "recent":
+            sort_mode = "recent"
+        else:
+            sort_mode = "name"
+        if cursor_data and (cursor_data["s"] != sort_mode or len(cursor_data["k"]) != len(_SORT_KEYS[sort_mode])):
+            raise HTTPException(status_code=400, detail="잘못된 커서입니다. 첫 페이지부터 다시 검색해주세요.")
+
+        # 목록 조회 — 커서가 있으면 마지막 행 다음부터(키셋), 없으면 기존 OFFSET
+        # 한 개 더 가져와서 다음 페이지가 있는지 확인
+        rows = await _search_page(
+            cur, filters, fulltext, base_from, from_params, relevance_col, sort_mode, counts,
+            limit=page_size + 1,
+            offset=0 if cursor_data else (page - 1) * page_size,
+            start_phase=cursor_data["p"] if cursor_data else None,
+            keyset=cursor_data["k"] if cursor_data else None,
+        )
+        if counts != known:
+            search_cache.put_total(filter_key, counts)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        items = [row for _, row in rows]
+        next_cursor = _encode_cursor(sort_mode, filter_key, rows[-1][1], counts, rows[-1][0]) if has_more else None
+        total = sum(counts.get(phase) or 0 for phase in phases)
+        is_exact = is_exact and all(phase in counts for phase in phases)
+
+        # 이미지 URL 수정
+        for item in items:
+            if item.get('item_image'):
+                item['item_image'] = item['item_image'].replace('127.0.0.1', '3.38.78.49')
+
+        response = {
+            "items": items, "total": total, "is_exact": is_exact, "page": page, "page_size": page_size,
+            "has_more": has_more, "next_cursor": next_cursor,
+        }
+        search_cache.put(cache_key, response)
+        return await _with_likes(cur, response, current_user_id)
+
+async def _with_likes(cur, response, current_user_id):
+    """캐시된 공용 응답은 건드리지 않고, 사용자별 좋아요 여부를 덧씌운 사본을 만듦"""
+    liked_seqs = set()
+    if current_user_id and response["items"]:
+        seqs = [item['item_seq'] for item in response["items"]]
+        placeholders = ", ".join(["%s"] * len(seqs))
+        await cur.execute(
+            f"SELECT item_seq FROM pill_likes WHERE user_id = %s AND item_seq IN ({placeholders})",
+            (current_user_id, *seqs),
+        )
+        liked_seqs = {row['item_seq'] for row in await cur.fetchall()}
+    items = [{**item, "is_liked": item['item_seq'] in liked_seqs} for item in response["items"]]
+    return {**response, "items": items}
 
 # ---------------------------------------------------------
 # [4] 약 상세 조회 API (search.py 기능 복구)
 # ---------------------------------------------------------
 @router.get("/{item_seq}")
-def get_pill_detail(item_seq: str, current_user_id: Optional[int] = Depends(get_current_user_id_optional)):
-    conn = get_conn()
-    try:
-        with conn.cursor(pymysql.cursors.DictCursor) as cur:
-            # 1. 조회수 증가 (TRIM 추가로 확실하게)
-            cur.execute("UPDATE pill_mfds SET view_count = view_count + 1 WHERE TRIM(item_seq) = %s", (item_seq.strip(),))
-            conn.commit()
+async def get_pill_detail(item_seq: str, current_user_id: Optional[int] = Depends(get_current_user_id_optional_async), conn=Depends(get_async_db)):
+    async with conn.cursor() as cur:
+        # 1. 상세 데이터 가져오기 — 컬럼 그대로 비교해서 PK 인덱스를 탐
+        # (앞에 공백이 붙은 채 저장된 예전 행은 못 찾았을 때만 TRIM 으로 한 번 더)
+        sql = """
+            SELECT m.*, 
+                   e.efcy_qesitm, e.use_method_qesitm, e.atpn_warn_qesitm, 
+                   e.atpn_qesitm, e.intrc_qesitm, e.se_qesitm, e.deposit_method_qesitm
+            FROM pill_mfds AS m 
+            LEFT JOIN pill_easy_info AS e ON m.item_seq = e.item_seq
+            WHERE {where}
+        """
+        await cur.execute(sql.format(where="m.item_seq = %s"), (item_seq.strip(),))
+        pill = await cur.fetchone()
+        if not pill:
+            await cur.execute(sql.format(where="TRIM(m.item_seq) = %s"), (item_seq.strip(),))
+            pill = await cur.fetchone()
 
-            # 2. 상세 데이터 가져오기 (TRIM으로 양쪽 공백 제거 후 비교)
-            sql = """
-                SELECT m.*, 
-                       e.efcy_qesitm, e.use_method_qesitm, e.atpn_warn_qesitm, 
-                       e.atpn_qesitm, e.intrc_qesitm, e.se_qesitm, e.deposit_method_qesitm
-                FROM pill_mfds AS m 
-                LEFT JOIN pill_easy_info AS e ON TRIM(m.item_seq) = TRIM(e.item_seq) 
-                WHERE TRIM(m.item_seq) = %s
-            """
-            cur.execute(sql, (item_seq.strip(),))
-            pill = cur.fetchone()
-
-            if not pill:
-                raise HTTPException(status_code=404, detail="해당 약을 찾을 수 없습니다.")
-
-            # 이미지 경로 보정
-            if pill.get('item_image'):
-                pill['item_image'] = pill['item_image'].replace('127.0.0.1', '3.38.78.49')
-
-            # 좋아요 여부 확인
-            pill['is_liked'] = False
-            if current_user_id:
-                cur.execute("SELECT 1 FROM pill_likes WHERE user_id = %s AND item_seq = %s", (current_user_id, item_seq))
-                if cur.fetchone():
-                    pill['is_liked'] = True
-
-            return {"pill": pill}
-    finally:
-        conn.close()
+        if not pill:
+            raise HTTPException(status_code=404, detail="해당 약을 찾을 수 없습니다.")
+
+        # 2. 조회수 증가 — 바로 UPDATE 하지 않고 모아서 반영 (services/view_counter)
+        # DB 에 저장된 item_seq 값 그대로 키로 써서 반영할 때 TRIM 없이 인덱스를 타게 함
+        view_counter.pill_views.incr(pill['item_seq'])
+        pill['view_count'] = (pill.get('view_count') or 0) + view_counter.pill_views.pending(pill['item_seq'])
+
+        # 이미지 경로 보정
+        if pill.get('item_image'):
+            pill['item_image'] = pill['item_image'].replace('127.0.0.1', '3.38.78.49')
+
+        # 좋아요 여부 확인
+        pill['is_liked'] = False
+        if current_user_id:
+            await cur.execute("SELECT 1 FROM pill_likes WHERE user_id = %s AND item_seq = %s", (current_user_id, item_seq))
+            if await cur.fetchone():
+                pill['is_liked'] = True
+
+        return {"pill": pill}
 # ---------------------------------------------------------
 # [5] 좋아요 토글 API (search.py 기능 복구)
 # ---------------------------------------------------------
 @router.post("/{item_seq}/like")
-def toggle_like(item_seq: str, current_user_id: Optional[int] = Depends(get_current_user_id_optional)):
+def toggle_like(item_seq: str, current_user_id: Optional[int] = Depends(get_current_user_id_optional), conn=Depends(get_db)):
     if not current_user_id:
         raise HTTPException(status_code=401, detail="로그인이 필요합니다.")
 
-    conn = get_conn()
-    try:
-        with conn.cursor(pymysql.cursors.DictCursor) as cur:
-            cur.execute("SELECT * FROM pill_likes WHERE user_id = %s AND item_seq = %s", (current_user_id, item_seq))
-            existing = cur.fetchone()
-
-            if existing:
-                cur.execute("DELETE FROM pill_likes WHERE user_id = %s AND item_seq = %s", (current_user_id, item_seq))
-                is_liked = False
-            else:
-                cur.execute("INSERT INTO pill_likes (user_id, item_seq) VALUES (%s, %s)", (current_user_id, item_seq))
-                is_liked = True
-            
-            conn.commit()
-            return {"is_liked": is_liked}
-    finally:
-        conn.close()
+    with conn.cursor(pymysql.cursors.DictCursor) as cur:
+        cur.execute("SELECT * FROM pill_likes WHERE user_id = %s AND item_seq = %s", (current_user_id, item_seq))
+        existing = cur.fetchone()
+
+        if existing:
+            cur.execute("DELETE FROM pill_likes WHERE user_id = %s AND item_seq = %s", (current_user_id, item_seq))
+            is_liked = False
+        else:
+            cur.execute("INSERT INTO pill_likes (user_id, item_seq) VALUES (%s, %s)", (current_user_id, item_seq))
+            is_liked = True
+        
+        conn.commit()
+        return {"is_liked": is_liked}
 # [추가] 검색 기록 조회 API
 @router.get("/history")
-def get_search_history(current_user_id: Optional[int] = Depends(get_current_user_id_optional)):
+def get_search_history(current_user_id: Optional[int] = Depends(get_current_user_id_optional), conn=Depends(get_db)):
     if not current_user_id:
         return {"history": []}
     
-    conn = get_conn()
-    try:
-        with conn.cursor(pymysql.cursors.DictCursor) as cur:
-            # 최근 10개의 검색어만 가져옴
-            cur.execute("SELECT id, keyword FROM search_history WHERE user_id = %s ORDER BY created_at DESC LIMIT 10", (current_user_id,))
-            return {"history": cur.fetchall()}
-    finally:
-        conn.close()
+    with conn.cursor(pymysql.cursors.DictCursor) as cur:
+        # 최근 10개의 검색어만 가져옴
+        cur.execute("SELECT id, keyword FROM search_history WHERE user_id = %s ORDER BY created_at DESC LIMIT 10", (current_user_id,))
+        return {"history": cur.fetchall()}
 
 # [추가] 검색 기록 개별 삭제 API
 @router.delete("/history/{history_id}")
-def delete_search_history(history_id: int, current_user_id: Optional[int] = Depends(get_current_user_id_optional)):
+def delete_search_history(history_id: int, current_user_id: Optional[int] = Depends(get_current_user_id_optional), conn=Depends(get_db)):
     if not current_user_id:
         raise HTTPException(status_code=401, detail="로그인이 필요합니다.")
     
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM search_history WHERE id = %s AND user_id = %s", (history_id, current_user_id))
-            conn.commit()
-            return {"success": True}
-    finally:
-        conn.close()        
\ No newline at end of file
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM search_history WHERE id = %s AND user_id = %s", (history_id, current_user_id))
+        conn.commit()
+        return {"success": True}
\ No newline at end of file
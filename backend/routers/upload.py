@@ -1,8 +1,8 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
 import os
-import uuid
-from wand.image import Image
+
+from services import blob_store, image_pool
 
 router = APIRouter()
 
@@ -13,43 +13,19 @@ if not os.path.exists(UPLOAD_DIR):
 @router.post("/")
 async def upload_file(file: UploadFile = File(...)):
     try:
-        # 1. 고유한 파일명 생성
-        file_uuid = str(uuid.uuid4())
-        # 파일명에서 확장자 추출 (소문자로 변환)
-        if "." in file.filename:
-            file_extension = file.filename.split(".")[-1].lower()
-        else:
-            file_extension = "jpg" # 확장자가 없으면 기본 jpg
-
-        file_name = f"{file_uuid}.{file_extension}"
-        file_location = os.path.join(UPLOAD_DIR, file_name)
-
-        # 2. 일단 원본 파일을 저장
-        with open(file_location, "wb+") as file_object:
-            file_object.write(await file.read())
-
-        # 3. HEIC 파일이면 JPG로 변환
-        if file_extension == 'heic':
-            jpg_file_name = f"{file_uuid}.jpg"
-            jpg_file_location = os.path.join(UPLOAD_DIR, jpg_file_name)
-
-            # Wand 라이브러리로 변환
-            with Image(filename=file_location) as img:
-                img.format = 'jpeg'
-                img.save(filename=jpg_file_location)
-
-            # 원본 삭제 및 경로 업데이트
-            os.remove(file_location)
-            file_name = jpg_file_name
-            file_location = jpg_file_location
-            print(f"✅ HEIC 변환 완료: {jpg_file_location}")
-
-        print(f"이미지 저장 완료: {file_location}")
+        # 조각 단위로 받으면서 해시 계산 -> 같은 내용이면 기존 파일 재사용 (HEIC 는 JPG 로 변환해서 저장)
+        blob = await blob_store.store_upload(file)
+        file_name = f"{blob['digest']}.{blob['ext']}"
+        print(f"이미지 저장 완료: {blob['path']}")
 
         # URL 반환
-        file_url = f"/uploads/{file_name}"
-        return {"filename": file_name, "file_url": file_url, "location": file_location}
+        return {"filename": file_name, "file_url": blob["url"], "location": blob["path"]}
 
+    except HTTPException:
+        raise
+    except image_pool.ImagePoolBusy as e:
+        print(f"이미지 변환 대기열 초과: {e}")
+        return JSONResponse(status_code=503, content={"message": "서버가 혼잡합니다. 잠시 후 다시 시도해주세요."})
     except Exception as e:
         print(f"이미지 업로드 실패: {str(e)}")
         return JSONResponse(status_code=500, content={"message": f"이미지 업로드 실패: {str(e)}"})
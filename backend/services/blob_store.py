@@ -0,0 +1,217 @@
+# backend/services/blob_store.py
+"""
+[업로드 파일 저장소]
+upload / community / mypage 업로드가 모두 이 모듈로 파일을 저장합니다.
+
+- 받으면서 바로 SHA-256 을 계산하고 uploads/blobs/ab/cd/<sha256>.<확장자> 에 저장 (같은 내용은 한 번만)
+- 조각 단위로 디스크에 쓰고 UPLOAD_MAX_MB 를 넘으면 413
+- HEIC/HEIF 는 image_pool 에서 JPEG 로 바꾼 뒤 바뀐 내용 기준으로 저장
+- blobs 테이블(migrations/004)에 목록과 참조 수. 참조 수는 gc() 가 posts.image_url / users.profile_image 를 세어서 갱신
+- 아무도 참조하지 않고 BLOB_GC_GRACE_SEC 이상 지난 파일은 gc() 가 변환본까지 같이 삭제
+  (업로드 직후 글 작성 전인 파일이 지워지지 않도록 유예 시간을 둠)
+"""
+
+import os
+import re
+import time
+import uuid
+import asyncio
+import hashlib
+from pathlib import Path
+from collections import Counter
+
+from fastapi import HTTPException, UploadFile
+
+from db import get_conn
+from services import image_pool
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BLOB_DIR = BASE_DIR / "uploads" / "blobs"
+TMP_DIR = BLOB_DIR / "tmp"
+BLOB_URL_PREFIX = "/uploads/blobs"
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024                                        # 1MB 씩 나눠서 디스크에 씀
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", 20)) * 1024 * 1024   # 이보다 크면 413
+
+BLOB_GC_ENABLED = os.getenv("BLOB_GC_ENABLED", "1") == "1"
+BLOB_GC_INTERVAL_SEC = int(os.getenv("BLOB_GC_INTERVAL_SEC", 6 * 3600))
+BLOB_GC_GRACE_SEC = int(os.getenv("BLOB_GC_GRACE_SEC", 24 * 3600))
+
+_BLOB_URL = re.compile(r"/uploads/blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.")
+_SAFE_EXT = re.compile(r"^[a-z0-9]{1,5}$")
+
+
+def _ext(filename):
+    ext = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else "jpg"
+    if ext == "jpeg":
+        ext = "jpg"
+    return ext if _SAFE_EXT.match(ext) else "jpg"
+
+
+def blob_path(digest, ext):
+    return BLOB_DIR / digest[:2] / digest[2:4] / f"{digest}.{ext}"
+
+
+def blob_url(digest, ext):
+    return f"{BLOB_URL_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def digest_from_url(url):
+    """저장소 URL(절대/상대 모두)에서 sha256, 저장소 파일이 아니면 None"""
+    match = _BLOB_URL.search(url or "")
+    return match.group(1) if match else None
+
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            h.update(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def _register(digest, ext, size):
+    try:
+        conn = get_conn()
+    except Exception as e:
+        print(f"⚠️ blob 등록 실패: {e}")
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO blobs (digest, ext, size) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE last_uploaded_at = NOW()
+                """,
+                (digest, ext, size),
+            )
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ blob 등록 실패: {e}")
+    finally:
+        conn.close()
+
+
+async def store_upload(file: UploadFile):
+    """
+    업로드 파일 저장 -> {"digest", "ext", "size", "url", "path"}
+    url 은 /uploads/blobs/... 상대 경로 (호출한 쪽에서 필요하면 서버 주소를 붙임)
+    """
+    ext = _ext(file.filename)
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = TMP_DIR / f"{uuid.uuid4().hex}.{ext}"
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"파일은 {UPLOAD_MAX_BYTES // (1024 * 1024)}MB 까지 올릴 수 있습니다.")
+                h.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        digest = h.hexdigest()
+
+        if ext in ("heic", "heif"):
+            # Wand 변환(+ EXIF 회전 반영)은 별도 프로세스에서 — 이벤트 루프를 막지 않도록
+            converted = tmp.with_suffix(".jpg")
+            await image_pool.run(image_pool.convert_to_jpeg, str(tmp), str(converted))
+            os.remove(tmp)
+            tmp, ext = converted, "jpg"
+            digest, size = await asyncio.to_thread(_hash_file, tmp)
+            print(f"✅ HEIC 변환 완료: {digest}.jpg")
+
+        path = blob_path(digest, ext)
+        if path.exists():
+            os.utime(path)  # 이미 있는 내용 -> 새로 쓰지 않음 (GC 유예 시간만 갱신)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, path)
+        await asyncio.to_thread(_register, digest, ext, size)
+        return {"digest": digest, "ext": ext, "size": size, "url": blob_url(digest, ext), "path": str(path)}
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+# ---------------------------------------------------------
+# 참조 수 갱신 + 정리
+# ---------------------------------------------------------
+def _referenced_digests(cur):
+    counts = Counter()
+    cur.execute("SELECT image_url AS url FROM posts WHERE image_url LIKE %s", (f"%{BLOB_URL_PREFIX}/%",))
+    rows = cur.fetchall()
+    cur.execute("SELECT profile_image AS url FROM users WHERE profile_image LIKE %s", (f"%{BLOB_URL_PREFIX}/%",))
+    rows += cur.fetchall()
+    for row in rows:
+        digest = digest_from_url(row["url"])
+        if digest:
+            counts[digest] += 1
+    return counts
+
+
+def gc(dry_run=False):
+    """
+    posts/users 가 참조하는 blob 을 세어서 blobs.ref_count 를 갱신하고,
+    참조가 0 이고 유예 시간이 지난 파일(+ 변환본)은 삭제. 지운 blob 수
+    """
+    deadline = time.time() - BLOB_GC_GRACE_SEC
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            refs = _referenced_digests(cur)
+            if not dry_run:
+                cur.execute("UPDATE blobs SET ref_count = 0 WHERE ref_count <> 0")
+                cur.executemany(
+                    "UPDATE blobs SET ref_count = %s WHERE digest = %s",
+                    [(n, digest) for digest, n in refs.items()],
+                )
+                conn.commit()
+
+            removed = []
+            for path in BLOB_DIR.glob("[0-9a-f][0-9a-f]/[0-9a-f][0-9a-f]/*"):
+                digest = path.name.split(".", 1)[0]
+                if path.name.count(".") != 1 or digest in refs:
+                    continue  # 변환본(이름에 . 이 더 있음)은 원본과 같이 지움
+                try:
+                    if path.stat().st_mtime >= deadline:
+                        continue
+                    if not dry_run:
+                        for variant in path.parent.glob(f"{digest}.*"):
+                            variant.unlink()
+                except FileNotFoundError:
+                    continue
+                removed.append(digest)
+
+            if removed and not dry_run:
+                placeholders = ", ".join(["%s"] * len(removed))
+                cur.execute(f"DELETE FROM blobs WHERE digest IN ({placeholders}) AND ref_count = 0", tuple(removed))
+                conn.commit()
+    finally:
+        conn.close()
+
+    # 업로드 중 끊겨서 남은 임시 파일
+    if not dry_run and TMP_DIR.exists():
+        for path in TMP_DIR.iterdir():
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+    return len(removed)
+
+
+async def gc_loop():
+    """lifespan 에서 백그라운드 태스크로 실행"""
+    if not BLOB_GC_ENABLED:
+        return
+    while True:
+        await asyncio.sleep(BLOB_GC_INTERVAL_SEC)
+        try:
+            removed = await asyncio.to_thread(gc)
+            if removed:
+                print(f">>> 🧹 참조 없는 업로드 파일 {removed}개 삭제")
+        except Exception as e:
+            print(f"🚨 업로드 파일 정리 실패: {e}")
@@ -0,0 +1,103 @@
+# backend/services/chat_sessions.py
+"""
+[약사 AI 상담 세션]
+대화 기록을 클라이언트가 매번 통째로 보내지 않도록 서버에 세션(session_id -> 요약 + 최근 대화)으로 보관합니다.
+
+- 모델에 보내는 건 항상 SYSTEM_PROMPT + 요약 + CHAT_HISTORY_TOKENS 안에 들어가는 최근 대화 + 새 질문
+  -> 대화가 길어져도 요청 크기가 일정 (새 질문은 이 예산과 별도)
+- 예산을 넘어 밀려난 오래된 대화는 호출한 쪽(chat.py)이 overflow() 로 받아 요약에 합친 뒤 drop_oldest() 로 제거
+  build_messages 와 overflow 는 같은 예산(_recent_index)으로 나눠서, 어떤 대화든 보내거나 요약에 들어감
+- 메모리 보관이라 CHAT_SESSION_TTL_SEC 동안 대화가 없거나 서버가 재시작되면 사라짐
+  (워커가 여러 개면 다른 워커로 간 요청은 세션을 못 찾음 -> 클라이언트가 같이 보낸 최근 대화로 새 세션 시작)
+"""
+
+import os
+import asyncio
+import secrets
+
+from cachetools import TTLCache
+
+CHAT_SESSION_TTL_SEC = int(os.getenv("CHAT_SESSION_TTL_SEC", 3600))
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", 10000))
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", 1500))  # 요약을 뺀 최근 대화 예산
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 300))   # 요약 길이 목표
+
+
+class ChatSession:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.summary = ""
+        self.turns = []              # [{"role", "content"}, ...] 오래된 것부터
+        self.lock = asyncio.Lock()   # 요약 갱신은 한 번에 하나만
+
+
+_sessions = TTLCache(maxsize=CHAT_SESSION_MAX, ttl=CHAT_SESSION_TTL_SEC)
+
+
+def estimate_tokens(text):
+    """대략적인 토큰 수 (영문/숫자는 4글자당 1, 한글 등은 글자당 1, 메시지당 여유 4)"""
+    text = text or ""
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 4
+
+
+def create(turns=()):
+    session = ChatSession(secrets.token_urlsafe(16))
+    session.turns = [dict(t) for t in turns]
+    _sessions[session.id] = session
+    return session
+
+
+def get(session_id):
+    session = _sessions.get(session_id) if session_id else None
+    if session is not None:
+        _sessions[session_id] = session  # 마지막 사용 시각 기준으로 TTL 연장
+    return session
+
+
+def delete(session_id):
+    _sessions.pop(session_id, None)
+
+
+def _recent_start(turns, budget):
+    """뒤에서부터 budget 안에 들어가는 첫 대화 위치"""
+    used = 0
+    start = len(turns)
+    while start > 0:
+        cost = estimate_tokens(turns[start - 1]["content"])
+        if used + cost > budget:
+            break
+        used += cost
+        start -= 1
+    return start
+
+
+def _recent_index(session):
+    """그대로 보내는 최근 대화의 시작 위치. 앞쪽은 요약 대상"""
+    return _recent_start(session.turns, CHAT_HISTORY_TOKENS)
+
+
+def build_messages(session, system_prompt, user_content):
+    """모델에 보낼 메시지: 시스템 프롬프트 + 요약 + 예산 안의 최근 대화 + 새 질문"""
+    recent = session.turns[_recent_index(session):]
+    messages = [{"role": "system", "content": system_prompt}]
+    if session.summary:
+        messages.append({"role": "system", "content": f"지금까지의 상담 요약:\n{session.summary}"})
+    messages += [{"role": t["role"], "content": t["content"]} for t in recent]
+    messages.append({"role": "user", "content": user_content})
+    return messages
+
+
+def append(session, user_content, reply):
+    session.turns.append({"role": "user", "content": user_content})
+    session.turns.append({"role": "assistant", "content": reply})
+
+
+def overflow(session):
+    """예산 밖으로 밀려난 오래된 대화 (세션에서 빼지는 않음 — 요약이 끝난 뒤 drop_oldest 로)"""
+    return session.turns[:_recent_index(session)]
+
+
+def drop_oldest(session, count):
+    """요약에 합친 앞쪽 대화 count 개 제거. 요약을 쓰는 것과 같은 시점에 호출해야 그 사이 요청이 문맥을 잃지 않음"""
+    del session.turns[:count]
@@ -0,0 +1,96 @@
+# backend/services/crop_store.py
+"""
+[사진 분석 crop 임시 저장소]
+분석 응답에 crop 이미지를 base64 로 넣지 않고 uploads/crops 아래에 파일로 저장한 뒤 URL 만 돌려줍니다.
+
+- 파일명 = 내용의 SHA-256 (같은 crop 은 한 번만 저장, 다시 쓰이면 수정 시각만 갱신)
+- /uploads 정적 경로로 그대로 서빙 (main.py 의 StaticFiles)
+- CROP_TTL_SEC 가 지난 파일은 cleanup_loop 가 삭제 -> URL 은 잠깐만 유효 (expires_at 참고)
+- thumbnail=True 면 긴 변 CROP_THUMB_SIDE 짜리 작은 이미지도 같이 저장
+"""
+
+import io
+import os
+import time
+import asyncio
+import hashlib
+from pathlib import Path
+
+from PIL import Image
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CROP_DIR = BASE_DIR / "uploads" / "crops"
+# 프론트는 다른 주소(포트)에서 백엔드를 부르므로 업로드 API 들과 같은 절대 주소로 돌려줌
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://3.38.78.49:8000").rstrip("/")
+CROP_URL_PREFIX = PUBLIC_BASE_URL + "/uploads/crops"
+
+CROP_TTL_SEC = int(os.getenv("CROP_TTL_SEC", 3600))
+CROP_CLEANUP_SEC = int(os.getenv("CROP_CLEANUP_SEC", 600))
+CROP_THUMB_SIDE = int(os.getenv("CROP_THUMB_SIDE", 160))
+
+
+def _write(path, data):
+    """같은 내용이면 다시 쓰지 않고 수정 시각만 갱신 (TTL 연장)"""
+    if path.exists():
+        os.utime(path)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def save(crop_bytes, thumbnail=False):
+    """crop JPEG 바이트 -> {"url", "width", "height", "expires_at"[, "thumbnail_url"]}"""
+    digest = hashlib.sha256(crop_bytes).hexdigest()
+    rel = f"{digest[:2]}/{digest}.jpg"
+    _write(CROP_DIR / rel, crop_bytes)
+
+    img = Image.open(io.BytesIO(crop_bytes))  # 크기는 헤더만 읽음
+    info = {
+        "url": f"{CROP_URL_PREFIX}/{rel}",
+        "width": img.width,
+        "height": img.height,
+        "expires_at": int(time.time()) + CROP_TTL_SEC,
+    }
+    if thumbnail:
+        thumb_rel = f"{digest[:2]}/{digest}_t.jpg"
+        thumb_path = CROP_DIR / thumb_rel
+        if thumb_path.exists():
+            os.utime(thumb_path)
+        else:
+            img = img.convert("RGB")
+            img.thumbnail((CROP_THUMB_SIDE, CROP_THUMB_SIDE))
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=80)
+            _write(thumb_path, buf.getvalue())
+        info["thumbnail_url"] = f"{CROP_URL_PREFIX}/{thumb_rel}"
+    return info
+
+
+def cleanup():
+    """CROP_TTL_SEC 보다 오래된 crop 삭제. 지운 파일 수"""
+    if not CROP_DIR.exists():
+        return 0
+    deadline = time.time() - CROP_TTL_SEC
+    removed = 0
+    for path in CROP_DIR.glob("*/*"):
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+async def cleanup_loop():
+    """lifespan 에서 백그라운드 태스크로 실행"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(cleanup)
+            if removed:
+                print(f">>> 🧹 만료된 crop {removed}개 삭제")
+        except Exception as e:
+            print(f"🚨 crop 정리 실패: {e}")
+        await asyncio.sleep(CROP_CLEANUP_SEC)
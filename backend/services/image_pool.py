@@ -0,0 +1,86 @@
+# backend/services/image_pool.py
+"""
+[이미지 변환 프로세스 풀]
+HEIC -> JPEG 변환처럼 CPU 를 오래 쓰는 이미지 작업을 별도 프로세스에서 실행합니다.
+async 핸들러 안에서 바로 돌리면 그동안 이벤트 루프가 멈춰서 다른 요청까지 같이 느려지기 때문입니다.
+
+- 워커 프로세스 IMAGE_POOL_WORKERS 개, 실행 중 + 대기 작업은 IMAGE_POOL_WORKERS + IMAGE_POOL_QUEUE 개까지
+- 자리가 IMAGE_POOL_WAIT_SEC 안에 안 나면 ImagePoolBusy (호출한 쪽에서 503)
+- 워커에서 실행하는 함수는 프로세스로 넘어가야 하므로 이 모듈의 최상위 함수만 사용
+"""
+
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+IMAGE_POOL_WORKERS = int(os.getenv("IMAGE_POOL_WORKERS", 2))
+IMAGE_POOL_QUEUE = int(os.getenv("IMAGE_POOL_QUEUE", 16))
+IMAGE_POOL_WAIT_SEC = float(os.getenv("IMAGE_POOL_WAIT_SEC", 30))
+
+_executor = None
+_slots = None
+
+
+class ImagePoolBusy(Exception):
+    """변환 대기열이 꽉 차서 IMAGE_POOL_WAIT_SEC 안에 자리가 나지 않았을 때"""
+
+
+def _get_executor():
+    global _executor, _slots
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_POOL_WORKERS)
+        _slots = asyncio.Semaphore(IMAGE_POOL_WORKERS + IMAGE_POOL_QUEUE)
+    return _executor
+
+
+async def run(func, *args):
+    """func(*args) 를 워커 프로세스에서 실행하고 결과를 기다림"""
+    executor = _get_executor()
+    try:
+        await asyncio.wait_for(_slots.acquire(), IMAGE_POOL_WAIT_SEC)
+    except asyncio.TimeoutError:
+        raise ImagePoolBusy(f"이미지 변환 대기 {IMAGE_POOL_WAIT_SEC}초 초과")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    finally:
+        _slots.release()
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ---------------------------------------------------------
+# 워커에서 실행되는 작업들
+# ---------------------------------------------------------
+def convert_to_jpeg(src_path, dst_path):
+    """HEIC 등 -> JPEG. EXIF 회전 정보대로 실제로 돌려서 저장 (뷰어마다 다르게 보이지 않도록)"""
+    from wand.image import Image
+
+    with Image(filename=src_path) as img:
+        img.auto_orient()
+        img.format = "jpeg"
+        img.save(filename=dst_path)
+    return dst_path
+
+
+def make_derivative(src_path, dst_path, max_side, fmt):
+    """
+    원본 -> 긴 변 max_side 이하로 줄인 WEBP/JPEG. EXIF 회전은 반영하고 EXIF(위치 정보 등)는 저장하지 않음
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if fmt == "webp" and img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+        else:
+            img = img.convert("RGB")
+        img.thumbnail((max_side, max_side))
+        tmp_path = f"{dst_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, format=fmt.upper(), quality=80, **({"method": 4} if fmt == "webp" else {"optimize": True}))
+    os.replace(tmp_path, dst_path)
+    return dst_path
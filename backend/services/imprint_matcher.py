@@ -0,0 +1,178 @@
+# backend/services/imprint_matcher.py
+"""
+[각인 오타 보정 검색]
+OCR 이 자주 헷갈리는 글자(0/O, 8/B, 1/I, 6/G ...)를 감안해서 OCR 결과와 가장 비슷한 실제 각인을 찾습니다.
+예전 find_db_match 의 correction_map("GH8" -> "GHB" 같은 고정 목록)을 대신합니다.
+
+- 후보 뽑기: 헷갈리는 글자를 같은 글자로 바꾼 뒤(GH8 -> 6H8, GHB -> 6H8) 앞뒤 표시를 붙인 2-gram 으로 색인
+- 점수: 헷갈리는 글자끼리는 치환 비용을 낮춘 편집 거리 -> 1 - 거리 / 긴 쪽 길이 (1.0 = 정확히 일치)
+- 2-gram 겹치는 수 세기와 후보 전체의 편집 거리는 numpy 로 한 번에 (후보마다 파이썬 반복문으로 계산하면 질의당 1ms 가까이 걸림)
+  각인 3만 개에서 캐시 안 된 질의 평균 0.3~0.4ms (예전 방식의 1/3 정도). tests/test_imprint_matcher.py 가 1ms 안쪽인지 확인
+- pill_index.ImprintIndex 가 만들 때 같이 만들고, 각인 -> doc id 목록(인기순)을 들고 있음
+"""
+
+import os
+import threading
+from array import array
+from collections import defaultdict
+
+import numpy as np
+from cachetools import LRUCache
+
+FUZZY_MIN_SCORE = float(os.getenv("FUZZY_MIN_SCORE", 0.6))
+FUZZY_MAX_CANDIDATES = 32   # 편집 거리를 실제로 계산할 최대 후보 수
+FUZZY_MAX_LEN_DIFF = 2
+
+# OCR 이 서로 헷갈리는 글자 쌍 -> 치환 비용 (기본 1.0)
+CONFUSION_COSTS = {
+    ("O", "0"): 0.2, ("D", "0"): 0.4, ("Q", "0"): 0.4, ("O", "D"): 0.4, ("O", "Q"): 0.3, ("C", "0"): 0.6,
+    ("I", "1"): 0.2, ("L", "1"): 0.4, ("I", "L"): 0.4, ("T", "1"): 0.6, ("7", "1"): 0.6, ("J", "1"): 0.6,
+    ("B", "8"): 0.2, ("3", "8"): 0.5, ("B", "3"): 0.6, ("B", "E"): 0.6,
+    ("G", "6"): 0.3, ("C", "G"): 0.4, ("G", "O"): 0.6, ("9", "6"): 0.6,
+    ("S", "5"): 0.3, ("Z", "2"): 0.3, ("A", "4"): 0.5, ("G", "Q"): 0.6,
+    ("H", "N"): 0.5, ("H", "M"): 0.5, ("M", "N"): 0.5, ("U", "V"): 0.4, ("V", "Y"): 0.5,
+    ("P", "R"): 0.5, ("F", "E"): 0.5, ("K", "X"): 0.6, ("W", "M"): 0.6,
+}
+_SUB_COST = {}
+_SUB_TABLE = np.ones((128, 128))  # 글자 코드(ASCII, 나머지는 127) 끼리의 치환 비용 — weighted_distances 용
+for (a, b), cost in CONFUSION_COSTS.items():
+    _SUB_COST[(a, b)] = _SUB_COST[(b, a)] = cost
+    _SUB_TABLE[ord(a), ord(b)] = _SUB_TABLE[ord(b), ord(a)] = cost
+
+# 후보 뽑기용: 많이 헷갈리는 글자는 같은 글자로 취급
+_CANON = str.maketrans({"O": "0", "D": "0", "Q": "0", "I": "1", "L": "1", "B": "8", "G": "6", "S": "5", "Z": "2"})
+
+
+def _canon_grams(text):
+    padded = "^" + text.translate(_CANON) + "$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def weighted_distance(a, b, max_dist=None):
+    """헷갈리는 글자 치환은 싸게 매기는 편집 거리. max_dist 를 넘는 게 확실하면 일찍 멈춤"""
+    prev = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [float(i)] + [0.0] * len(b)
+        for j, cb in enumerate(b, 1):
+            sub = prev[j - 1] + (0.0 if ca == cb else _SUB_COST.get((ca, cb), 1.0))
+            cur[j] = min(prev[j] + 1.0, cur[j - 1] + 1.0, sub)
+        if max_dist is not None and min(cur) > max_dist:
+            return max_dist + 1.0
+        prev = cur
+    return prev[-1]
+
+
+def weighted_distances(a, targets):
+    """a 와 targets 각각의 weighted_distance 를 numpy 배열로 (후보 전체를 한 행씩 같이 계산)"""
+    width = max(len(b) for b in targets)
+    codes_a = np.array([a]).view(np.int32)
+    codes_b = np.array(targets, dtype=f"U{width}").view(np.int32).reshape(len(targets), width)  # 짧은 후보 뒤쪽은 0 (결과는 후보 길이 칸에서 읽음)
+    sub = np.where(
+        codes_a[None, :, None] == codes_b[:, None, :], 0.0,
+        _SUB_TABLE[np.minimum(codes_a, 127)[None, :, None], np.minimum(codes_b, 127)[:, None, :]],
+    )
+    steps = np.arange(width + 1, dtype=float)
+    prev = np.tile(steps, (len(targets), 1))
+    for i in range(len(a)):
+        cur = np.empty_like(prev)
+        cur[:, 0] = i + 1
+        cur[:, 1:] = np.minimum(prev[:, 1:] + 1.0, prev[:, :-1] + sub[:, i, :])
+        # 왼쪽에서 오는 삽입: cur[j] = min_k (cur[k] + (j - k))
+        prev = np.minimum.accumulate(cur - steps, axis=1) + steps
+    return prev[np.arange(len(targets)), [len(b) for b in targets]]
+
+
+class ImprintMatcher:
+    def __init__(self):
+        self.imprints = []              # imprint id -> 각인 문자열
+        self.docs = []                  # imprint id -> doc id 목록 (인기순)
+        self._ids = {}                  # 각인 문자열 -> imprint id
+        self._grams = defaultdict(lambda: array("I"))  # 2-gram -> imprint id 목록
+        self._lengths = array("I")      # imprint id -> 글자 수
+        self._arrays = {}               # 2-gram / "lengths" -> numpy 배열 (match 에서 처음 쓸 때 만듦, add 때 비움)
+        self._memo = LRUCache(maxsize=4096)  # 같은 OCR 결과가 반복해서 들어오는 경우가 많음
+        self._memo_lock = threading.Lock()   # match 는 여러 스레드(run_limited)에서 동시에 불림 — LRUCache 는 스레드 안전하지 않음
+
+    def __len__(self):
+        return len(self.imprints)
+
+    def add(self, imprint, doc_id):
+        if not imprint:
+            return
+        with self._memo_lock:
+            self._memo.clear()
+        imprint_id = self._ids.get(imprint)
+        if imprint_id is None:
+            imprint_id = self._ids[imprint] = len(self.imprints)
+            self.imprints.append(imprint)
+            self.docs.append([])
+            self._lengths.append(len(imprint))
+            for g in _canon_grams(imprint):
+                self._grams[g].append(imprint_id)
+            self._arrays = {}
+        self.docs[imprint_id].append(doc_id)
+
+    def exact_docs(self, text):
+        """각인이 text 와 똑같은 doc id 목록 (인기순)"""
+        imprint_id = self._ids.get(text)
+        return self.docs[imprint_id] if imprint_id is not None else []
+
+    def match(self, text, limit=5, min_score=FUZZY_MIN_SCORE):
+        """
+        [(각인, 점수, doc id 목록), ...] 점수 내림차순. text 는 normalize_search_text 를 거친 값
+        """
+        if not text:
+            return []
+        key = (text, limit, min_score)
+        with self._memo_lock:
+            cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        candidates = self._candidates(text)
+        scored = []
+        if candidates:
+            imprints = [self.imprints[i] for i in candidates]
+            dists = weighted_distances(text, imprints)
+            for imprint, i, dist in zip(imprints, candidates, dists.tolist()):
+                longest = max(len(imprint), len(text))
+                if dist <= (1.0 - min_score) * longest:
+                    scored.append((1.0 - dist / longest, imprint, i))
+        scored.sort(key=lambda s: (-s[0], self.docs[s[2]][0]))
+        result = [(imprint, round(score, 3), self.docs[i]) for score, imprint, i in scored[:limit]]
+        with self._memo_lock:
+            self._memo[key] = result
+        return result
+
+    def _array(self, key):
+        arrays = self._arrays
+        arr = arrays.get(key)
+        if arr is None:
+            source = self._lengths if key == "lengths" else self._grams[key]
+            arr = arrays[key] = np.frombuffer(source.tobytes(), dtype=np.uint32)  # 복사본 (add 가 원본 array 를 늘릴 수 있게)
+        return arr
+
+    def _candidates(self, text):
+        """편집 거리를 계산할 imprint id: 길이가 비슷하고 2-gram 이 많이 겹치는 순 최대 FUZZY_MAX_CANDIDATES 개 + 정확히 일치"""
+        grams = [g for g in _canon_grams(text) if g in self._grams]
+        candidates = []
+        if grams:
+            ids, counts = np.unique(np.concatenate([self._array(g) for g in grams]), return_counts=True)
+            near = np.abs(self._array("lengths")[ids].astype(np.int64) - len(text)) <= FUZZY_MAX_LEN_DIFF
+            ids, counts = ids[near], counts[near]
+            if len(ids) > FUZZY_MAX_CANDIDATES:
+                # 겹치는 수는 작은 정수라 개수 분포로 FUZZY_MAX_CANDIDATES 번째 값을 찾고 그 이상만 남김 (정렬할 양을 줄임)
+                cut, kept = 0, 0
+                for value, n in reversed(list(enumerate(np.bincount(counts).tolist()))):
+                    kept += n
+                    if kept >= FUZZY_MAX_CANDIDATES:
+                        cut = value
+                        break
+                keep = counts >= cut
+                ids, counts = ids[keep], counts[keep]
+            # 겹치는 수가 같으면 id 순 (먼저 색인된 = 인기 약의 각인)
+            order = np.argsort(-counts, kind="stable")[:FUZZY_MAX_CANDIDATES]
+            candidates = ids[order].tolist()
+        exact = self._ids.get(text)
+        if exact is not None and exact not in candidates:
+            candidates.append(exact)
+        return candidates
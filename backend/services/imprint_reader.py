@@ -0,0 +1,239 @@
+# backend/services/imprint_reader.py
+"""
+[로컬 각인 판독기]
+알약 crop 의 각인을 네트워크 없이 CPU 로 읽습니다 (글자 분리 + 템플릿 kNN).
+확신도(confidence)가 IMPRINT_READER_MIN_CONF 보다 낮으면 호출한 쪽에서 Gemini 로 넘깁니다.
+
+- 글자 분리: CLAHE -> adaptive threshold(음각/양각 두 방향) -> 연결 요소 중 한 줄에 놓인 것들
+- 글자 인식: 24x24 로 정규화한 글자 벡터와 모델의 글자 템플릿 간 코사인 유사도 상위 k 개 투표
+- 모델: models/imprint_glyphs.npz (vectors, labels). pill_mfds 의 식약처 낱알 사진 + 각인 값으로 생성
+    python -m services.imprint_reader [최대 약 개수]
+- 모델 파일이 없으면 항상 confidence 0 (= 전부 Gemini)
+"""
+
+import os
+import re
+import threading
+import urllib.request
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from db import get_conn
+from services import pill_index
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+IMPRINT_READER_ENABLED = os.getenv("IMPRINT_READER_ENABLED", "1") == "1"
+IMPRINT_READER_MODEL = os.getenv("IMPRINT_READER_MODEL", str(BASE_DIR / "models" / "imprint_glyphs.npz"))
+IMPRINT_READER_MIN_CONF = float(os.getenv("IMPRINT_READER_MIN_CONF", 0.75))
+
+GLYPH_SIZE = 24     # 글자 벡터 = 24x24
+WORK_HEIGHT = 128   # 판독 전에 crop 높이를 이 크기로 맞춤
+MAX_GLYPHS = 12     # 이보다 많이 잡히면 글자가 아니라 잡음으로 봄
+KNN_K = 3
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+
+
+# ---------------------------------------------------------
+# 글자 분리
+# ---------------------------------------------------------
+def _prepare(image_bytes):
+    gray = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    h, w = gray.shape
+    scale = WORK_HEIGHT / h
+    return cv2.resize(gray, (max(1, int(w * scale)), WORK_HEIGHT), interpolation=cv2.INTER_AREA)
+
+
+def _line_components(mask):
+    """mask 에서 글자 크기의 연결 요소 중 같은 줄에 있는 것들 (왼쪽 -> 오른쪽)"""
+    h, w = mask.shape
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    boxes = []
+    for i in range(1, n):
+        x, y, bw, bh, area = stats[i]
+        if x == 0 or y == 0 or x + bw >= w or y + bh >= h:
+            continue  # 알약 테두리/배경
+        if not (0.15 * h <= bh <= 0.7 * h) or bw > 0.5 * w:
+            continue
+        if area < 0.15 * bw * bh:
+            continue
+        boxes.append((x, y, bw, bh, i))
+    if not boxes:
+        return []
+    center = np.median([y + bh / 2 for _, y, _, bh, _ in boxes])
+    height = np.median([bh for _, _, _, bh, _ in boxes])
+    line = sorted((b for b in boxes if abs(b[1] + b[3] / 2 - center) <= 0.5 * height), key=lambda b: b[0])
+    return [((labels[y:y + bh, x:x + bw] == i).astype(np.uint8) * 255) for x, y, bw, bh, i in line]
+
+
+def segment(gray):
+    """각인 글자 이미지 목록. 음각(어두운 획)/양각(밝은 획) 중 글자가 더 많이 잡히는 쪽"""
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
+    eq = clahe.apply(gray)
+    block = max(11, (gray.shape[0] // 6) | 1)
+    dark = cv2.adaptiveThreshold(eq, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, block, 8)
+    light = cv2.adaptiveThreshold(eq, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block, -8)
+    best = []
+    for mask in (dark, light):
+        glyphs = _line_components(mask)
+        if len(glyphs) <= MAX_GLYPHS and len(glyphs) > len(best):
+            best = glyphs
+    return best
+
+
+def _vectorize(glyph):
+    """정사각형으로 패딩 -> 24x24 -> 평균 0, 길이 1 벡터 (내적 = 코사인 유사도)"""
+    h, w = glyph.shape
+    side = max(h, w)
+    square = np.zeros((side, side), np.uint8)
+    top, left = (side - h) // 2, (side - w) // 2
+    square[top:top + h, left:left + w] = glyph
+    v = cv2.resize(square, (GLYPH_SIZE, GLYPH_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    v -= v.mean()
+    norm = np.linalg.norm(v)
+    return v / norm if norm > 0 else v
+
+
+# ---------------------------------------------------------
+# 판독
+# ---------------------------------------------------------
+class ImprintReader:
+    def __init__(self, vectors, labels):
+        self.vectors = vectors.astype(np.float32)  # (N, GLYPH_SIZE * GLYPH_SIZE)
+        self.labels = [str(c) for c in labels]
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["vectors"], data["labels"])
+
+    def read_glyphs(self, glyphs):
+        """(텍스트, 확신도 0~1). 확신도는 가장 자신 없는 글자 기준"""
+        if not glyphs or len(glyphs) > MAX_GLYPHS:
+            return "", 0.0
+        sims = np.stack([_vectorize(g) for g in glyphs]) @ self.vectors.T
+        k = min(KNN_K, sims.shape[1])
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+
+        chars, confs = [], []
+        for row, idx in zip(sims, top):
+            votes = {}
+            for j in idx:
+                votes[self.labels[j]] = votes.get(self.labels[j], 0.0) + max(float(row[j]), 0.0)
+            label, score = max(votes.items(), key=lambda kv: kv[1])
+            total = sum(votes.values()) or 1.0
+            best = max(float(row[j]) for j in idx if self.labels[j] == label)
+            chars.append(label)
+            confs.append(max(best, 0.0) * score / total)
+        return "".join(chars), min(confs)
+
+    def read(self, image_bytes):
+        gray = _prepare(image_bytes)
+        if gray is None:
+            return "", 0.0
+        return self.read_glyphs(segment(gray))
+
+
+_reader = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_reader():
+    """모델을 처음 쓸 때 한 번 읽음. 꺼져 있거나 모델 파일이 없으면 None"""
+    global _reader, _loaded
+    if _loaded:
+        return _reader
+    with _lock:
+        if not _loaded:
+            if IMPRINT_READER_ENABLED and os.path.exists(IMPRINT_READER_MODEL):
+                try:
+                    _reader = ImprintReader.load(IMPRINT_READER_MODEL)
+                    print(f">>> 🔤 로컬 각인 판독 모델 로드: 글자 템플릿 {len(_reader.labels)}개")
+                except Exception as e:
+                    print(f"🚨 로컬 각인 판독 모델 로드 실패: {e}")
+            elif IMPRINT_READER_ENABLED:
+                print(f">>> ⚠️ 로컬 각인 판독 모델 없음 ({IMPRINT_READER_MODEL}) -> Gemini 만 사용")
+            _loaded = True
+    return _reader
+
+
+def read(image_bytes):
+    """crop 하나의 (각인, 확신도). 실제로 있는 각인이 아니면 오인식일 가능성이 높아서 확신도를 낮춤"""
+    reader = get_reader()
+    if reader is None:
+        return "", 0.0
+    try:
+        text, conf = reader.read(image_bytes)
+    except Exception as e:
+        print(f"⚠️ 로컬 각인 판독 실패: {e}")
+        return "", 0.0
+    index = pill_index.get_index()
+    if text and index is not None and not index.search_ids(text, 1, include_name=False):
+        conf *= 0.5
+    return text, conf
+
+
+# ---------------------------------------------------------
+# 모델 만들기 (식약처 낱알 사진 + 각인 값)
+# ---------------------------------------------------------
+def train(limit=None, per_char=200, out=IMPRINT_READER_MODEL):
+    """
+    낱알 사진(앞/뒷면이 나란히 있음)에서 분리한 글자 수가 앞+뒤 각인 글자 수와 같을 때만
+    순서대로 글자를 붙여서 템플릿으로 사용. 글자마다 최대 per_char 개
+    """
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            sql = """
+                SELECT item_seq, item_image, print_front, print_back FROM pill_mfds
+                WHERE item_image IS NOT NULL AND item_image <> '' AND print_front IS NOT NULL
+                ORDER BY popularity_score DESC
+            """
+            if limit:
+                sql += f" LIMIT {int(limit)}"
+            cur.execute(sql)
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    vectors, labels, counts = [], [], {}
+    used = 0
+    for row in rows:
+        label = _NON_ALNUM.sub("", (row["print_front"] or "").upper()) + _NON_ALNUM.sub("", (row["print_back"] or "").upper())
+        if not label or len(label) > MAX_GLYPHS or all(counts.get(c, 0) >= per_char for c in label):
+            continue
+        try:
+            with urllib.request.urlopen(row["item_image"], timeout=10) as res:
+                gray = _prepare(res.read())
+        except Exception as e:
+            print(f"⚠️ 사진 받기 실패 ({row['item_seq']}): {e}")
+            continue
+        if gray is None:
+            continue
+        glyphs = segment(gray)
+        if len(glyphs) != len(label):
+            continue
+        used += 1
+        for ch, glyph in zip(label, glyphs):
+            if counts.get(ch, 0) < per_char:
+                vectors.append(_vectorize(glyph))
+                labels.append(ch)
+                counts[ch] = counts.get(ch, 0) + 1
+
+    if not vectors:
+        print("🚨 템플릿을 하나도 만들지 못했습니다.")
+        return
+    Path(out).parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(out, vectors=np.stack(vectors), labels=np.array(labels))
+    print(f">>> ✅ {out}: 약 {used}개에서 글자 템플릿 {len(labels)}개 ({len(counts)}종)")
+
+
+if __name__ == "__main__":
+    import sys
+    train(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,364 @@
+# backend/services/pill_index.py
+"""
+[알약 식별용 메모리 색인]
+서버 시작 시 pill_mfds 를 한 번 읽어서 각인(print_front/print_back) n-gram -> 약 번호 목록을 만들어 둡니다.
+사진 분석에서 OCR 로 읽은 짧은 각인 문자열을 DB LIKE 스캔 없이 메모리에서 바로 찾기 위한 용도입니다.
+
+- 약 번호(doc id)는 popularity_score 내림차순 순위라서, 목록 앞쪽일수록 인기 약
+- n-gram 목록은 array('I') 로 저장 (약 하나당 4바이트)
+- PILL_INDEX_CHECK_SEC 마다 행 수/최대 item_seq 를 확인해서 바뀌었으면 다시 만들고,
+  PILL_INDEX_REFRESH_SEC 마다는 (인기 순위 반영을 위해) 무조건 다시 만듦
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from array import array
+from bisect import bisect_left
+
+from db import get_conn
+from utils.text import normalize_search_text
+from services import search_cache
+from services.imprint_matcher import ImprintMatcher
+
+PILL_INDEX_ENABLED = os.getenv("PILL_INDEX_ENABLED", "1") == "1"
+PILL_INDEX_CHECK_SEC = int(os.getenv("PILL_INDEX_CHECK_SEC", 60))
+PILL_INDEX_REFRESH_SEC = int(os.getenv("PILL_INDEX_REFRESH_SEC", 1800))
+# 색상 fallback: 인기 상위 COLOR_SAMPLE_POOL 개 중 무작위(sample) 또는 그냥 상위(top)
+COLOR_FALLBACK_MODE = os.getenv("COLOR_FALLBACK_MODE", "sample")
+COLOR_SAMPLE_POOL = int(os.getenv("COLOR_SAMPLE_POOL", 50))
+
+NGRAM_MAX = 3  # 1~3 글자 n-gram 을 모두 색인 (각인은 짧아서 1~2 글자 검색도 많음)
+
+_ASCII_RUN = re.compile(r"[A-Z0-9]+")
+_COLOR_SEP = re.compile(r"[,/|]")
+
+
+def _seq_key(item_seq):
+    return str(item_seq).strip()
+
+
+def _grams(text):
+    grams = set()
+    for n in range(1, NGRAM_MAX + 1):
+        for i in range(len(text) - n + 1):
+            grams.add(text[i:i + n])
+    return grams
+
+
+def _contains(postings, doc_id):
+    i = bisect_left(postings, doc_id)
+    return i < len(postings) and postings[i] == doc_id
+
+
+class ImprintIndex:
+    def __init__(self, rows):
+        # rows 는 popularity_score 내림차순으로 정렬된 상태로 들어옴
+        self.rows = []
+        self.positions = {}     # item_seq -> doc id
+        self._imprints = []     # doc id -> (front, back)
+        self._names = []        # doc id -> 약 이름에서 영문/숫자 부분들
+        self._postings = {}     # gram -> array('I') (오름차순 = 인기순)
+        self.matcher = ImprintMatcher()  # OCR 오타 보정용 (각인만)
+        self._color_buckets = {} # (색상, 모양 또는 None) -> array('I') (인기순)
+        self._name_keys = None   # 정렬된 (정규화 약 이름, doc id) — 이름 검색 때 처음 만듦
+        self._removed = set()
+        self._lock = threading.Lock()
+        for row in rows:
+            self._add(row)
+
+    def __len__(self):
+        return len(self.rows) - len(self._removed)
+
+    def _add(self, row):
+        doc_id = len(self.rows)
+        front = normalize_search_text(row.get("print_front"))
+        back = normalize_search_text(row.get("print_back"))
+        # OCR 결과는 A-Z0-9 만 남기므로 이름은 영문/숫자 구간만 색인 (TYLENOL 등)
+        names = tuple(_ASCII_RUN.findall(normalize_search_text(row.get("item_name"))))
+
+        self.rows.append(row)
+        self._name_keys = None
+        self._imprints.append((front, back))
+        self._names.append(names)
+        self.positions[_seq_key(row["item_seq"])] = doc_id
+        self.matcher.add(front, doc_id)
+        self.matcher.add(back, doc_id)
+
+        colors = {
+            c.strip() for col in ("color_class1", "color_class2")
+            for c in _COLOR_SEP.split(row.get(col) or "") if c.strip()
+        }
+        shape = (row.get("drug_shape") or "").strip() or None
+        for color in colors:
+            for key in {(color, None), (color, shape)}:
+                bucket = self._color_buckets.get(key)
+                if bucket is None:
+                    bucket = self._color_buckets[key] = array("I")
+                bucket.append(doc_id)
+
+        grams = _grams(front) | _grams(back)
+        for name in names:
+            grams |= _grams(name)
+        for g in grams:
+            postings = self._postings.get(g)
+            if postings is None:
+                postings = self._postings[g] = array("I")
+            postings.append(doc_id)
+
+    # ---------------------------------------------------
+    # 검색
+    # ---------------------------------------------------
+    def search_ids(self, text, limit=5, include_name=True):
+        """
+        text 를 포함하는 약의 doc id 목록 (접두 일치 먼저, 그다음 중간 일치 / 각각 인기순)
+        """
+        q = normalize_search_text(text)
+        if not q:
+            return []
+        n = min(NGRAM_MAX, len(q))
+        grams = {q[i:i + n] for i in range(len(q) - n + 1)}
+        lists = []
+        for g in grams:
+            postings = self._postings.get(g)
+            if not postings:
+                return []
+            lists.append(postings)
+        lists.sort(key=len)
+        first, others = lists[0], lists[1:]
+
+        prefix_hits, infix_hits = [], []
+        for doc_id in first:
+            if doc_id in self._removed:
+                continue
+            if others and not all(_contains(p, doc_id) for p in others):
+                continue
+            fields = self._imprints[doc_id]
+            if include_name:
+                fields = fields + self._names[doc_id]
+            if any(f.startswith(q) for f in fields):
+                prefix_hits.append(doc_id)
+                if len(prefix_hits) >= limit:
+                    break
+            elif len(infix_hits) < limit and any(q in f for f in fields):
+                infix_hits.append(doc_id)
+        return (prefix_hits + infix_hits)[:limit]
+
+    def fuzzy_search_ids(self, text, limit=5):
+        """
+        OCR 오타를 감안해서 비슷한 각인의 약 [(doc id, 점수), ...] (점수 높은 순, 같으면 인기순)
+        """
+        q = normalize_search_text(text)
+        results, seen = [], set()
+        for _, score, doc_ids in self.matcher.match(q, limit=limit):
+            for doc_id in doc_ids:
+                if doc_id in self._removed or doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                results.append((doc_id, score))
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def match_ids(self, text, limit=5):
+        """
+        OCR 로 읽은 각인 -> [(doc id, 단계, 점수), ...]
+        단계 0: 각인이 똑같음(1.0) -> 1: 각인/약 이름(영문)에 그대로 들어 있음(글자 수 비율) -> 2: OCR 오타를 감안한 비슷한 각인
+        앞 단계에서 limit 개가 차면 뒤 단계는 계산하지 않음 (대부분 OCR 이 제대로 읽어서 fuzzy 까지 안 감)
+        """
+        q = normalize_search_text(text)
+        if not q:
+            return []
+        results, seen = [], set()
+
+        def take(doc_id, tier, score):
+            if doc_id in self._removed or doc_id in seen:
+                return False
+            seen.add(doc_id)
+            results.append((doc_id, tier, score))
+            return len(results) >= limit
+
+        for doc_id in self.matcher.exact_docs(q):
+            if take(doc_id, 0, 1.0):
+                return results
+        for doc_id in self.search_ids(q, limit=limit + len(seen)):
+            shortest = min(len(f) for f in self._imprints[doc_id] + self._names[doc_id] if q in f)
+            if take(doc_id, 1, round(len(q) / shortest, 3)):
+                return results
+        for doc_id, score in self.fuzzy_search_ids(q, limit=limit + len(seen)):
+            if take(doc_id, 2, score):
+                return results
+        return results
+
+    def match(self, text, limit=5):
+        """match_ids 의 pill_mfds 행 목록 (복사본, match_tier/match_score 포함)"""
+        return [
+            dict(self.rows[i], match_tier=tier, match_score=score)
+            for i, tier, score in self.match_ids(text, limit)
+        ]
+
+    def search_seqs(self, text, limit=5, include_name=True):
+        return [self.rows[i]["item_seq"] for i in self.search_ids(text, limit, include_name)]
+
+    def search(self, text, limit=5, include_name=True):
+        """find_db_match 와 같은 모양의 pill_mfds 행 목록 (복사본)"""
+        return [dict(self.rows[i]) for i in self.search_ids(text, limit, include_name)]
+
+    def search_name(self, name):
+        """
+        약 이름(챗봇 답변의 [[타이레놀]] 등)으로 가장 인기 있는 약 하나.
+        이름 접두 일치(정렬 목록 이진 탐색) -> 없으면 중간 일치(전체 훑기). 없으면 None
+        """
+        q = normalize_search_text(name)
+        if not q:
+            return None
+        keys = self._name_keys
+        if keys is None:
+            keys = self._name_keys = sorted(
+                (normalize_search_text(row.get("item_name")), doc_id) for doc_id, row in enumerate(self.rows)
+            )
+        # doc id 순서는 처음 적재 때만 인기순 (upsert 로 들어온 약은 뒤에 붙음) -> popularity_score 로 비교
+        def rank(doc_id):
+            return (-(self.rows[doc_id].get("popularity_score") or 0), doc_id)
+
+        best = None
+        i = bisect_left(keys, (q, -1))
+        while i < len(keys) and keys[i][0].startswith(q):
+            doc_id = keys[i][1]
+            if doc_id not in self._removed and (best is None or rank(doc_id) < rank(best)):
+                best = doc_id
+            i += 1
+        if best is None:
+            for key, doc_id in keys:
+                if q in key and doc_id not in self._removed and (best is None or rank(doc_id) < rank(best)):
+                    best = doc_id
+        return dict(self.rows[best]) if best is not None else None
+
+    def get_rows(self, item_seqs):
+        """item_seq 순서대로 pill_mfds 행 (복사본, 없는 약은 건너뜀)"""
+        rows = []
+        for seq in item_seqs:
+            doc_id = self.positions.get(_seq_key(seq))
+            if doc_id is not None and doc_id not in self._removed:
+                rows.append(dict(self.rows[doc_id]))
+        return rows
+
+    def color_candidates(self, color, shape=None, limit=5):
+        """
+        각인으로 못 찾았을 때의 색상(+모양) 후보. 예전 ORDER BY RAND() 대신 미리 나눠 둔 목록에서 뽑음
+        """
+        bucket = self._color_buckets.get((color, shape or None))
+        if not bucket:
+            return []
+        pool = []
+        for doc_id in bucket:
+            if doc_id not in self._removed:
+                pool.append(doc_id)
+                if len(pool) >= COLOR_SAMPLE_POOL:
+                    break
+        picked = random.sample(pool, min(limit, len(pool))) if COLOR_FALLBACK_MODE == "sample" else pool[:limit]
+        return [dict(self.rows[i]) for i in picked]
+
+    # ---------------------------------------------------
+    # 부분 갱신 (전체 재생성 전까지 임시로 반영)
+    # ---------------------------------------------------
+    def remove(self, item_seq):
+        with self._lock:
+            doc_id = self.positions.pop(_seq_key(item_seq), None)
+            if doc_id is not None:
+                self._removed.add(doc_id)
+
+    def upsert(self, row):
+        # 새 doc id 는 맨 뒤(인기순 최하위)에 붙음 — 다음 전체 재생성 때 제자리로
+        with self._lock:
+            old = self.positions.get(_seq_key(row["item_seq"]))
+            if old is not None:
+                self._removed.add(old)
+            self._add(row)
+
+
+# ---------------------------------------------------------
+# 전역 색인 관리
+# ---------------------------------------------------------
+_index = None
+_signature = None
+_built_at = 0.0
+
+
+def get_index():
+    """아직 만들어지지 않았거나 꺼져 있으면 None (호출한 쪽은 DB 검색으로)"""
+    return _index
+
+
+def _table_signature(cur):
+    cur.execute("SELECT COUNT(*) AS cnt, MAX(item_seq) AS max_seq FROM pill_mfds")
+    row = cur.fetchone()
+    return (row["cnt"], str(row["max_seq"]))
+
+
+def refresh(force=True):
+    """pill_mfds 를 다시 읽어서 색인을 새로 만들고 통째로 교체"""
+    global _index, _signature, _built_at
+    if not PILL_INDEX_ENABLED:
+        return
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            signature = _table_signature(cur)
+            if not force and _index is not None and signature == _signature:
+                return
+            started = time.perf_counter()
+            cur.execute("SELECT * FROM pill_mfds ORDER BY popularity_score DESC, item_seq ASC")
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    index = ImprintIndex(rows)
+    changed = _signature is not None and signature != _signature
+    _index, _signature, _built_at = index, signature, time.monotonic()
+    if changed:
+        # 데이터 임포트 등으로 pill_mfds 가 바뀜 -> 검색 결과 캐시도 비움
+        search_cache.invalidate()
+    print(f">>> 🗂️ 알약 각인 색인 생성: {len(index)}개 ({time.perf_counter() - started:.2f}초)")
+
+
+def remove(item_seq):
+    if _index is not None:
+        _index.remove(item_seq)
+
+
+def reload_items(item_seqs):
+    """특정 약만 DB 에서 다시 읽어 색인에 반영 (수정/추가 직후)"""
+    if _index is None or not item_seqs:
+        return
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            placeholders = ", ".join(["%s"] * len(item_seqs))
+            cur.execute(f"SELECT * FROM pill_mfds WHERE item_seq IN ({placeholders})", tuple(item_seqs))
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    found = {_seq_key(r["item_seq"]) for r in rows}
+    for row in rows:
+        _index.upsert(row)
+    for seq in item_seqs:
+        if _seq_key(seq) not in found:
+            _index.remove(seq)
+    search_cache.invalidate()
+
+
+async def refresh_loop():
+    """lifespan 에서 백그라운드 태스크로 실행"""
+    if not PILL_INDEX_ENABLED:
+        return
+    while True:
+        try:
+            stale = time.monotonic() - _built_at >= PILL_INDEX_REFRESH_SEC
+            await asyncio.to_thread(refresh, _index is None or stale)
+        except Exception as e:
+            print(f"🚨 알약 색인 갱신 실패: {e}")
+        await asyncio.sleep(PILL_INDEX_CHECK_SEC)
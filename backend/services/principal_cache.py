@@ -0,0 +1,75 @@
+# backend/services/principal_cache.py
+"""
+[로그인 사용자 캐시]
+인증이 필요한 요청마다 SELECT * FROM users WHERE username = ... 를 하지 않도록
+username -> 사용자 정보(비밀번호 제외)를 짧은 시간 동안 메모리에 보관합니다.
+
+- 관리자가 차단/권한 변경/삭제하거나 본인이 프로필을 바꾸면 invalidate() 로 즉시 삭제
+- 워커(프로세스)가 여러 개면 다른 워커의 캐시는 TTL 이 지나야 갱신되므로 TTL 은 짧게 유지
+"""
+
+import os
+import threading
+
+from cachetools import TTLCache
+
+from db import get_conn
+
+PRINCIPAL_CACHE_TTL_SEC = int(os.getenv("PRINCIPAL_CACHE_TTL_SEC", 30))
+PRINCIPAL_CACHE_MAX = int(os.getenv("PRINCIPAL_CACHE_MAX", 10000))
+
+# 인증 후 핸들러들이 쓰는 컬럼만 (password 는 캐시하지 않음)
+USER_COLUMNS = "id, username, name, role, is_banned, real_name, birthdate, phone, email, profile_image"
+
+_cache = TTLCache(maxsize=PRINCIPAL_CACHE_MAX, ttl=PRINCIPAL_CACHE_TTL_SEC)
+_lock = threading.Lock()
+
+
+def get(username):
+    with _lock:
+        user = _cache.get(username)
+    return dict(user) if user is not None else None
+
+
+def put(user):
+    with _lock:
+        _cache[user["username"]] = dict(user)
+
+
+def invalidate(user_id=None, username=None):
+    with _lock:
+        if username is not None:
+            _cache.pop(username, None)
+        if user_id is not None:
+            for key in [k for k, v in _cache.items() if v["id"] == user_id]:
+                _cache.pop(key, None)
+
+
+def load_user(username):
+    """캐시 -> 없으면 DB 조회 후 캐시. 없는 사용자면 None"""
+    user = get(username)
+    if user is not None:
+        return user
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {USER_COLUMNS} FROM users WHERE username = %s", (username,))
+            user = cur.fetchone()
+    finally:
+        conn.close()
+    if user is not None:
+        put(user)
+    return user
+
+
+async def load_user_async(conn, username):
+    """load_user 의 async 버전 (async_db 연결 사용)"""
+    user = get(username)
+    if user is not None:
+        return user
+    async with conn.cursor() as cur:
+        await cur.execute(f"SELECT {USER_COLUMNS} FROM users WHERE username = %s", (username,))
+        user = await cur.fetchone()
+    if user is not None:
+        put(user)
+    return user
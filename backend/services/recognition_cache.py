@@ -0,0 +1,208 @@
+# backend/services/recognition_cache.py
+"""
+[사진 인식 결과 캐시]
+같은 사진을 다시 올리거나 같은 알약을 거의 똑같이 찍어 올리면 Gemini 를 다시 부르지 않도록
+이미지 바이트의 SHA-256 과 dHash(64비트 지각 해시)를 키로 인식 결과(각인/색상/모양)를 저장합니다.
+
+- kind 로 용도를 구분: "crop"(알약 하나 OCR), "scene"(전체 이미지 Gemini 분석), "pill"(/api/pills/analyze)
+- 메모리: SHA-256 정확히 일치 -> 없으면 (NEAR_MATCH_KINDS 만) dHash 해밍 거리 RECOGNITION_DHASH_MAX_DIST 이하인 것
+- "crop" 은 dHash 만으로는 부족: 잘라낸 흰색 원형 알약끼리는 각인 한 글자가 달라도 dHash 가 0~2비트 차이라
+  dHash 로 후보를 고른 뒤 40x40 흑백 축소본을 픽셀 단위로 비교해서 가장 큰 차이가 RECOGNITION_CROP_PIXEL_MAX_DIFF 이하일 때만 인정
+  (재압축(JPEG 60~85)한 같은 사진: 최대 차이 11 이하, 각인 한 글자만 다른 알약: 대부분 18 이상. 기본 8 -> 재압축 약 9할을 찾고 오인식 0.2% 정도)
+- "pill" 은 SHA-256 정확히 일치만 (해시 계산도 안 함)
+- DB (RECOGNITION_CACHE_DB=1, migrations/003): SHA-256 이 같은 행 ("scene" 은 dHash 가 같은 행도). 워커/재시작 간 공유용
+- 항목마다 RECOGNITION_CACHE_TTL_SEC 가 지나면 만료, 메모리는 RECOGNITION_CACHE_MAX 개를 넘으면 오래된 것부터 삭제
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+import cv2
+import numpy as np
+from cachetools import TTLCache
+
+from db import get_conn
+
+RECOGNITION_CACHE_ENABLED = os.getenv("RECOGNITION_CACHE_ENABLED", "1") == "1"
+RECOGNITION_CACHE_DB = os.getenv("RECOGNITION_CACHE_DB", "0") == "1"
+RECOGNITION_CACHE_TTL_SEC = int(os.getenv("RECOGNITION_CACHE_TTL_SEC", 7 * 24 * 3600))
+RECOGNITION_CACHE_MAX = int(os.getenv("RECOGNITION_CACHE_MAX", 4096))
+RECOGNITION_DHASH_MAX_DIST = int(os.getenv("RECOGNITION_DHASH_MAX_DIST", 4))  # 64비트 중 다른 비트 수
+RECOGNITION_CROP_PIXEL_MAX_DIFF = int(os.getenv("RECOGNITION_CROP_PIXEL_MAX_DIFF", 8))  # 축소본 픽셀 밝기 차이 (0~255)
+RECOGNITION_DB_PURGE_SEC = 3600  # 만료된 DB 행 정리 주기
+NEAR_MATCH_KINDS = {"scene", "crop"}  # 재압축/리사이즈된 같은 사진을 비슷한 해시로 찾음
+THUMB_KINDS = {"crop"}                # 비슷한 해시를 축소본 비교로 한 번 더 확인 (DB 에는 축소본이 없어 정확히 일치만)
+THUMB_SIZE = 40
+
+_cache = TTLCache(maxsize=RECOGNITION_CACHE_MAX, ttl=RECOGNITION_CACHE_TTL_SEC)  # (kind, sha) -> (dhash, thumb, result)
+_lock = threading.Lock()
+_last_purge = 0.0
+
+_hits = 0
+_near_hits = 0
+_misses = 0
+
+
+def dhash(gray):
+    """흑백 이미지를 9x8 로 축소 후 옆 픽셀과 밝기 비교 -> 64비트 정수"""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def thumbnail(gray):
+    return cv2.resize(gray, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def fingerprint(image_bytes, kind):
+    """
+    (sha256 hex, dhash, 축소본) — lookup/store 에 그대로 넘김
+    dHash/축소본은 비슷한 사진을 찾는 kind 만 계산 (나머지는 None, 디코딩 실패도 None)
+    """
+    sha = hashlib.sha256(image_bytes).hexdigest()
+    if kind not in NEAR_MATCH_KINDS:
+        return sha, None, None
+    gray = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return sha, None, None
+    return sha, dhash(gray), thumbnail(gray) if kind in THUMB_KINDS else None
+
+
+def _distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _near(kind, dh, thumb, other_dh, other_thumb):
+    """같은 사진으로 볼 수 있으면 해밍 거리, 아니면 None"""
+    if other_dh is None:
+        return None
+    dist = _distance(dh, other_dh)
+    if dist > RECOGNITION_DHASH_MAX_DIST:
+        return None
+    if kind in THUMB_KINDS:
+        if thumb is None or other_thumb is None:
+            return None
+        if int(np.abs(thumb - other_thumb).max()) > RECOGNITION_CROP_PIXEL_MAX_DIFF:
+            return None
+    return dist
+
+
+def lookup(kind, fp):
+    """저장된 인식 결과(복사본) 또는 None"""
+    global _hits, _near_hits, _misses
+    if not RECOGNITION_CACHE_ENABLED:
+        return None
+    sha, dh, thumb = fp
+    with _lock:
+        entry = _cache.get((kind, sha))
+        if entry is not None:
+            _hits += 1
+            return json.loads(json.dumps(entry[2]))
+        if dh is not None and kind in NEAR_MATCH_KINDS:
+            best = None
+            for (k, _), (other_dh, other_thumb, result) in list(_cache.items()):
+                if k != kind:
+                    continue
+                dist = _near(kind, dh, thumb, other_dh, other_thumb)
+                if dist is not None and (best is None or dist < best[0]):
+                    best = (dist, result)
+            if best is not None:
+                _near_hits += 1
+                return json.loads(json.dumps(best[1]))
+
+    result = _db_lookup(kind, sha, dh) if RECOGNITION_CACHE_DB else None
+    with _lock:
+        if result is None:
+            _misses += 1
+            return None
+        _hits += 1
+        _cache[(kind, sha)] = (dh, thumb, result)
+    return json.loads(json.dumps(result))
+
+
+def store(kind, fp, result):
+    if not RECOGNITION_CACHE_ENABLED:
+        return
+    sha, dh, thumb = fp
+    with _lock:
+        _cache[(kind, sha)] = (dh, thumb, json.loads(json.dumps(result)))
+    if RECOGNITION_CACHE_DB:
+        _db_store(kind, sha, dh, result)
+
+
+def stats():
+    with _lock:
+        return {
+            "entries": len(_cache),
+            "hits": _hits,
+            "near_hits": _near_hits,
+            "misses": _misses,
+            "db": RECOGNITION_CACHE_DB,
+        }
+
+
+# ---------------------------------------------------------
+# DB 단계 (recognition_cache 테이블)
+# ---------------------------------------------------------
+def _db_lookup(kind, sha, dh):
+    try:
+        conn = get_conn()
+    except Exception as e:
+        print(f"⚠️ 인식 캐시 조회 실패: {e}")
+        return None
+    try:
+        with conn.cursor() as cur:
+            if dh is None or kind in THUMB_KINDS:
+                cur.execute(
+                    "SELECT result FROM recognition_cache WHERE kind = %s AND sha256 = %s AND expires_at > NOW()",
+                    (kind, sha),
+                )
+            else:
+                cur.execute(
+                    """
+                    SELECT result FROM recognition_cache
+                    WHERE kind = %s AND (sha256 = %s OR dhash = %s) AND expires_at > NOW()
+                    ORDER BY sha256 = %s DESC LIMIT 1
+                    """,
+                    (kind, sha, dh, sha),
+                )
+            row = cur.fetchone()
+        return json.loads(row["result"]) if row else None
+    except Exception as e:
+        print(f"⚠️ 인식 캐시 조회 실패: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def _db_store(kind, sha, dh, result):
+    global _last_purge
+    try:
+        conn = get_conn()
+    except Exception as e:
+        print(f"⚠️ 인식 캐시 저장 실패: {e}")
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO recognition_cache (kind, sha256, dhash, result, expires_at)
+                VALUES (%s, %s, %s, %s, NOW() + INTERVAL %s SECOND)
+                ON DUPLICATE KEY UPDATE dhash = VALUES(dhash), result = VALUES(result), expires_at = VALUES(expires_at)
+                """,
+                (kind, sha, dh, json.dumps(result, ensure_ascii=False), RECOGNITION_CACHE_TTL_SEC),
+            )
+            if time.monotonic() - _last_purge >= RECOGNITION_DB_PURGE_SEC:
+                _last_purge = time.monotonic()
+                cur.execute("DELETE FROM recognition_cache WHERE expires_at <= NOW() LIMIT 1000")
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ 인식 캐시 저장 실패: {e}")
+    finally:
+        conn.close()
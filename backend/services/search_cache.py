@@ -0,0 +1,90 @@
+# backend/services/search_cache.py
+"""
+[알약 검색 결과 캐시]
+GET /api/pills 응답 중 로그인과 무관한 부분(목록/개수/커서)을 검색 조건별로 저장합니다.
+사용자별 is_liked 는 캐시에서 꺼낸 뒤 호출한 쪽에서 덧씌웁니다.
+
+- 전체 크기를 바이트(대략 JSON 크기) 기준으로 제한하고 넘치면 오래 안 쓴 것부터 삭제 (LRU)
+- 항목마다 SEARCH_CACHE_TTL_SEC 가 지나면 만료 (조회수 정렬이 너무 오래 고정되지 않도록)
+- 약 데이터가 바뀌면(admin 삭제, 데이터 임포트 감지) invalidate() 로 통째로 비움
+"""
+
+import os
+import json
+import time
+import threading
+
+from cachetools import LRUCache, TTLCache
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") == "1"
+SEARCH_CACHE_TTL_SEC = int(os.getenv("SEARCH_CACHE_TTL_SEC", 60))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_MB", 64)) * 1024 * 1024
+SEARCH_TOTAL_TTL_SEC = int(os.getenv("SEARCH_TOTAL_TTL_SEC", 300))
+
+_lock = threading.Lock()
+_results = LRUCache(maxsize=SEARCH_CACHE_MAX_BYTES, getsizeof=lambda entry: entry[2])
+
+# 검색 조건별 전체 개수: filter_key -> {단계: 개수} (routers/pills._search_page). 필터가 바뀔 때만 COUNT 를 다시 셈
+_totals = TTLCache(maxsize=2048, ttl=SEARCH_TOTAL_TTL_SEC)
+
+_hits = 0
+_misses = 0
+
+
+def make_key(*parts):
+    return tuple(p.strip() or None if isinstance(p, str) else p for p in parts)
+
+
+def get(key):
+    """저장된 응답(읽기 전용으로 취급할 것) 또는 None"""
+    global _hits, _misses
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    with _lock:
+        entry = _results.get(key)
+        if entry is not None and entry[1] < time.monotonic():
+            del _results[key]
+            entry = None
+        if entry is None:
+            _misses += 1
+            return None
+        _hits += 1
+        return entry[0]
+
+
+def put(key, value):
+    if not SEARCH_CACHE_ENABLED:
+        return
+    size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    if size > SEARCH_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        _results[key] = (value, time.monotonic() + SEARCH_CACHE_TTL_SEC, size)
+
+
+def get_total(filter_key):
+    with _lock:
+        return _totals.get(filter_key)
+
+
+def put_total(filter_key, value):
+    with _lock:
+        _totals[filter_key] = value
+
+
+def invalidate():
+    """약 데이터(pill_mfds)가 바뀌었을 때 호출"""
+    with _lock:
+        _results.clear()
+        _totals.clear()
+
+
+def stats():
+    with _lock:
+        return {
+            "entries": len(_results),
+            "bytes": _results.currsize,
+            "max_bytes": _results.maxsize,
+            "hits": _hits,
+            "misses": _misses,
+        }
@@ -1,6 +1,7 @@
 # backend/services/trend_service.py
 
 from db import get_conn
+from services import search_cache
 import datetime
 
 def update_daily_trends():
@@ -59,6 +60,8 @@ def update_daily_trends():
                 print(f"   🔥 급상승 키워드 '{keyword}' ({count}회) -> 관련 약품 점수 +{bonus_score}")
 
             conn.commit()
+            # 인기순 정렬이 바뀌었으므로 캐시된 검색 결과를 바로 비움
+            search_cache.invalidate()
             print(f">>> ✅ 총 {updated_count}개 약품의 순위가 트렌드에 맞춰 조정되었습니다.")
 
     except Exception as e:
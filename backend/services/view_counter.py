@@ -0,0 +1,97 @@
+# backend/services/view_counter.py
+"""
+[조회수 모아서 쓰기]
+상세 페이지를 열 때마다 UPDATE ... SET view_count = view_count + 1 을 바로 실행하지 않고
+메모리에 모아뒀다가 VIEW_FLUSH_INTERVAL_SEC 마다 한 번의 UPDATE 로 반영합니다.
+인기 약 하나에 요청이 몰려도 같은 행 잠금을 두고 줄 서지 않게 하기 위함입니다.
+
+- 서버 종료 시(lifespan) 남은 값을 한 번 더 반영
+- 반영에 실패하면 다음 주기에 다시 시도하도록 되돌려 놓음
+- 프로세스가 비정상 종료되면 마지막 주기의 조회수는 유실될 수 있음 (조회수라 허용)
+"""
+
+import os
+import asyncio
+import threading
+from collections import defaultdict
+
+from db import get_conn
+
+VIEW_FLUSH_INTERVAL_SEC = float(os.getenv("VIEW_FLUSH_INTERVAL_SEC", 5))
+VIEW_FLUSH_BATCH = 500  # UPDATE 한 번에 넣을 최대 행 수
+
+
+class ViewCounter:
+    def __init__(self, table, key_col, count_col):
+        self.table = table
+        self.key_col = key_col
+        self.count_col = count_col
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def incr(self, key, n=1):
+        with self._lock:
+            self._pending[key] += n
+
+    def pending(self, key):
+        """아직 DB 에 반영 안 된 조회수 (응답에 더해서 보여주기용)"""
+        with self._lock:
+            return self._pending.get(key, 0)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, defaultdict(int)
+        if not batch:
+            return 0
+
+        items = list(batch.items())
+        done = 0
+        try:
+            conn = get_conn()
+        except Exception as e:
+            print(f"🚨 조회수 반영 실패 ({self.table}): {e}")
+            for key, n in items:
+                self.incr(key, n)
+            return 0
+        try:
+            with conn.cursor() as cur:
+                for start in range(0, len(items), VIEW_FLUSH_BATCH):
+                    chunk = items[start:start + VIEW_FLUSH_BATCH]
+                    # UPDATE t SET c = c + CASE k WHEN 1 THEN 3 WHEN 2 THEN 1 END WHERE k IN (1, 2)
+                    cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    params = [v for pair in chunk for v in pair] + [key for key, _ in chunk]
+                    cur.execute(
+                        f"UPDATE {self.table} SET {self.count_col} = {self.count_col} + "
+                        f"CASE {self.key_col} {cases} ELSE 0 END WHERE {self.key_col} IN ({placeholders})",
+                        tuple(params),
+                    )
+                    conn.commit()
+                    done += len(chunk)
+        except Exception as e:
+            print(f"🚨 조회수 반영 실패 ({self.table}): {e}")
+            # 반영 못 한 나머지는 다음 주기에 다시
+            for key, n in items[done:]:
+                self.incr(key, n)
+        finally:
+            conn.close()
+        return done
+
+
+pill_views = ViewCounter("pill_mfds", "item_seq", "view_count")
+post_views = ViewCounter("posts", "id", "views")
+
+
+def flush_all():
+    pill_views.flush()
+    post_views.flush()
+
+
+async def flush_loop():
+    """lifespan 에서 백그라운드 태스크로 실행"""
+    while True:
+        await asyncio.sleep(VIEW_FLUSH_INTERVAL_SEC)
+        try:
+            await asyncio.to_thread(flush_all)
+        except Exception as e:
+            print(f"🚨 조회수 반영 실패: {e}")
@@ -0,0 +1,223 @@
+# backend/services/visual_index.py
+"""
+[알약 사진 유사도 색인]
+pill_mfds 낱알 사진(item_image)마다 작은 외형 벡터를 미리 계산해 두고,
+사진 분석에서 잘라낸 알약(crop)과 가장 비슷하게 생긴 약을 찾거나 후보 순서를 다시 매깁니다.
+
+- 외형 벡터(81차원 float32): HSV 색상 히스토그램(18x4) + 밝기 평균/표준편차 + Hu 모멘트(4) + 비율(가로세로/extent/solidity)
+- 파일: models/visual_index.npy (행렬, mmap 으로 읽음) + models/visual_index_seqs.npy (행 순서의 item_seq)
+    python -m services.visual_index [최대 약 개수]   # 오프라인으로 생성, 서버 재시작 시 반영
+- 검색: ||X - q||^2 = |X|^2 - 2Xq + |q|^2 를 행렬 곱 한 번으로 계산 (카탈로그 전체 수 ms)
+- 파일이 없으면 get_index() 가 None -> 호출한 쪽은 기존 순서 그대로
+"""
+
+import os
+import threading
+import urllib.request
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from db import get_conn
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+VISUAL_INDEX_ENABLED = os.getenv("VISUAL_INDEX_ENABLED", "1") == "1"
+VISUAL_INDEX_PATH = os.getenv("VISUAL_INDEX_PATH", str(BASE_DIR / "models" / "visual_index.npy"))
+VISUAL_INDEX_SEQS_PATH = VISUAL_INDEX_PATH.replace(".npy", "_seqs.npy")
+
+WORK_SIDE = 256         # 외형 계산 전에 긴 변을 이 크기로
+H_BINS, S_BINS = 18, 4
+W_COLOR, W_SHAPE, W_RATIO = 1.0, 0.3, 1.0  # 항목별 가중치
+
+
+# ---------------------------------------------------------
+# 외형 벡터
+# ---------------------------------------------------------
+def _pill_contour(img):
+    """배경과 알약을 Otsu 로 나눈 뒤 가장 큰 윤곽선 (없으면 None)"""
+    gray = cv2.GaussianBlur(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    border = np.concatenate([th[0], th[-1], th[:, 0], th[:, -1]])
+    if border.mean() > 127:  # 배경이 흰색으로 잡힘 -> 반전
+        th = 255 - th
+    contours, _ = cv2.findContours(th, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    cnt = max(contours, key=cv2.contourArea)
+    return cnt if cv2.contourArea(cnt) >= 0.02 * th.size else None
+
+
+def describe(image_bytes):
+    """이미지 바이트 -> 외형 벡터 (디코딩 실패면 None)"""
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    scale = WORK_SIDE / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    cnt = _pill_contour(img)
+    mask = None
+    if cnt is not None:
+        mask = np.zeros(img.shape[:2], np.uint8)
+        cv2.drawContours(mask, [cnt], -1, 255, -1)
+
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], mask, [H_BINS, S_BINS], [0, 180, 0, 256]).ravel()
+    hist = np.sqrt(hist / (hist.sum() or 1.0))  # Hellinger -> 길이 1
+    v = hsv[:, :, 2][mask > 0] if mask is not None else hsv[:, :, 2].ravel()
+    value = np.array([v.mean(), v.std()]) / 255.0 if v.size else np.zeros(2)
+
+    if cnt is not None:
+        hu = cv2.HuMoments(cv2.moments(cnt)).ravel()[:4]
+        hu = np.clip(-np.sign(hu) * np.log10(np.abs(hu) + 1e-30) / 10.0, -1.0, 1.0)
+        area = cv2.contourArea(cnt)
+        rw, rh = cv2.minAreaRect(cnt)[1]
+        hull = cv2.contourArea(cv2.convexHull(cnt))
+        ratios = np.array([
+            min(rw, rh) / max(rw, rh) if max(rw, rh) else 0.0,
+            area / (rw * rh) if rw * rh else 0.0,
+            area / hull if hull else 0.0,
+        ])
+    else:
+        hu, ratios = np.zeros(4), np.zeros(3)
+
+    return np.concatenate([hist * W_COLOR, value * W_COLOR, hu * W_SHAPE, ratios * W_RATIO]).astype(np.float32)
+
+
+# ---------------------------------------------------------
+# 검색
+# ---------------------------------------------------------
+class VisualIndex:
+    def __init__(self, matrix, seqs):
+        self.matrix = matrix                                   # (N, D) float32, mmap
+        self.seqs = [str(s).strip() for s in seqs]
+        self.positions = {seq: i for i, seq in enumerate(self.seqs)}
+        self.norms = np.einsum("ij,ij->i", matrix, matrix)     # |X|^2 (메모리에 N 개)
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def distances(self, vec):
+        return self.norms - 2.0 * (self.matrix @ vec) + float(vec @ vec)
+
+    def search(self, vec, k=5):
+        """가장 비슷한 약 [(item_seq, 거리), ...]"""
+        d = self.distances(vec)
+        k = min(k, len(d))
+        if k <= 0:
+            return []
+        idx = np.argpartition(d, k - 1)[:k]
+        idx = idx[np.argsort(d[idx])]
+        return [(self.seqs[i], float(d[i])) for i in idx]
+
+
+_index = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_index():
+    """처음 쓸 때 파일을 mmap 으로 읽음. 꺼져 있거나 파일이 없으면 None"""
+    global _index, _loaded
+    if _loaded:
+        return _index
+    with _lock:
+        if not _loaded:
+            if VISUAL_INDEX_ENABLED and os.path.exists(VISUAL_INDEX_PATH) and os.path.exists(VISUAL_INDEX_SEQS_PATH):
+                try:
+                    _index = VisualIndex(np.load(VISUAL_INDEX_PATH, mmap_mode="r"), np.load(VISUAL_INDEX_SEQS_PATH))
+                    print(f">>> 🖼️ 알약 사진 유사도 색인 로드: {len(_index)}개")
+                except Exception as e:
+                    print(f"🚨 알약 사진 유사도 색인 로드 실패: {e}")
+            _loaded = True
+    return _index
+
+
+def similar_seqs(image_bytes, k=5):
+    """crop 과 가장 비슷하게 생긴 약의 item_seq 목록 (색인이 없거나 실패하면 [])"""
+    index = get_index()
+    if index is None or not image_bytes:
+        return []
+    vec = describe(image_bytes)
+    return [seq for seq, _ in index.search(vec, k)] if vec is not None else []
+
+
+def rerank(rows, image_bytes):
+    """
+    후보 행 목록을 (각인 일치 단계 match_tier, 각인 점수 match_score 내림차순, 사진 거리 오름차순) 으로 다시 정렬.
+    단계와 점수가 같은 후보들 사이에서만 순서가 바뀜. 색인에 없는 약은 같은 점수 안에서 맨 뒤
+    """
+    index = get_index()
+    if index is None or not image_bytes or len(rows) < 2:
+        return rows
+    vec = describe(image_bytes)
+    if vec is None:
+        return rows
+    d = index.distances(vec)
+    def key(row):
+        pos = index.positions.get(str(row["item_seq"]).strip())
+        return (row.get("match_tier", 0), -row.get("match_score", 0.0), float(d[pos]) if pos is not None else float("inf"))
+    return sorted(rows, key=key)
+
+
+# ---------------------------------------------------------
+# 색인 만들기 (오프라인)
+# ---------------------------------------------------------
+def _read_image(location):
+    """item_image 가 URL 이면 내려받고, 아니면 backend 기준 로컬 파일"""
+    if location.startswith(("http://", "https://")):
+        with urllib.request.urlopen(location, timeout=10) as res:
+            return res.read()
+    path = Path(location)
+    if not path.is_absolute():
+        path = BASE_DIR / location.lstrip("/")
+    return path.read_bytes()
+
+
+def build(limit=None, out=VISUAL_INDEX_PATH):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            sql = """
+                SELECT item_seq, item_image FROM pill_mfds
+                WHERE item_image IS NOT NULL AND item_image <> ''
+                ORDER BY popularity_score DESC
+            """
+            if limit:
+                sql += f" LIMIT {int(limit)}"
+            cur.execute(sql)
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    vectors, seqs = [], []
+    for row in rows:
+        try:
+            vec = describe(_read_image(row["item_image"]))
+        except Exception as e:
+            print(f"⚠️ 사진 읽기 실패 ({row['item_seq']}): {e}")
+            continue
+        if vec is not None:
+            vectors.append(vec)
+            seqs.append(str(row["item_seq"]).strip())
+
+    if not vectors:
+        print("🚨 외형 벡터를 하나도 만들지 못했습니다.")
+        return
+    # 임시 파일에 쓴 뒤 교체 (실행 중인 서버가 반쯤 쓴 파일을 읽지 않도록)
+    seqs_out = out.replace(".npy", "_seqs.npy")
+    Path(out).parent.mkdir(parents=True, exist_ok=True)
+    np.save(out + ".tmp.npy", np.stack(vectors))
+    np.save(seqs_out + ".tmp.npy", np.array(seqs))
+    os.replace(out + ".tmp.npy", out)
+    os.replace(seqs_out + ".tmp.npy", seqs_out)
+    print(f">>> ✅ {out}: {len(seqs)}개 ({len(vectors[0])}차원)")
+
+
+if __name__ == "__main__":
+    import sys
+    build(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,6 @@
+# backend/tests — 실행: backend 폴더에서 python -m pytest -q
+# DB / 외부 API 없이 도는 단위 테스트만 둠 (필요한 패키지가 없으면 해당 테스트는 건너뜀)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
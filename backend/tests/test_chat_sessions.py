@@ -0,0 +1,36 @@
+# services/chat_sessions.py 최근 대화 예산 — 보내는 대화와 요약할 대화 사이에 빠지는 게 없어야 함
+import pytest
+
+pytest.importorskip("cachetools")
+
+from services import chat_sessions  # noqa: E402
+
+
+def _turns(count, chars):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:03d}" + "가" * chars}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("question_chars", [0, 200, 1400, 5000])
+def test_every_turn_is_sent_or_summarized(monkeypatch, question_chars):
+    monkeypatch.setattr(chat_sessions, "CHAT_HISTORY_TOKENS", 1500)
+    session = chat_sessions.ChatSession("s")
+    session.turns = _turns(30, 100)
+
+    question = "나" * question_chars
+    sent = chat_sessions.build_messages(session, "system", question)[1:-1]
+    old = chat_sessions.overflow(session)
+
+    assert [t["content"] for t in old] + [m["content"] for m in sent] == [t["content"] for t in session.turns]
+    assert sum(chat_sessions.estimate_tokens(m["content"]) for m in sent) <= chat_sessions.CHAT_HISTORY_TOKENS
+
+
+def test_summary_goes_before_recent_turns():
+    session = chat_sessions.ChatSession("s")
+    session.summary = "두통, 임신 중"
+    session.turns = _turns(2, 10)
+    messages = chat_sessions.build_messages(session, "system", "질문")
+    assert [m["role"] for m in messages] == ["system", "system", "user", "assistant", "user"]
+    assert "두통, 임신 중" in messages[1]["content"]
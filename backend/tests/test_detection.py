@@ -0,0 +1,76 @@
+# main.py 알약 탐지 — 큰 사진은 축소본에서 찾고, 원본은 탐지가 끝난 뒤 자를 때만 디코딩
+import asyncio
+import io
+
+import pytest
+
+for _mod in ("fastapi", "jose", "google.generativeai", "google.cloud.vision", "dotenv", "pymysql", "aiomysql", "cachetools", "cv2", "numpy", "PIL", "openai"):
+    pytest.importorskip(_mod)
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+import main  # noqa: E402
+
+W, H = 4000, 3000  # 12MP
+BIG = (800, 1200, 1400, 1600)     # 600x400 알약
+SMALL = (2500, 1500, 2560, 1560)  # 60x60 알약 (짧은 변 4% = 120px 기준이면 빠짐, 예전 40px 기준이면 잡힘)
+
+
+def _photo():
+    img = Image.new("RGB", (W, H), (120, 130, 140))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse(BIG, fill=(245, 245, 240))
+    draw.ellipse(SMALL, fill=(245, 245, 240))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _contains(box, pill, slack):
+    x1, y1, x2, y2 = box
+    px1, py1, px2, py2 = pill
+    return x1 <= px1 and y1 <= py1 and x2 >= px2 and y2 >= py2 and \
+        x1 >= px1 - slack and y1 >= py1 - slack and x2 <= px2 + slack and y2 <= py2 + slack
+
+
+def test_large_photo_detects_on_downscaled_image():
+    detect_image, orig_size = main.load_detection_image(_photo())
+    assert orig_size == (W, H)
+    assert max(detect_image.size) <= main.DETECT_MAX_SIDE
+
+    boxes = main.detect_pill_boxes(detect_image, orig_size)
+    assert len(boxes) == 2
+    # 여백: 12MP 에서는 예전과 같은 25px (+ 축소본에서 찾은 테두리 몇 px 오차)
+    assert max(H * main.DETECT_PAD_FRAC, main.DETECT_PAD_PX) == pytest.approx(25, abs=1)
+    slack = 25 + 60
+    assert _contains(boxes[0], BIG, slack)
+    assert _contains(boxes[1], SMALL, slack)
+
+
+def test_full_image_decoded_after_detection(monkeypatch):
+    calls = []
+    real_detect, real_full = main.detect_pill_boxes, main.load_full_image
+
+    def detect(*args):
+        calls.append("detect")
+        return real_detect(*args)
+
+    def full(*args):
+        calls.append("full")
+        return real_full(*args)
+
+    async def no_results(crops, *args):
+        calls.append(("crops", len(crops)))
+        return
+        yield
+
+    monkeypatch.setattr(main, "detect_pill_boxes", detect)
+    monkeypatch.setattr(main, "load_full_image", full)
+    monkeypatch.setattr(main, "crop_result_events", no_results)
+
+    async def run():
+        return [event async for event in main.analyze_events(_photo())]
+
+    events = asyncio.run(run())
+    assert calls == ["detect", "full", ("crops", 2)]
+    assert events[0] == {"type": "detected", "method": "opencv", "count": 2}
@@ -0,0 +1,71 @@
+# services/imprint_matcher.py 각인 오타 보정 + pill_index.ImprintIndex.match 단계 순서
+import random
+import time
+
+import pytest
+
+for _mod in ("pymysql", "cachetools", "numpy"):
+    pytest.importorskip(_mod)
+
+from services.imprint_matcher import ImprintMatcher, weighted_distance, weighted_distances  # noqa: E402
+from services.pill_index import ImprintIndex  # noqa: E402
+
+
+def test_batched_distances_match_scalar():
+    rng = random.Random(3)
+    chars = "ABGO0816ILSZHNM가나"
+    for _ in range(300):
+        a = "".join(rng.choice(chars) for _ in range(rng.randint(1, 8)))
+        targets = ["".join(rng.choice(chars) for _ in range(rng.randint(1, 9))) for _ in range(5)]
+        expected = [weighted_distance(a, b) for b in targets]
+        assert weighted_distances(a, targets).tolist() == pytest.approx(expected)
+
+
+def test_confused_characters_score_high():
+    matcher = ImprintMatcher()
+    for doc_id, imprint in enumerate(["GHB", "GHX", "TYLENOL"]):
+        matcher.add(imprint, doc_id)
+    imprint, score, docs = matcher.match("GH8")[0]
+    assert (imprint, docs) == ("GHB", [0])
+    assert score == pytest.approx(1 - 0.2 / 3, abs=1e-3)
+
+
+def _row(seq, front, name=""):
+    return {"item_seq": seq, "print_front": front, "print_back": "", "item_name": name}
+
+
+def test_match_ranks_exact_then_substring_then_fuzzy():
+    # 인기순: 비슷한 각인(A8C) 이 제일 인기 있어도 똑같은 각인, 들어 있는 각인보다 뒤
+    index = ImprintIndex([_row("1", "A8C"), _row("2", "XABC"), _row("3", "ABC")])
+    tiers = [(row["item_seq"], row["match_tier"]) for row in index.match("ABC")]
+    assert tiers == [("3", 0), ("2", 1), ("1", 2)]
+
+
+def test_match_skips_fuzzy_when_exact_fills_limit(monkeypatch):
+    index = ImprintIndex([_row(str(i), "ABC") for i in range(3)] + [_row("9", "A8C")])
+    monkeypatch.setattr(index, "fuzzy_search_ids", lambda *a, **k: pytest.fail("fuzzy 까지 가면 안 됨"))
+    assert [row["item_seq"] for row in index.match("ABC", limit=3)] == ["0", "1", "2"]
+
+
+def test_uncached_fuzzy_under_a_millisecond():
+    rng = random.Random(0)
+    chars = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+    imprints = sorted({"".join(rng.choice(chars) for _ in range(rng.randint(2, 7))) for _ in range(31000)})[:30000]
+    matcher = ImprintMatcher()
+    for doc_id, imprint in enumerate(imprints):
+        matcher.add(imprint, doc_id)
+    queries = []
+    for _ in range(500):
+        chars_ = list(rng.choice(imprints))
+        chars_[rng.randrange(len(chars_))] = rng.choice("0O8B1I6G")
+        queries.append("".join(chars_))
+
+    def run():
+        started = time.perf_counter()
+        for q in queries:
+            matcher._memo.clear()
+            matcher.match(q)
+        return (time.perf_counter() - started) / len(queries)
+
+    run()  # 2-gram 배열 준비
+    assert min(run() for _ in range(3)) < 0.001
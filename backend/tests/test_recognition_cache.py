@@ -0,0 +1,76 @@
+# services/recognition_cache.py 비슷한 사진 찾기 — 잘라낸 알약(crop)은 dHash + 축소본 비교
+import numpy as np
+import pytest
+
+for _mod in ("pymysql", "cachetools", "cv2"):
+    pytest.importorskip(_mod)
+
+from services import recognition_cache  # noqa: E402
+
+RESULT = {"print": "AB12", "color": "하양", "confidence": 0.9}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(recognition_cache, "_cache", {})
+    monkeypatch.setattr(recognition_cache, "RECOGNITION_CACHE_ENABLED", True)
+    monkeypatch.setattr(recognition_cache, "RECOGNITION_CACHE_DB", False)
+
+
+def _thumb(value=200):
+    size = recognition_cache.THUMB_SIZE
+    return np.full((size, size), value, dtype=np.int16)
+
+
+def test_crop_near_match_within_pixel_threshold():
+    thumb = _thumb()
+    recognition_cache.store("crop", ("a", 0b1010, thumb), RESULT)
+
+    noisy = thumb.copy()
+    noisy[::3, ::3] += recognition_cache.RECOGNITION_CROP_PIXEL_MAX_DIFF  # 재압축 잡음 정도
+    assert recognition_cache.lookup("crop", ("b", 0b1011, noisy)) == RESULT
+
+
+def test_crop_near_match_rejects_local_imprint_difference():
+    thumb = _thumb()
+    recognition_cache.store("crop", ("a", 0b1010, thumb), RESULT)
+
+    other = thumb.copy()
+    other[18:22, 20:23] -= recognition_cache.RECOGNITION_CROP_PIXEL_MAX_DIFF + 1  # 각인 한 획만 다름
+    assert recognition_cache.lookup("crop", ("b", 0b1010, other)) is None
+
+
+def test_crop_near_match_rejects_far_dhash():
+    thumb = _thumb()
+    recognition_cache.store("crop", ("a", 0, thumb), RESULT)
+
+    far = (1 << (recognition_cache.RECOGNITION_DHASH_MAX_DIST + 1)) - 1
+    assert recognition_cache.lookup("crop", ("b", far, thumb)) is None
+
+
+def test_pill_kind_skips_hashing(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("pill 은 디코딩하지 않아야 함")
+
+    monkeypatch.setattr(recognition_cache.cv2, "imdecode", fail)
+    sha, dh, thumb = recognition_cache.fingerprint(b"image", "pill")
+    assert len(sha) == 64 and dh is None and thumb is None
+
+
+def _pill_jpeg(cv2, imprint, quality):
+    img = np.full((120, 160, 3), (110, 90, 70), np.uint8)
+    cv2.ellipse(img, (80, 60), (70, 50), 0, 0, 360, (235, 240, 240), -1)
+    cv2.putText(img, imprint, (42, 72), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (165, 170, 170), 2)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+    return buf.tobytes()
+
+
+def test_crop_fingerprint_matches_recompressed_but_not_other_imprint():
+    cv2 = recognition_cache.cv2
+    recognition_cache.store("crop", recognition_cache.fingerprint(_pill_jpeg(cv2, "AB12", 95), "crop"), RESULT)
+
+    recompressed = recognition_cache.fingerprint(_pill_jpeg(cv2, "AB12", 85), "crop")
+    other = recognition_cache.fingerprint(_pill_jpeg(cv2, "XY89", 95), "crop")
+    assert recognition_cache.lookup("crop", recompressed) == RESULT
+    assert recognition_cache.lookup("crop", other) is None
@@ -0,0 +1,63 @@
+# routers/pills.py 키셋(커서) 페이지 — NULL 이 섞인 정렬 컬럼에서도 빠짐/중복 없이
+import json
+import sqlite3
+
+import pytest
+
+for _mod in ("fastapi", "jose", "google.generativeai", "dotenv", "pymysql", "aiomysql", "cachetools", "cv2", "numpy"):
+    pytest.importorskip(_mod)
+
+from routers import pills  # noqa: E402
+
+ROWS = [
+    ("1", 5, "가나정"),
+    ("2", None, "다라정"),
+    ("3", 5, None),
+    ("4", None, None),
+    ("5", 0, "가나정"),
+    ("6", 9, "마바정"),
+    ("7", None, "가나정"),
+]
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE pill_mfds (item_seq TEXT PRIMARY KEY, view_count INTEGER, item_name TEXT)")
+    conn.executemany("INSERT INTO pill_mfds VALUES (?, ?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+def _walk(db, sort_mode, page_size=2):
+    """커서를 따라 끝까지 넘기면서 나온 item_seq 순서"""
+    seen, keyset = [], None
+    for _ in range(len(ROWS) + 1):
+        where, params = "1=1", []
+        if keyset is not None:
+            where, params = pills._keyset_clause(sort_mode, keyset)
+        sql = f"SELECT * FROM pill_mfds AS m WHERE {where} {pills._order_by(sort_mode)} LIMIT ?"
+        items = [dict(row) for row in db.execute(sql.replace("%s", "?"), params + [page_size + 1])]
+        seen += [item["item_seq"] for item in items[:page_size]]
+        if len(items) <= page_size:
+            return seen
+        cursor = pills._encode_cursor(sort_mode, "f", items[page_size - 1], {"all": len(ROWS)}, "all")
+        keyset = pills._decode_cursor(cursor, "f")["k"]
+    raise AssertionError("커서가 끝나지 않음")
+
+
+@pytest.mark.parametrize("sort_mode", ["popular", "name", "recent"])
+def test_keyset_pages_cover_null_rows_once(db, sort_mode):
+    full = [row["item_seq"] for row in db.execute(f"SELECT * FROM pill_mfds AS m {pills._order_by(sort_mode)}")]
+
+    assert _walk(db, sort_mode) == full
+    assert sorted(full) == sorted(seq for seq, _, _ in ROWS)
+
+
+def test_cursor_stores_null_sort_values_as_coalesced_defaults():
+    cursor = pills._encode_cursor("popular", "f", {"item_seq": "4", "view_count": None, "item_name": None}, {}, "all")
+    data = pills._decode_cursor(cursor, "f")
+
+    assert data["k"] == [0, "", "4"]
+    assert json.loads(json.dumps(data["k"])) == [0, "", "4"]
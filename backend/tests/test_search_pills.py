@@ -0,0 +1,89 @@
+# routers/pills.py 알약 검색 — 각인/제조사 단계 검색(_search_page)
+import asyncio
+
+import pytest
+
+for _mod in ("fastapi", "jose", "google.generativeai", "dotenv", "pymysql", "aiomysql", "cachetools", "cv2", "numpy"):
+    pytest.importorskip(_mod)
+
+from routers import pills  # noqa: E402
+
+BASE_FROM = "FROM pill_mfds AS m LEFT JOIN pill_easy_info AS e ON m.item_seq = e.item_seq"
+
+
+class FakeCursor:
+    """execute 한 SQL 을 기록하고, fetch 결과는 미리 넣어 둔 순서대로"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+
+    async def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    async def fetchall(self):
+        return self.results.pop(0)
+
+    async def fetchone(self):
+        return self.results.pop(0)
+
+
+def _rows(*seqs):
+    return [{"item_seq": seq, "view_count": 0, "item_name": seq} for seq in seqs]
+
+
+def _page(cur, counts, print_front="AB", limit=21, offset=0, **kwargs):
+    filters = (None, None, None, print_front, None, None)
+    return asyncio.run(pills._search_page(
+        cur, filters, False, BASE_FROM, [], "0", "popular", counts, limit=limit, offset=offset, **kwargs
+    ))
+
+
+def test_default_search_uses_prefix_only_when_page_is_full():
+    cur = FakeCursor(_rows(*[f"P{i}" for i in range(21)]))
+    counts = {"prefix": 50}
+
+    rows = _page(cur, counts)
+
+    assert len(rows) == 21 and all(phase == "prefix" for phase, _ in rows)
+    assert len(cur.executed) == 1
+    sql, params = cur.executed[0]
+    assert "m.print_front_norm LIKE %s" in sql
+    assert "AB%" in params and "%AB%" not in params
+    assert "infix" not in counts
+
+
+def test_infix_fills_remaining_slots_after_prefix():
+    cur = FakeCursor(_rows("P1", "P2"), _rows("X1"))
+    counts = {"prefix": 2}
+
+    rows = _page(cur, counts)
+
+    assert [(phase, row["item_seq"]) for phase, row in rows] == [("prefix", "P1"), ("prefix", "P2"), ("infix", "X1")]
+    assert len(cur.executed) == 2  # 중간 일치를 끝까지 읽었으니 COUNT 는 따로 안 함
+    sql, params = cur.executed[1]
+    assert "NOT (m.print_front_norm LIKE %s)" in sql
+    assert "%AB%" in params and "AB%" in params
+    assert params[-2:] == (19, 0)
+    assert counts == {"prefix": 2, "infix": 1}
+
+
+def test_offset_past_prefix_rows_starts_in_infix_phase():
+    cur = FakeCursor(_rows("X3"), )
+    counts = {"prefix": 20, "infix": 5}
+
+    rows = _page(cur, counts, offset=22)
+
+    assert [phase for phase, _ in rows] == ["infix"]
+    sql, params = cur.executed[0]
+    assert "NOT (" in sql and params[-1] == 2
+
+
+def test_search_without_imprint_filters_is_single_phase():
+    cur = FakeCursor(_rows("A1"))
+    counts = {"all": 1}
+
+    rows = _page(cur, counts, print_front=None)
+
+    assert [phase for phase, _ in rows] == ["all"]
+    assert "NOT (" not in cur.executed[0][0]
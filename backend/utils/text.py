@@ -0,0 +1,17 @@
+# 검색어 정규화 / LIKE 패턴 도우미
+# DB 의 *_norm 컬럼(migrations/001)과 같은 규칙: 공백 제거 + 대문자
+
+def normalize_search_text(value) -> str:
+    return (value or "").replace(" ", "").upper()
+
+def _escape_like(value: str) -> str:
+    # 사용자 입력의 %, _ 가 와일드카드로 동작하지 않도록
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def like_prefix(value: str) -> str:
+    """'ABC%' — 인덱스를 탈 수 있는 접두 검색"""
+    return f"{_escape_like(value)}%"
+
+def like_contains(value: str) -> str:
+    """'%ABC%' — 중간 일치 (인덱스 못 탐, 접두 검색 실패 시에만 사용)"""
+    return f"%{_escape_like(value)}%"
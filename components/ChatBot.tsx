@@ -3,9 +3,18 @@ import axios from "axios";
 import { MessageCircle, X, Send, Bot } from "lucide-react";
 import { useNavigate } from "react-router-dom";
 
+// 서버가 답변 속 [[약 이름]] 을 미리 찾아 둔 약 정보
+interface DrugLink {
+  name: string;
+  item_seq: string;
+  item_name: string;
+  item_image?: string | null;
+}
+
 interface Message {
   role: "user" | "assistant";
   content: string;
+  links?: DrugLink[];
 }
 
 interface ChatBotProps {
@@ -26,6 +35,7 @@ export default function ChatBot({ isOpen, setIsOpen }: ChatBotProps) {
     },
   ]);
   const [loading, setLoading] = useState(false);
+  const [sessionId, setSessionId] = useState<string | null>(null); // 대화 기록은 서버 세션에 보관
   const [isComposing, setIsComposing] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
@@ -43,10 +53,17 @@ export default function ChatBot({ isOpen, setIsOpen }: ChatBotProps) {
     setLoading(true);
 
     try {
+      // 기록은 서버 세션에 있지만, 세션이 만료됐거나 다른 서버로 가서 못 찾을 때를 위해 최근 기록도 같이 보냄
+      // (서버는 세션을 찾으면 messages 를 쓰지 않음)
       const recentMessages = [...messages, userMsg].slice(-6);
-      const res = await axios.post(`${API_BASE}/api/chat`, { messages: recentMessages });
-      
-      const aiMsg: Message = { role: "assistant", content: res.data.reply };
+      const res = await axios.post(`${API_BASE}/api/chat`, {
+        session_id: sessionId,
+        message: userMsg.content,
+        messages: recentMessages,
+      });
+      if (res.data.session_id) setSessionId(res.data.session_id);
+
+      const aiMsg: Message = { role: "assistant", content: res.data.reply, links: res.data.links };
       setMessages((prev) => [...prev, aiMsg]);
     } catch (error) {
       setMessages((prev) => [...prev, { role: "assistant", content: "죄송합니다. 잠시 후 다시 시도해주세요." }]);
@@ -64,7 +81,8 @@ export default function ChatBot({ isOpen, setIsOpen }: ChatBotProps) {
   };
 
   // ✅ [수정완료] 약 이름 클릭 시 로그인 체크 -> 팝업 열기
-  const onDrugClick = (drugName: string) => {
+  // 서버가 찾은 약(link)이면 그 약(item_seq)의 상세 정보를, 아니면 이름으로 검색
+  const onDrugClick = (drugName: string, link?: DrugLink) => {
     // 1. 로컬 스토리지 확인
     const isLoggedIn = localStorage.getItem("token") || localStorage.getItem("accessToken");
 
@@ -81,23 +99,33 @@ export default function ChatBot({ isOpen, setIsOpen }: ChatBotProps) {
       return; // 여기서 중단 (검색 페이지로 안 넘어감)
     }
 
-    // 3. 로그인이 되어 있다면? -> 검색 페이지로 이동
+    // 3. 로그인이 되어 있다면? -> 약 상세 / 검색 페이지로 이동
+    if (link) {
+      window.dispatchEvent(new CustomEvent("pilly:open-pill", { detail: { itemSeq: link.item_seq } }));
+      return;
+    }
     console.log("약 검색 이동:", drugName);
     window.dispatchEvent(new CustomEvent("pilly:go-search", { detail: { keyword: drugName } }));
   };
 
-  const renderMessageWithLinks = (text: string) => {
+  // links 가 있으면 서버가 찾은 약(item_seq)의 상세 정보로 이동, 목록에 없는 이름은 링크 없이 표시
+  // links 가 없는 메시지(첫 인사 등)는 예전처럼 이름 그대로 검색
+  const renderMessageWithLinks = (text: string, links?: DrugLink[]) => {
     const parts = text.split(/(\[\[.*?\]\])/g);
 
     return parts.map((part, index) => {
       if (part.startsWith("[[") && part.endsWith("]]")) {
-        const keyword = part.slice(2, -2);
+        const keyword = part.slice(2, -2).trim();
+        const link = links?.find((l) => l.name === keyword);
+        if (links && !link) {
+          return <span key={index} className="font-bold">{keyword}</span>;
+        }
         return (
           <span
             key={index}
-            onClick={() => onDrugClick(keyword)}
+            onClick={() => onDrugClick(keyword, link)}
             className="text-olive-primary font-bold cursor-pointer hover:underline hover:bg-olive-primary/10 transition-colors px-1 rounded mx-0.5"
-            title={`${keyword} 검색하기`}
+            title={link ? `${link.item_name} 상세 정보` : `${keyword} 검색하기`}
           >
             {keyword}
           </span>
@@ -127,7 +155,7 @@ export default function ChatBot({ isOpen, setIsOpen }: ChatBotProps) {
                 <div className={`max-w-[85%] p-4 rounded-[20px] text-sm leading-relaxed shadow-sm ${
                   msg.role === "user" ? "bg-[#4A6D55] text-white rounded-tr-none" : "bg-white text-gray-800 border border-gray-100 rounded-tl-none"
                 }`}>
-                  {msg.role === "assistant" ? renderMessageWithLinks(msg.content) : msg.content}
+                  {msg.role === "assistant" ? renderMessageWithLinks(msg.content, msg.links) : msg.content}
                 </div>
               </div>
             ))}
@@ -68,11 +68,13 @@ const PAGE_SIZE = 20;
 
 interface SearchSectionProps {
   externalFilters?: SearchFilters | null;
+  externalPill?: { itemSeq: string } | null; // 이 약의 상세 정보를 바로 열기 (챗봇 링크 등)
   onInputClick?: () => void;
 }
 
 const SearchSection: React.FC<SearchSectionProps> = ({
   externalFilters,
+  externalPill,
   onInputClick,
 }) => {
   const [filters, setFilters] = useState<SearchFilters>({
@@ -190,6 +192,11 @@ const SearchSection: React.FC<SearchSectionProps> = ({
     }
   }, [externalFilters]);
 
+  // 외부에서 지정한 약 상세 열기
+  useEffect(() => {
+    if (externalPill) handleCardClick(externalPill.itemSeq);
+  }, [externalPill]);
+
 
   const handleSearchSubmit = (e?: React.FormEvent) => {
     if (e) e.preventDefault();